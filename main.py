@@ -1,10 +1,41 @@
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager, suppress
+
 from fastapi import APIRouter, FastAPI
 
-from src.api.routes import trades_router
+from src.api.middleware import AccessStatsMiddleware, CompressionMiddleware, ETagMiddleware, ProfilingMiddleware
+from src.api.routes import monitoring_router, trades_router
+from src.api.snapshot import SNAPSHOT_ENABLED, run_snapshot_refresher
+from src.cache import close_redis_client, flush_hits
+from src.database.connection import dispose_async_engine
+from src.logger import logger
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    refresher = asyncio.create_task(run_snapshot_refresher()) if SNAPSHOT_ENABLED else None
+    yield
+    if refresher is not None:
+        refresher.cancel()
+        with suppress(asyncio.CancelledError):
+            await refresher
+    try:
+        await flush_hits(force=True)
+    except Exception as e:
+        logger.info(f"[Main] Не удалось сохранить статистику обращений: {e}")
+    await dispose_async_engine()
+    await close_redis_client()
+
 
-app = FastAPI(title="Spimex API")
+app = FastAPI(title="Spimex API", lifespan=lifespan)
+app.add_middleware(ETagMiddleware)
+app.add_middleware(AccessStatsMiddleware)
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(ProfilingMiddleware)
 
 api_v1 = APIRouter(prefix="/v1")
 api_v1.include_router(trades_router)
+api_v1.include_router(monitoring_router)
 
 app.include_router(api_v1)
@@ -4,9 +4,13 @@ from fastapi import Query
 from pydantic import PositiveInt
 
 from src.api.schemas import (
+    DeliveryBasisId,
+    DeliveryTypeId,
     LastTradingDatesQuery,
+    OilId,
     TradingDynamicsQuery,
     TradingResultsQuery,
+    Unit,
 )
 
 
@@ -19,38 +23,30 @@ def last_trading_days_query(
 def trading_dynamics_query(
     start_date: date = Query(..., description="Начало периода"),
     end_date: date = Query(..., description="Конец периода"),
-    oil_id: str | None = Query(
-        None, min_length=4, max_length=4, pattern="^[A-Z0-9]{4}$", description="Код биржевого товара"
-    ),
-    delivery_type_id: str | None = Query(
-        None, min_length=1, max_length=1, pattern="^[A-Z0-9]$", description="Условие поставки"
-    ),
-    delivery_basis_id: str | None = Query(
-        None, min_length=3, max_length=3, pattern="^[A-Z0-9]{3}$", description="Код базиса поставки"
-    ),
+    oil_id: list[OilId] | None = Query(None, description="Коды биржевых товаров"),
+    delivery_type_id: list[DeliveryTypeId] | None = Query(None, description="Условия поставки"),
+    delivery_basis_id: list[DeliveryBasisId] | None = Query(None, description="Коды базисов поставки"),
+    unit: list[Unit] | None = Query(None, description="Единицы измерения"),
 ) -> TradingDynamicsQuery:
     return TradingDynamicsQuery(
         oil_id=oil_id,
         delivery_type_id=delivery_type_id,
         delivery_basis_id=delivery_basis_id,
+        unit=unit,
         start_date=start_date,
         end_date=end_date,
     )
 
 
 def trading_results_query(
-    oil_id: str | None = Query(
-        None, min_length=4, max_length=4, pattern="^[A-Z0-9]{4}$", description="Код биржевого товара"
-    ),
-    delivery_type_id: str | None = Query(
-        None, min_length=1, max_length=1, pattern="^[A-Z0-9]$", description="Условие поставки"
-    ),
-    delivery_basis_id: str | None = Query(
-        None, min_length=3, max_length=3, pattern="^[A-Z0-9]{3}$", description="Код базиса поставки"
-    ),
+    oil_id: list[OilId] | None = Query(None, description="Коды биржевых товаров"),
+    delivery_type_id: list[DeliveryTypeId] | None = Query(None, description="Условия поставки"),
+    delivery_basis_id: list[DeliveryBasisId] | None = Query(None, description="Коды базисов поставки"),
+    unit: list[Unit] | None = Query(None, description="Единицы измерения"),
 ) -> TradingResultsQuery:
     return TradingResultsQuery(
         oil_id=oil_id,
         delivery_type_id=delivery_type_id,
         delivery_basis_id=delivery_basis_id,
+        unit=unit,
     )
@@ -0,0 +1,223 @@
+import gzip
+import hashlib
+import time
+from urllib.parse import parse_qsl, urlencode
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.cache import WARM_HEADER, flush_hits, get_data_version, is_warm_request, record_hit
+from src.logger import logger
+from src.profiling import PROFILE_HEADER, profiling_mode, start_profile
+
+try:
+    import brotli  # type: ignore
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+
+class ProfilingMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        mode = profiling_mode(Headers(scope=scope).get(PROFILE_HEADER))
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+
+        with start_profile(f"{scope['method']} {scope['path']}", mode) as profile:
+
+            async def send_with_timing(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    profile.add("serialize", time.perf_counter() - profile.last_mark)
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", profile.server_timing())
+                await send(message)
+
+            await self.app(scope, receive, send_with_timing)
+
+
+def choose_encoding(accept_encoding: str) -> str | None:
+    accepted: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        params = params.strip()
+        quality = 1.0
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+
+    for coding in ("br", "gzip"):
+        if coding == "br" and brotli is None:
+            continue
+        if accepted.get(coding, accepted.get("*", 0.0)) > 0:
+            return coding
+    return None
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)  # type: ignore[union-attr]
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+    def is_compressible(self, status: int, headers: MutableHeaders, body: bytes) -> bool:
+        return (
+            status not in (204, 304)
+            and "content-encoding" not in headers
+            and headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+            and len(body) >= self.minimum_size
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Message | None = None
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if start is None:
+                await send(message)
+                return
+
+            pending, start = start, None
+            body = message.get("body", b"")
+            headers = MutableHeaders(scope=pending)
+            if message.get("more_body", False) or not self.is_compressible(pending["status"], headers, body):
+                await send(pending)
+                await send(message)
+                return
+
+            compressed = self.compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            etag = headers.get("etag")
+            if etag is not None and not etag.startswith("W/"):
+                headers["ETag"] = f'{etag[:-1]}-{encoding}"'
+            await send(pending)
+            await send({**message, "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
+
+
+def make_etag(version: str, scope: Scope) -> str:
+    query = urlencode(sorted(parse_qsl(scope["query_string"].decode("latin-1"), keep_blank_values=True)))
+    digest = hashlib.sha1(f"{version}:{scope['path']}?{query}".encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def match_etag(if_none_match: str | None, etag: str) -> str | None:
+    if if_none_match is None:
+        return None
+    if if_none_match.strip() == "*":
+        return etag
+    variants = {etag, f'{etag[:-1]}-gzip"', f'{etag[:-1]}-br"'}
+    for tag in if_none_match.split(","):
+        tag = tag.strip().removeprefix("W/")
+        if tag in variants:
+            return tag
+    return None
+
+
+class ETagMiddleware:
+    def __init__(self, app: ASGIApp, prefix: str = "/v1/trades/") -> None:
+        self.app = app
+        self.prefix = prefix
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in ("GET", "HEAD")
+            or not scope["path"].startswith(self.prefix)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            version = await get_data_version()
+        except Exception as e:
+            logger.info(f"[ETag] Не удалось получить версию данных: {e}")
+            version = None
+        if version is None:
+            await self.app(scope, receive, send)
+            return
+
+        etag = make_etag(version, scope)
+        matched = match_etag(Headers(scope=scope).get("if-none-match"), etag)
+        if matched is not None:
+            headers = MutableHeaders()
+            headers["ETag"] = matched
+            headers["Cache-Control"] = "no-cache"
+            headers["Vary"] = "Accept-Encoding"
+            await send({"type": "http.response.start", "status": 304, "headers": headers.raw})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        async def send_with_etag(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                served = scope.get("state", {}).get("data_version", version)
+                if served is not None:
+                    headers = MutableHeaders(scope=message)
+                    headers["ETag"] = etag if served == version else make_etag(served, scope)
+                    headers["Cache-Control"] = "no-cache"
+            await send(message)
+
+        await self.app(scope, receive, send_with_etag)
+
+
+class AccessStatsMiddleware:
+    def __init__(self, app: ASGIApp, prefix: str = "/v1/trades/") -> None:
+        self.app = app
+        self.prefix = prefix
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "GET"
+            or not scope["path"].startswith(self.prefix)
+            or is_warm_request(Headers(scope=scope).get(WARM_HEADER))
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        statuses: list[int] = []
+
+        async def send_with_status(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                statuses.append(message["status"])
+            await send(message)
+
+        await self.app(scope, receive, send_with_status)
+        if statuses and statuses[0] in (200, 304):
+            record_hit(f"{scope['path']}?{scope['query_string'].decode('latin-1')}")
+            try:
+                await flush_hits()
+            except Exception as e:
+                logger.info(f"[Stats] Не удалось сохранить статистику обращений: {e}")
@@ -1,7 +1,11 @@
+import json
+from collections.abc import Sequence
 from datetime import date
+from typing import Any
+from urllib.parse import urlencode
 
-from fastapi import APIRouter, Depends, Request
-from sqlalchemy import and_, func, select
+from fastapi import APIRouter, Depends, Request, Response
+from sqlalchemy import ColumnElement, and_, func, or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.api.dependencies import (
@@ -10,19 +14,58 @@ from src.api.dependencies import (
     trading_results_query,
 )
 from src.api.schemas import (
+    FILTER_FIELDS,
+    BatchDynamicsQuery,
+    BatchRequest,
+    BatchResultsQuery,
     LastTradingDatesQuery,
     LastTradingDatesSchema,
     TradingDynamicsQuery,
     TradingDynamicsSchema,
+    TradingFilters,
     TradingResultsQuery,
     TradingResultsSchema,
 )
-from src.cache import get_from_cache, set_cache
-from src.database.dependencies import get_async_db
+from src.api.snapshot import ResultsSnapshot, get_snapshot
+from src.cache import get_from_cache, get_latest_date, get_many, set_cache, set_many
+from src.database.connection import pool_status
+from src.database.dependencies import get_async_db, get_primary_db
 from src.database.models import SpimexTradingResults as TradingModel
 from src.logger import logger
+from src.profiling import profile_phase
 
 trades_router = APIRouter(prefix="/trades", tags=["trades"])
+monitoring_router = APIRouter(prefix="/monitoring", tags=["monitoring"])
+
+
+def filter_clauses(query: TradingFilters) -> list[ColumnElement[bool]]:
+    return [
+        getattr(TradingModel, field).in_(values)
+        for field in FILTER_FIELDS
+        if (values := getattr(query, field)) is not None
+    ]
+
+
+def filter_matches(query: TradingFilters, item: dict[str, Any]) -> bool:
+    return all(item[field] in values for field in FILTER_FIELDS if (values := getattr(query, field)) is not None)
+
+
+async def resolve_latest_date(db: AsyncSession, primary: AsyncSession) -> tuple[date | None, AsyncSession]:
+    with profile_phase("sql"):
+        latest_date = await db.scalar(select(func.max(TradingModel.date)))
+
+    if db.info.get("replica"):
+        with profile_phase("cache"):
+            published_date = await get_latest_date()
+        if published_date is not None and (latest_date is None or latest_date < published_date):
+            logger.info(f"Replica lags behind: {latest_date} < {published_date}, reading from primary")
+            return published_date, primary
+    return latest_date, db
+
+
+def snapshot_response(request: Request, snapshot: ResultsSnapshot, content: bytes) -> Response:
+    request.state.data_version = snapshot.version
+    return Response(content, media_type="application/json")
 
 
 @trades_router.get("/ping", name="ping")
@@ -41,19 +84,25 @@ async def get_last_trading_dates(
     request: Request,
     query: LastTradingDatesQuery = Depends(last_trading_days_query),
     db: AsyncSession = Depends(get_async_db),
+    primary: AsyncSession = Depends(get_primary_db),
 ):
-    cached = await get_from_cache(request)
+    with profile_phase("cache"):
+        cached = await get_from_cache(request)
     if cached:
         cached_data = [date.fromisoformat(d) for d in cached]
         logger.info(f"Got from cache {len(cached_data)} items")
         return {"dates": cached_data, "cached": True}
 
+    _, db = await resolve_latest_date(db, primary)
     stmt = select(TradingModel.date).distinct().order_by(TradingModel.date.desc()).limit(query.days)
-    result = await db.scalars(stmt)
-    result_data: list[date] = list(result.all())
+    with profile_phase("sql"):
+        result = await db.scalars(stmt)
+    with profile_phase("orm"):
+        result_data: list[date] = list(result.all())
     data_to_cache = [d.isoformat() for d in result_data]
 
-    await set_cache(request, data_to_cache)
+    with profile_phase("cache"):
+        await set_cache(request, data_to_cache)
     logger.info(f"Set to cache {len(data_to_cache)} items")
     return LastTradingDatesSchema(dates=result_data)
 
@@ -69,40 +118,46 @@ async def get_dynamics(
     request: Request,
     query: TradingDynamicsQuery = Depends(trading_dynamics_query),
     db: AsyncSession = Depends(get_async_db),
+    primary: AsyncSession = Depends(get_primary_db),
 ):
-    cached = await get_from_cache(request)
+    snapshot = get_snapshot()
+    if snapshot is not None and snapshot.covers(query.start_date):
+        with profile_phase("snapshot"):
+            content = snapshot.dynamics(query)
+        return snapshot_response(request, snapshot, content)
+
+    with profile_phase("cache"):
+        cached = await get_from_cache(request)
     if cached:
-        cached_data = [TradingDynamicsSchema.model_validate(item) for item in cached]
+        with profile_phase("validate"):
+            cached_data = [TradingDynamicsSchema.model_validate(item) for item in cached]
         logger.info(f"Got from cache {len(cached_data)} items")
         return cached_data
 
+    _, db = await resolve_latest_date(db, primary)
     filters = [
         TradingModel.date >= query.start_date,
         TradingModel.date <= query.end_date,
+        *filter_clauses(query),
     ]
 
-    if query.oil_id is not None:
-        filters.append(TradingModel.oil_id == query.oil_id)
-    if query.delivery_type_id is not None:
-        filters.append(TradingModel.delivery_type_id == query.delivery_type_id)
-    if query.delivery_basis_id is not None:
-        filters.append(TradingModel.delivery_basis_id == query.delivery_basis_id)
-
     stmt = select(TradingModel).where(and_(*filters))
-    result = await db.scalars(stmt)
-    result_data = result.all()
-
-    data_to_cache = [
-        {
-            k: (v.isoformat() if isinstance(v, date) else v)
-            for k, v in TradingDynamicsSchema.model_validate(item).model_dump().items()
-        }
-        for item in result_data
-    ]
+    with profile_phase("sql"):
+        result = await db.scalars(stmt)
+    with profile_phase("orm"):
+        result_data = result.all()
 
-    await set_cache(request, data_to_cache)
+    with profile_phase("validate"):
+        validated = [TradingDynamicsSchema.model_validate(item) for item in result_data]
+        data_to_cache = [
+            {k: (v.isoformat() if isinstance(v, date) else v) for k, v in item.model_dump().items()}
+            for item in validated
+        ]
+
+    with profile_phase("cache"):
+        await set_cache(request, data_to_cache)
     logger.info(f"Set to cache {len(data_to_cache)} items")
-    return [TradingDynamicsSchema.model_validate(item) for item in result_data]
+    return validated
 
 
 @trades_router.get(
@@ -116,38 +171,140 @@ async def get_trading_results(
     request: Request,
     query: TradingResultsQuery = Depends(trading_results_query),
     db: AsyncSession = Depends(get_async_db),
+    primary: AsyncSession = Depends(get_primary_db),
 ):
-    cached = await get_from_cache(request)
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        with profile_phase("snapshot"):
+            content = snapshot.results(query)
+        return snapshot_response(request, snapshot, content)
+
+    with profile_phase("cache"):
+        cached = await get_from_cache(request)
     if cached:
-        cached_data = [TradingResultsSchema.model_validate(item) for item in cached]
+        with profile_phase("validate"):
+            cached_data = [TradingResultsSchema.model_validate(item) for item in cached]
         logger.info(f"Got from cache {len(cached_data)} items")
         return cached_data
 
-    latest_date = await db.scalar(select(func.max(TradingModel.date)))
-
+    latest_date, db = await resolve_latest_date(db, primary)
     filters = [
         TradingModel.date == latest_date,
+        *filter_clauses(query),
     ]
 
-    if query.oil_id is not None:
-        filters.append(TradingModel.oil_id == query.oil_id)
-    if query.delivery_type_id is not None:
-        filters.append(TradingModel.delivery_type_id == query.delivery_type_id)
-    if query.delivery_basis_id is not None:
-        filters.append(TradingModel.delivery_basis_id == query.delivery_basis_id)
-
     stmt = select(TradingModel).where(and_(*filters))
-    result = await db.scalars(stmt)
-    result_data = result.all()
-
-    data_to_cache = [
-        {
-            k: (v.isoformat() if isinstance(v, date) else v)
-            for k, v in TradingResultsSchema.model_validate(item).model_dump().items()
-        }
-        for item in result_data
-    ]
+    with profile_phase("sql"):
+        result = await db.scalars(stmt)
+    with profile_phase("orm"):
+        result_data = result.all()
+
+    with profile_phase("validate"):
+        validated = [TradingResultsSchema.model_validate(item) for item in result_data]
+        data_to_cache = [
+            {k: (v.isoformat() if isinstance(v, date) else v) for k, v in item.model_dump().items()}
+            for item in validated
+        ]
 
-    await set_cache(request, data_to_cache)
+    with profile_phase("cache"):
+        await set_cache(request, data_to_cache)
     logger.info(f"Set to cache {len(data_to_cache)} items")
-    return [TradingResultsSchema.model_validate(item) for item in result_data]
+    return validated
+
+
+def batch_cache_key(request: Request, query: BatchDynamicsQuery | BatchResultsQuery) -> str:
+    params: dict[str, Any] = {}
+    if isinstance(query, BatchDynamicsQuery):
+        path = request.app.url_path_for("get_dynamics")
+        params = {"start_date": query.start_date.isoformat(), "end_date": query.end_date.isoformat()}
+    else:
+        path = request.app.url_path_for("get_results")
+    params.update((field, values) for field in FILTER_FIELDS if (values := getattr(query, field)) is not None)
+    return f"cache:{path}?{urlencode(params, doseq=True)}"
+
+
+@trades_router.post(
+    "/batch",
+    response_model=list[list[TradingResultsSchema]],
+    summary="Пакет запросов торгов",
+    description="Выполняет несколько запросов results и dynamics за один вызов, ответы возвращаются в порядке запросов",
+    name="batch_queries",
+)
+async def batch_queries(
+    request: Request,
+    batch: BatchRequest,
+    db: AsyncSession = Depends(get_async_db),
+    primary: AsyncSession = Depends(get_primary_db),
+):
+    queries = batch.queries
+    parts: list[bytes] = [b"[]"] * len(queries)
+    keys: dict[int, str] = {}
+    snapshot = get_snapshot()
+    with profile_phase("snapshot"):
+        for idx, query in enumerate(queries):
+            if snapshot is not None and isinstance(query, BatchResultsQuery):
+                parts[idx] = snapshot.results(query)
+            elif snapshot is not None and isinstance(query, BatchDynamicsQuery) and snapshot.covers(query.start_date):
+                parts[idx] = snapshot.dynamics(query)
+            else:
+                keys[idx] = batch_cache_key(request, query)
+
+    with profile_phase("cache"):
+        cached = await get_many(list(keys.values()), request.app)
+    misses: list[int] = []
+    for (idx, _), value in zip(keys.items(), cached, strict=True):
+        if value is not None:
+            parts[idx] = value.encode()
+        else:
+            misses.append(idx)
+    logger.info(f"Batch of {len(queries)} queries, {len(keys) - len(misses)} from cache, {len(misses)} from database")
+    if not misses:
+        return Response(b"[" + b",".join(parts) + b"]", media_type="application/json")
+
+    latest_date, db = await resolve_latest_date(db, primary)
+
+    bounds: dict[int, tuple[date, date]] = {}
+    for idx in misses:
+        query = queries[idx]
+        if isinstance(query, BatchDynamicsQuery):
+            bounds[idx] = (query.start_date, query.end_date)
+        elif latest_date is not None:
+            bounds[idx] = (latest_date, latest_date)
+
+    rows: Sequence[TradingModel] = []
+    if bounds:
+        clauses = [
+            and_(TradingModel.date >= start, TradingModel.date <= end, *filter_clauses(queries[idx]))
+            for idx, (start, end) in bounds.items()
+        ]
+        with profile_phase("sql"):
+            result = await db.scalars(select(TradingModel).where(or_(*clauses)))
+        with profile_phase("orm"):
+            rows = result.all()
+
+    with profile_phase("validate"):
+        items = [TradingResultsSchema.model_validate(row).model_dump(mode="json") for row in rows]
+
+    to_cache: dict[str, str] = {}
+    with profile_phase("serialize"):
+        for idx in misses:
+            data: list[dict[str, Any]] = []
+            if idx in bounds:
+                start, end = (day.isoformat() for day in bounds[idx])
+                data = [item for item in items if start <= item["date"] <= end and filter_matches(queries[idx], item)]
+            to_cache[keys[idx]] = json.dumps(data)
+            parts[idx] = to_cache[keys[idx]].encode()
+
+    with profile_phase("cache"):
+        await set_many(to_cache)
+    return Response(b"[" + b",".join(parts) + b"]", media_type="application/json")
+
+
+@monitoring_router.get(
+    "/pool",
+    summary="Состояние пулов соединений",
+    description="Возвращает размер, занятость, число выдач и время ожидания соединений для каждого пула",
+    name="get_pool_status",
+)
+async def get_pool_status():
+    return pool_status()
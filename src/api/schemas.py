@@ -1,6 +1,16 @@
 from datetime import date
+from typing import Annotated, Literal
 
-from pydantic import BaseModel, ConfigDict, PositiveInt
+from pydantic import BaseModel, ConfigDict, Field, PositiveInt, StringConstraints, field_validator
+
+from src.database.models import DEFAULT_UNIT
+
+OilId = Annotated[str, StringConstraints(pattern="^[A-Z0-9]{4}$")]
+DeliveryTypeId = Annotated[str, StringConstraints(pattern="^[A-Z0-9]$")]
+DeliveryBasisId = Annotated[str, StringConstraints(pattern="^[A-Z0-9]{3}$")]
+Unit = Annotated[str, StringConstraints(min_length=1, max_length=50)]
+FILTER_FIELDS = ("oil_id", "delivery_type_id", "delivery_basis_id", "unit")
+BATCH_MAX_QUERIES = 50
 
 
 class LastTradingDatesSchema(BaseModel):
@@ -16,6 +26,7 @@ class TradingDynamicsSchema(BaseModel):
     volume: int
     total: int
     count: int
+    unit: str = DEFAULT_UNIT
     date: date
 
     model_config = ConfigDict(from_attributes=True)
@@ -30,6 +41,7 @@ class TradingResultsSchema(BaseModel):
     volume: int
     total: int
     count: int
+    unit: str = DEFAULT_UNIT
     date: date
 
     model_config = ConfigDict(from_attributes=True)
@@ -39,15 +51,36 @@ class LastTradingDatesQuery(BaseModel):
     days: PositiveInt
 
 
-class TradingDynamicsQuery(BaseModel):
+class TradingFilters(BaseModel):
+    oil_id: list[OilId] | None = None
+    delivery_type_id: list[DeliveryTypeId] | None = None
+    delivery_basis_id: list[DeliveryBasisId] | None = None
+    unit: list[Unit] | None = None
+
+    @field_validator(*FILTER_FIELDS, mode="before")
+    @classmethod
+    def wrap_single_value(cls, value: object) -> object:
+        return [value] if isinstance(value, str) else value
+
+
+class TradingDynamicsQuery(TradingFilters):
     start_date: date
     end_date: date
-    oil_id: str | None = None
-    delivery_type_id: str | None = None
-    delivery_basis_id: str | None = None
 
 
-class TradingResultsQuery(BaseModel):
-    oil_id: str | None = None
-    delivery_type_id: str | None = None
-    delivery_basis_id: str | None = None
+class TradingResultsQuery(TradingFilters):
+    pass
+
+
+class BatchDynamicsQuery(TradingDynamicsQuery):
+    kind: Literal["dynamics"]
+
+
+class BatchResultsQuery(TradingResultsQuery):
+    kind: Literal["results"]
+
+
+class BatchRequest(BaseModel):
+    queries: list[Annotated[BatchDynamicsQuery | BatchResultsQuery, Field(discriminator="kind")]] = Field(
+        min_length=1, max_length=BATCH_MAX_QUERIES
+    )
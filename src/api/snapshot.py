@@ -0,0 +1,123 @@
+import asyncio
+import json
+import os
+from collections import defaultdict
+from collections.abc import Iterable, Sequence
+from datetime import date
+from typing import cast
+
+from dotenv import load_dotenv
+from sqlalchemy import select
+
+from src.api.schemas import (
+    FILTER_FIELDS,
+    TradingDynamicsQuery,
+    TradingFilters,
+    TradingResultsQuery,
+    TradingResultsSchema,
+)
+from src.cache import LOADED_CHANNEL, get_data_version, get_redis_client
+from src.database.connection import get_async_session_maker
+from src.database.models import SpimexTradingResults as TradingModel
+from src.logger import logger
+
+load_dotenv()
+
+SNAPSHOT_ENABLED = os.environ.get("SNAPSHOT_ENABLED", "0") == "1"
+SNAPSHOT_DAYS = int(os.environ.get("SNAPSHOT_DAYS", "1"))
+SNAPSHOT_RETRY_DELAY = 5.0
+INDEX_FIELDS = ("date", *FILTER_FIELDS)
+
+
+class ResultsSnapshot:
+    def __init__(self, items: Sequence[TradingResultsSchema], version: str | None = None) -> None:
+        self.version = version
+        self.rows = [
+            json.dumps(item.model_dump(mode="json"), ensure_ascii=False, separators=(",", ":")).encode()
+            for item in items
+        ]
+        self.indexes: dict[str, dict[object, list[int]]] = {field: defaultdict(list) for field in INDEX_FIELDS}
+        for idx, item in enumerate(items):
+            for field in INDEX_FIELDS:
+                self.indexes[field][getattr(item, field)].append(idx)
+        self.dates: list[date] = sorted(cast(dict[date, list[int]], self.indexes["date"]))
+        self.latest_date = self.dates[-1] if self.dates else None
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def covers(self, start_date: date) -> bool:
+        return bool(self.dates) and start_date >= self.dates[0]
+
+    def select(self, candidates: Iterable[Sequence[int]]) -> list[int]:
+        ordered = sorted(candidates, key=len)
+        if not ordered:
+            return list(range(len(self.rows)))
+        selected = set(ordered[0])
+        for positions in ordered[1:]:
+            selected.intersection_update(positions)
+        return sorted(selected)
+
+    def filters(self, query: TradingFilters) -> list[Sequence[int]]:
+        return [
+            [idx for value in values for idx in self.indexes[field].get(value, [])]
+            for field in FILTER_FIELDS
+            if (values := getattr(query, field)) is not None
+        ]
+
+    def render(self, positions: list[int]) -> bytes:
+        return b"[" + b",".join(self.rows[idx] for idx in positions) + b"]"
+
+    def results(self, query: TradingResultsQuery) -> bytes:
+        if self.latest_date is None:
+            return b"[]"
+        return self.render(self.select([self.indexes["date"][self.latest_date], *self.filters(query)]))
+
+    def dynamics(self, query: TradingDynamicsQuery) -> bytes:
+        in_range = [
+            idx for day in self.dates if query.start_date <= day <= query.end_date for idx in self.indexes["date"][day]
+        ]
+        return self.render(self.select([in_range, *self.filters(query)]))
+
+
+_snapshot: ResultsSnapshot | None = None
+
+
+def get_snapshot() -> ResultsSnapshot | None:
+    return _snapshot
+
+
+async def refresh_snapshot(days: int = SNAPSHOT_DAYS) -> ResultsSnapshot:
+    global _snapshot
+    try:
+        version = await get_data_version()
+    except Exception as e:
+        logger.info(f"[Snapshot] Не удалось получить версию данных: {e}")
+        version = None
+    async with get_async_session_maker()() as session:
+        dates = list(
+            await session.scalars(select(TradingModel.date).distinct().order_by(TradingModel.date.desc()).limit(days))
+        )
+        rows = await session.scalars(select(TradingModel).where(TradingModel.date.in_(dates)).order_by(TradingModel.id))
+        items = [TradingResultsSchema.model_validate(row) for row in rows]
+
+    snapshot = ResultsSnapshot(items, version)
+    _snapshot = snapshot
+    logger.info(f"[Snapshot] Загружено {len(snapshot)} строк за {len(snapshot.dates)} дней, версия {version}.")
+    return snapshot
+
+
+async def run_snapshot_refresher() -> None:
+    while True:
+        try:
+            async with get_redis_client().pubsub() as pubsub:  # type: ignore[reportUnknownMemberType]
+                await pubsub.subscribe(LOADED_CHANNEL)  # type: ignore[reportUnknownMemberType]
+                await refresh_snapshot()
+                async for message in pubsub.listen():  # type: ignore[reportUnknownMemberType]
+                    if message["type"] == "message":
+                        await refresh_snapshot()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.info(f"[Snapshot] Ошибка обновления снимка: {e}")
+            await asyncio.sleep(SNAPSHOT_RETRY_DELAY)
@@ -1,24 +1,252 @@
+import asyncio
 import json
-from typing import Any
+import os
+import secrets
+import time
+from collections import Counter
+from datetime import date
+from functools import cache
+from typing import TYPE_CHECKING, Any
 
-import redis.asyncio as redis
+from dotenv import load_dotenv
 from fastapi import Request
 
-async_redis_client = redis.Redis(host="127.0.0.1", port=6379, db=0, encoding="utf-8", decode_responses=True)
+from src.logger import logger
+
+if TYPE_CHECKING:
+    import redis.asyncio as redis
+
+load_dotenv()
+
+LATEST_DATE_KEY = "data:latest_date"
+DATA_VERSION_KEY = "data:version"
+CACHE_KEY_PATTERN = "cache:*"
+LOADED_CHANNEL = "data:loaded"
+HITS_KEY = "stats:hits"
+HITS_FLUSH_INTERVAL = 10.0
+HITS_MAX_KEYS = 1000
+WARM_HEADER = "x-cache-warm"
+WARM_TOKEN = secrets.token_hex(16)
+
+CACHE_SOFT_TTL = int(os.environ.get("CACHE_SOFT_TTL", "300"))
+CACHE_HARD_TTL = int(os.environ.get("CACHE_HARD_TTL", "86400"))
+CACHE_MAX_BYTES = int(os.environ.get("CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+CACHE_TTLS = {
+    "/v1/trades/dates": (CACHE_SOFT_TTL, CACHE_HARD_TTL),
+    "/v1/trades/results": (CACHE_SOFT_TTL, CACHE_HARD_TTL),
+    "/v1/trades/dynamics": (CACHE_SOFT_TTL * 2, CACHE_HARD_TTL),
+}
+CACHE_LRU_KEY = "cache:__lru__"
+CACHE_SIZES_KEY = "cache:__sizes__"
+CACHE_BYTES_KEY = "cache:__bytes__"
+REFRESH_LOCK_PREFIX = "lock:"
+REFRESH_LOCK_TTL = 30
+
+_refreshing: set[asyncio.Task[None]] = set()
+
+_hits: Counter[str] = Counter()
+_hits_flushed = time.monotonic()
+SET_IF_GREATER = """
+local current = redis.call('GET', KEYS[1])
+if not current or current < ARGV[1] then
+    redis.call('SET', KEYS[1], ARGV[1])
+end
+return redis.call('GET', KEYS[1])
+"""
+CACHE_GET = """
+local values = {}
+for i = 2, #KEYS do
+    local value = redis.call('GET', KEYS[i])
+    if value then
+        redis.call('ZADD', KEYS[1], 'XX', ARGV[1], KEYS[i])
+    end
+    values[i - 1] = value or false
+end
+return values
+"""
+CACHE_SET = """
+local total = tonumber(redis.call('GET', KEYS[3]) or '0')
+for i = 4, #KEYS do
+    local key = KEYS[i]
+    local value = ARGV[(i - 4) * 2 + 4]
+    local old = tonumber(redis.call('HGET', KEYS[2], key) or '0')
+    redis.call('SET', key, value, 'EX', ARGV[(i - 4) * 2 + 3])
+    redis.call('HSET', KEYS[2], key, #value)
+    redis.call('ZADD', KEYS[1], ARGV[1], key)
+    total = total + #value - old
+end
+while total > tonumber(ARGV[2]) do
+    local oldest = redis.call('ZPOPMIN', KEYS[1])
+    if #oldest == 0 then
+        total = 0
+        break
+    end
+    total = total - tonumber(redis.call('HGET', KEYS[2], oldest[1]) or '0')
+    redis.call('DEL', oldest[1])
+    redis.call('HDEL', KEYS[2], oldest[1])
+end
+redis.call('SET', KEYS[3], total)
+return total
+"""
+
+
+@cache
+def get_redis_client() -> "redis.Redis":
+    import redis.asyncio as redis
+
+    return redis.Redis(host="127.0.0.1", port=6379, db=0, encoding="utf-8", decode_responses=True)
+
+
+async def close_redis_client() -> None:
+    if get_redis_client.cache_info().currsize:
+        await get_redis_client().aclose()
+    get_redis_client.cache_clear()
+
+
+def __getattr__(name: str) -> Any:
+    if name == "async_redis_client":
+        return get_redis_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def is_warm_request(token: str | None) -> bool:
+    return token is not None and secrets.compare_digest(token, WARM_TOKEN)
 
 
 def get_cache_key(request: Request) -> str:
     return f"cache:{request.url.path}?{request.url.query}"
 
 
+def cache_ttl(key: str) -> tuple[int, int]:
+    path = key.removeprefix("cache:").partition("?")[0]
+    return CACHE_TTLS.get(path, (CACHE_SOFT_TTL, CACHE_HARD_TTL))
+
+
+def wrap_entry(key: str, payload: str, now: float | None = None) -> tuple[int, str]:
+    soft_ttl, hard_ttl = cache_ttl(key)
+    return hard_ttl, f"{int((now or time.time()) + soft_ttl)}|{payload}"
+
+
+def unwrap_entry(value: str, now: float | None = None) -> tuple[str, bool]:
+    head, sep, payload = value.partition("|")
+    if sep and head.isdigit():
+        return payload, (now or time.time()) >= int(head)
+    return value, False
+
+
+async def refresh_entry(app: Any, key: str) -> None:
+    import httpx
+
+    client = get_redis_client()
+    lock = f"{REFRESH_LOCK_PREFIX}{key}"
+    if not await client.set(lock, "1", nx=True, ex=REFRESH_LOCK_TTL):
+        return
+    try:
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://refresh", headers={WARM_HEADER: WARM_TOKEN}
+        ) as http:
+            await http.get(key.removeprefix("cache:"))
+    except Exception as e:
+        logger.info(f"[Cache] Не удалось обновить {key}: {e}")
+    finally:
+        await client.delete(lock)
+
+
+def schedule_refresh(app: Any, key: str) -> None:
+    task = asyncio.create_task(refresh_entry(app, key))
+    _refreshing.add(task)
+    task.add_done_callback(_refreshing.discard)
+
+
+async def get_many(keys: list[str], app: Any = None) -> list[str | None]:
+    if not keys:
+        return []
+    values: list[str | None] = await get_redis_client().eval(CACHE_GET, len(keys) + 1, CACHE_LRU_KEY, *keys, int(time.time()))  # type: ignore[reportUnknownMemberType]
+    payloads: list[str | None] = []
+    for key, value in zip(keys, values, strict=True):
+        if value is None:
+            payloads.append(None)
+            continue
+        payload, stale = unwrap_entry(value)
+        if stale and app is not None:
+            schedule_refresh(app, key)
+        payloads.append(payload)
+    return payloads
+
+
+async def set_many(values: dict[str, str]) -> None:
+    if not values:
+        return
+    now = time.time()
+    args: list[Any] = [int(now), CACHE_MAX_BYTES]
+    for key, payload in values.items():
+        args += wrap_entry(key, payload, now)
+    await get_redis_client().eval(  # type: ignore[reportUnknownMemberType]
+        CACHE_SET, len(values) + 3, CACHE_LRU_KEY, CACHE_SIZES_KEY, CACHE_BYTES_KEY, *values, *args
+    )
+
+
 async def get_from_cache(request: Request):
-    key = get_cache_key(request)
-    data = await async_redis_client.get(key)
+    if is_warm_request(request.headers.get(WARM_HEADER)):
+        return None
+    [data] = await get_many([get_cache_key(request)], request.app)
     if data:
         return json.loads(data)
     return None
 
 
 async def set_cache(request: Request, response_data: Any):
-    key = get_cache_key(request)
-    await async_redis_client.set(key, json.dumps(response_data))
+    await set_many({get_cache_key(request): json.dumps(response_data)})
+
+
+async def get_latest_date() -> date | None:
+    value = await get_redis_client().get(LATEST_DATE_KEY)
+    return date.fromisoformat(value) if value else None
+
+
+async def publish_latest_date(value: date) -> None:
+    await get_redis_client().eval(SET_IF_GREATER, 1, LATEST_DATE_KEY, value.isoformat())  # type: ignore[reportUnknownMemberType]
+
+
+async def get_data_version() -> str | None:
+    return await get_redis_client().get(DATA_VERSION_KEY)
+
+
+async def bump_data_version() -> None:
+    await get_redis_client().incr(DATA_VERSION_KEY)
+
+
+async def notify_loaded(latest_date: date) -> None:
+    await get_redis_client().publish(LOADED_CHANNEL, latest_date.isoformat())  # type: ignore[reportUnknownMemberType]
+
+
+async def clear_response_cache() -> None:
+    client = get_redis_client()
+    keys: list[str] = [key async for key in client.scan_iter(match=CACHE_KEY_PATTERN, count=1000)]  # type: ignore[reportUnknownMemberType, reportUnknownVariableType]
+    for idx in range(0, len(keys), 1000):
+        await client.delete(*keys[idx : idx + 1000])
+
+
+def record_hit(path: str) -> None:
+    _hits[path] += 1
+
+
+async def flush_hits(force: bool = False) -> None:
+    global _hits_flushed
+    if not force and time.monotonic() - _hits_flushed < HITS_FLUSH_INTERVAL:
+        return
+    _hits_flushed = time.monotonic()
+    if not _hits:
+        return
+    pending = dict(_hits)
+    _hits.clear()
+    async with get_redis_client().pipeline(transaction=False) as pipe:
+        for path, count in pending.items():
+            pipe.zincrby(HITS_KEY, count, path)
+        pipe.zremrangebyrank(HITS_KEY, 0, -HITS_MAX_KEYS - 1)
+        await pipe.execute()
+
+
+async def hot_paths(limit: int) -> list[str]:
+    paths: list[str] = await get_redis_client().zrevrange(HITS_KEY, 0, limit - 1)  # type: ignore[reportUnknownMemberType]
+    return [path.removesuffix("?") for path in paths]
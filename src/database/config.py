@@ -1,4 +1,5 @@
 import os
+from dataclasses import dataclass
 
 from dotenv import load_dotenv
 
@@ -9,3 +10,33 @@ DB_HOST = os.environ.get("DB_HOST")
 DB_PORT = os.environ.get("DB_PORT")
 DB_USER = os.environ.get("DB_USER")
 DB_PASS = os.environ.get("DB_PASS")
+DB_REPLICA_HOSTS = [host.strip() for host in os.environ.get("DB_REPLICA_HOSTS", "").split(",") if host.strip()]
+REPLICA_CHECK_INTERVAL = float(os.environ.get("REPLICA_CHECK_INTERVAL", 5))
+
+
+@dataclass(frozen=True)
+class PoolConfig:
+    pool_size: int
+    max_overflow: int
+    pool_timeout: float
+    pool_recycle: int
+    statement_cache_size: int
+    prepared_statement_cache_size: int
+
+
+def pool_config(profile: str, pool_size: int, max_overflow: int, pool_timeout: float) -> PoolConfig:
+    prefix = f"DB_{profile.upper()}_"
+    return PoolConfig(
+        pool_size=int(os.environ.get(f"{prefix}POOL_SIZE", pool_size)),
+        max_overflow=int(os.environ.get(f"{prefix}MAX_OVERFLOW", max_overflow)),
+        pool_timeout=float(os.environ.get(f"{prefix}POOL_TIMEOUT", pool_timeout)),
+        pool_recycle=int(os.environ.get(f"{prefix}POOL_RECYCLE", 1800)),
+        statement_cache_size=int(os.environ.get(f"{prefix}STATEMENT_CACHE_SIZE", 100)),
+        prepared_statement_cache_size=int(os.environ.get(f"{prefix}PREPARED_STATEMENT_CACHE_SIZE", 100)),
+    )
+
+
+POOL_PROFILES = {
+    "api": pool_config("api", pool_size=10, max_overflow=10, pool_timeout=30),
+    "ingest": pool_config("ingest", pool_size=5, max_overflow=0, pool_timeout=60),
+}
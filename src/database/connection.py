@@ -1,22 +1,121 @@
-from sqlalchemy import create_engine
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
-from sqlalchemy_utils import create_database, database_exists  # type: ignore
+from typing import Any, Literal
 
-from src.database.config import DB_HOST, DB_NAME, DB_PASS, DB_PORT, DB_USER
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+
+from src.database.config import (
+    DB_HOST,
+    DB_NAME,
+    DB_PASS,
+    DB_PORT,
+    DB_REPLICA_HOSTS,
+    DB_USER,
+    POOL_PROFILES,
+    REPLICA_CHECK_INTERVAL,
+)
+from src.database.pool import InstrumentedPool
+from src.database.routing import ReplicaRouter
 from src.logger import logger
 
 SYNC_DATABASE_URL = f"postgresql+psycopg2://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
-sync_engine = create_engine(SYNC_DATABASE_URL)
+ASYNC_DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
-if not database_exists(sync_engine.url):
-    create_database(sync_engine.url)
-    logger.info(f"[Main] База {DB_NAME} создана.")
-else:
-    logger.info(f"[Main] База {DB_NAME} уже существует.")
+REPLICA_DATABASE_URLS = [f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{host}/{DB_NAME}" for host in DB_REPLICA_HOSTS]
 
-ASYNC_DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+EngineProfile = Literal["api", "ingest"]
+
+_engines: dict[EngineProfile, AsyncEngine] = {}
+_session_makers: dict[EngineProfile, async_sessionmaker[AsyncSession]] = {}
+_replica_router: ReplicaRouter | None = None
+
+
+def provision_database() -> None:
+    from sqlalchemy import create_engine
+    from sqlalchemy_utils import create_database, database_exists  # type: ignore
+
+    sync_engine = create_engine(SYNC_DATABASE_URL)
+    try:
+        if not database_exists(sync_engine.url):
+            create_database(sync_engine.url)
+            logger.info(f"[Main] База {DB_NAME} создана.")
+        else:
+            logger.info(f"[Main] База {DB_NAME} уже существует.")
+    finally:
+        sync_engine.dispose()
+
+
+def create_profile_engine(profile: EngineProfile, url: str | None = None) -> AsyncEngine:
+    config = POOL_PROFILES[profile]
+    return create_async_engine(
+        url or ASYNC_DATABASE_URL,
+        poolclass=InstrumentedPool,
+        pool_pre_ping=True,
+        pool_size=config.pool_size,
+        max_overflow=config.max_overflow,
+        pool_timeout=config.pool_timeout,
+        pool_recycle=config.pool_recycle,
+        connect_args={
+            "statement_cache_size": config.statement_cache_size,
+            "prepared_statement_cache_size": config.prepared_statement_cache_size,
+        },
+    )
+
+
+def get_async_engine(profile: EngineProfile = "api") -> AsyncEngine:
+    if profile not in _engines:
+        _engines[profile] = create_profile_engine(profile)
+    return _engines[profile]
+
+
+def get_async_session_maker(profile: EngineProfile = "api") -> async_sessionmaker[AsyncSession]:
+    if profile not in _session_makers:
+        _session_makers[profile] = async_sessionmaker(bind=get_async_engine(profile), expire_on_commit=False)
+    return _session_makers[profile]
+
+
+def get_replica_router() -> ReplicaRouter | None:
+    global _replica_router
+    if _replica_router is None and REPLICA_DATABASE_URLS:
+        _replica_router = ReplicaRouter(
+            REPLICA_DATABASE_URLS,
+            lambda url: create_profile_engine("api", url),
+            check_interval=REPLICA_CHECK_INTERVAL,
+        )
+    return _replica_router
+
+
+async def dispose_async_engine() -> None:
+    global _replica_router
+    engines = list(_engines.values())
+    _session_makers.clear()
+    _engines.clear()
+    for engine in engines:
+        await engine.dispose()
+    if _replica_router is not None:
+        await _replica_router.dispose()
+        _replica_router = None
+
+
+def create_worker_engine() -> AsyncEngine:
+    return create_profile_engine("ingest")
+
+
+def pool_status() -> dict[str, dict[str, Any]]:
+    status: dict[str, dict[str, Any]] = {
+        profile: engine.pool.snapshot() for profile, engine in _engines.items()  # type: ignore[reportAttributeAccessIssue]
+    }
+    if _replica_router is not None:
+        for url, engine in _replica_router.engines.items():
+            status[f"replica:{engine.url.host}"] = {
+                **engine.pool.snapshot(),  # type: ignore[reportAttributeAccessIssue]
+                "healthy": url in _replica_router.healthy,
+            }
+    return status
 
-async_engine = create_async_engine(ASYNC_DATABASE_URL, pool_pre_ping=True)
 
-async_session_maker = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+def __getattr__(name: str) -> Any:
+    if name == "async_engine":
+        return get_async_engine()
+    if name == "async_session_maker":
+        return get_async_session_maker()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
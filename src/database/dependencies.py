@@ -1,10 +1,28 @@
 from collections.abc import AsyncGenerator
 
+from sqlalchemy.exc import InterfaceError, OperationalError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database.connection import async_session_maker
+from src.database.connection import get_async_session_maker, get_replica_router
 
 
-async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
-    async with async_session_maker() as session:
+async def get_primary_db() -> AsyncGenerator[AsyncSession, None]:
+    async with get_async_session_maker()() as session:
         yield session
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    router = get_replica_router()
+    url = await router.pick() if router is not None else None
+    if router is None or url is None:
+        async with get_async_session_maker()() as session:
+            yield session
+        return
+
+    async with router.session_maker(url)() as session:
+        session.info["replica"] = True
+        try:
+            yield session
+        except (InterfaceError, OperationalError, OSError):
+            router.mark_down(url)
+            raise
@@ -3,6 +3,8 @@ from datetime import datetime
 from sqlalchemy import Date, DateTime, Integer, String, func
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
+DEFAULT_UNIT = "Метрическая тонна"
+
 
 class BaseModel(DeclarativeBase):
     pass
@@ -22,6 +24,7 @@ class SpimexTradingResults(BaseModel):
     volume: Mapped[int] = mapped_column(Integer, nullable=False)
     total: Mapped[int] = mapped_column(Integer, nullable=False)
     count: Mapped[int] = mapped_column(Integer, nullable=False)
+    unit: Mapped[str] = mapped_column(String(50), nullable=False, default=DEFAULT_UNIT, server_default=DEFAULT_UNIT)
     date: Mapped[datetime] = mapped_column(Date, nullable=True)
     created_on: Mapped[datetime] = mapped_column(DateTime, default=func.now())
     updated_on: Mapped[datetime] = mapped_column(DateTime, default=func.now(), onupdate=func.now())
@@ -37,8 +40,45 @@ class SpimexTradingResults(BaseModel):
             f"volume={self.volume}",
             f"total={self.total}",
             f"count={self.count}",
+            f"unit='{self.unit}'",
             f"date={self.date}",
             f"created_on={self.created_on}",
             f"updated_on={self.updated_on}",
         ]
         return f"<SpimexTradingResults({', '.join(fields)})>"
+
+
+class BackfillCheckpoint(BaseModel):
+    __tablename__ = "backfill_checkpoints"
+
+    shard: Mapped[str] = mapped_column(String(32), primary_key=True)
+    date_start: Mapped[datetime] = mapped_column(Date, nullable=False)
+    date_end: Mapped[datetime] = mapped_column(Date, nullable=False)
+    rows: Mapped[int] = mapped_column(Integer, nullable=False)
+    completed_on: Mapped[datetime] = mapped_column(DateTime, default=func.now())
+
+
+class KnownBulletin(BaseModel):
+    __tablename__ = "known_bulletins"
+
+    url: Mapped[str] = mapped_column(String(500), primary_key=True)
+    published_on: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+    discovered_on: Mapped[datetime] = mapped_column(DateTime, default=func.now())
+
+
+class ListingState(BaseModel):
+    __tablename__ = "listing_state"
+
+    url: Mapped[str] = mapped_column(String(250), primary_key=True)
+    etag: Mapped[str | None] = mapped_column(String(250), nullable=True)
+    last_modified: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    newest: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    checked_on: Mapped[datetime] = mapped_column(DateTime, default=func.now(), onupdate=func.now())
+
+
+class TradingDateSource(BaseModel):
+    __tablename__ = "trading_date_sources"
+
+    date: Mapped[datetime] = mapped_column(Date, primary_key=True)
+    bulletin: Mapped[str] = mapped_column(String(14), nullable=False)
+    loaded_on: Mapped[datetime] = mapped_column(DateTime, default=func.now(), onupdate=func.now())
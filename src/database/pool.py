@@ -0,0 +1,56 @@
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, cast
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, ConnectionPoolEntry
+
+from src.logger import logger
+
+
+@dataclass
+class PoolStats:
+    checkouts: int = 0
+    timeouts: int = 0
+    wait_total: float = 0.0
+    wait_max: float = 0.0
+
+    def record(self, wait: float) -> None:
+        self.checkouts += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+
+    @property
+    def wait_avg(self) -> float:
+        return self.wait_total / self.checkouts if self.checkouts else 0.0
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self) -> ConnectionPoolEntry:
+        started = time.perf_counter()
+        try:
+            entry = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.timeouts += 1
+            logger.info(f"[Pool] Пул исчерпан: {self.checkedout()} соединений заняты.")
+            raise
+        self.stats.record(time.perf_counter() - started)
+        return entry
+
+    def recreate(self) -> "InstrumentedPool":
+        pool = cast(InstrumentedPool, super().recreate())
+        pool.stats = self.stats
+        return pool
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "size": self.size(),
+            "checked_out": self.checkedout(),
+            "overflow": self.overflow(),
+            **asdict(self.stats),
+            "wait_avg": self.stats.wait_avg,
+        }
@@ -0,0 +1,76 @@
+import asyncio
+import time
+from collections.abc import Callable
+
+from sqlalchemy import make_url, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from src.logger import logger
+
+
+class ReplicaRouter:
+    def __init__(
+        self,
+        urls: list[str],
+        engine_factory: Callable[[str], AsyncEngine],
+        check_interval: float = 5.0,
+        check_timeout: float = 1.0,
+    ) -> None:
+        self.urls = urls
+        self.engine_factory = engine_factory
+        self.check_interval = check_interval
+        self.check_timeout = check_timeout
+        self.engines: dict[str, AsyncEngine] = {}
+        self.session_makers: dict[str, async_sessionmaker[AsyncSession]] = {}
+        self.healthy = set(urls)
+        self._checked: float | None = None
+        self._next = 0
+        self._lock = asyncio.Lock()
+
+    def engine(self, url: str) -> AsyncEngine:
+        if url not in self.engines:
+            self.engines[url] = self.engine_factory(url)
+        return self.engines[url]
+
+    def session_maker(self, url: str) -> async_sessionmaker[AsyncSession]:
+        if url not in self.session_makers:
+            self.session_makers[url] = async_sessionmaker(bind=self.engine(url), expire_on_commit=False)
+        return self.session_makers[url]
+
+    async def ping(self, url: str) -> bool:
+        try:
+            async with asyncio.timeout(self.check_timeout), self.engine(url).connect() as conn:
+                await conn.execute(text("SELECT 1"))
+        except Exception as e:
+            logger.info(f"[Replica] Реплика {make_url(url).host} недоступна: {e!r}")
+            return False
+        return True
+
+    async def refresh(self) -> None:
+        if self._checked is not None and time.monotonic() - self._checked < self.check_interval:
+            return
+        async with self._lock:
+            if self._checked is not None and time.monotonic() - self._checked < self.check_interval:
+                return
+            results = await asyncio.gather(*(self.ping(url) for url in self.urls))
+            self.healthy = {url for url, ok in zip(self.urls, results, strict=True) if ok}
+            self._checked = time.monotonic()
+
+    def mark_down(self, url: str) -> None:
+        self.healthy.discard(url)
+        logger.info(f"[Replica] Реплика {make_url(url).host} исключена до следующей проверки.")
+
+    async def pick(self) -> str | None:
+        await self.refresh()
+        healthy = [url for url in self.urls if url in self.healthy]
+        if not healthy:
+            return None
+        self._next += 1
+        return healthy[self._next % len(healthy)]
+
+    async def dispose(self) -> None:
+        engines = list(self.engines.values())
+        self.engines.clear()
+        self.session_makers.clear()
+        for engine in engines:
+            await engine.dispose()
@@ -0,0 +1,148 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.database.connection import get_async_session_maker
+from src.database.models import BackfillCheckpoint
+from src.logger import logger
+from src.processing.data_parser import SpimexParser
+from src.processing.data_scraper import SpimexScraper
+from src.processing.db_loader import SpimexLoader
+from src.processing.db_updater import CONFIG, UpdaterConfig, create_tables, latest_trading_date, publish_load
+
+
+@dataclass(frozen=True)
+class Shard:
+    start: date
+    end: date
+
+    @property
+    def key(self) -> str:
+        return f"{self.start.isoformat()}_{self.end.isoformat()}"
+
+
+def add_months(value: date, months: int) -> date:
+    month = value.month - 1 + months
+    return date(value.year + month // 12, month % 12 + 1, 1)
+
+
+def plan_shards(date_start: date, date_end: date, months: int = 1) -> list[Shard]:
+    shards: list[Shard] = []
+    start = date_start
+    while start <= date_end:
+        end = min(add_months(start.replace(day=1), months) - timedelta(days=1), date_end)
+        shards.append(Shard(start, end))
+        start = end + timedelta(days=1)
+    return shards
+
+
+class BackfillPlanner:
+    def __init__(
+        self,
+        date_start: date,
+        date_end: date,
+        shard_months: int = 1,
+        max_parallel_shards: int = 2,
+        config: UpdaterConfig = CONFIG,
+        sessionmaker: async_sessionmaker[AsyncSession] | None = None,
+    ) -> None:
+        self.shards = plan_shards(date_start, date_end, shard_months)
+        self.max_parallel_shards = max_parallel_shards
+        self.config = config
+        self.sessionmaker = sessionmaker or get_async_session_maker("ingest")
+        self.completed: dict[str, int] = {}
+        self.failed: dict[str, str] = {}
+        self.latest_date: date | None = None
+
+    async def pending_shards(self) -> list[Shard]:
+        async with self.sessionmaker() as session:
+            done = set(await session.scalars(select(BackfillCheckpoint.shard)))
+        return [shard for shard in self.shards if shard.key not in done]
+
+    async def load_shard(self, shard: Shard) -> int:
+        scraper = SpimexScraper(
+            datetime.combine(shard.start, datetime.min.time()),
+            datetime.combine(shard.end, datetime.max.time()),
+            self.config.workers,
+            self.config.directory,
+            self.config.max_concurrent,
+            self.config.in_memory,
+            self.config.persist_files,
+        )
+        await scraper.scrape()
+        if scraper.downloader.failed_files:
+            raise RuntimeError(f"не скачано {len(scraper.downloader.failed_files)} бюллетеней")
+
+        parser = SpimexParser(
+            scraper.scraped_files, quarantine_dir=self.config.quarantine_dir, sections=self.config.sections
+        )
+        parser.parse()
+        if parser.parsed_df is None:
+            if parser.failed:
+                raise RuntimeError(f"все {len(parser.failed)} бюллетеней шарда в карантине")
+            return 0
+
+        loader = SpimexLoader(
+            self.sessionmaker,
+            parser.parsed_df,
+            self.config.update_on_conflict,
+            self.config.chunk_size,
+            self.config.max_parallel_chunks,
+            replace_dates=True,
+            staged=True,
+        )
+        rows = await loader.load()
+        latest_date = latest_trading_date(parser.parsed_df)
+        if latest_date is not None and (self.latest_date is None or latest_date > self.latest_date):
+            self.latest_date = latest_date
+        if parser.failed:
+            raise RuntimeError(f"загружено {rows} строк, в карантине {len(parser.failed)} бюллетеней")
+        return rows
+
+    async def checkpoint(self, shard: Shard, rows: int) -> None:
+        async with self.sessionmaker() as session:
+            session.add(BackfillCheckpoint(shard=shard.key, date_start=shard.start, date_end=shard.end, rows=rows))
+            await session.commit()
+
+    async def run(self) -> dict[str, int]:
+        await create_tables()
+        pending = await self.pending_shards()
+        skipped = len(self.shards) - len(pending)
+        logger.info(f"[Backfill] Шардов: {len(self.shards)}, уже загружено: {skipped}, осталось: {len(pending)}.")
+
+        semaphore = asyncio.Semaphore(self.max_parallel_shards)
+        started = time.perf_counter()
+
+        async def run_shard(shard: Shard) -> None:
+            async with semaphore:
+                logger.info(f"[Backfill] Шард {shard.start} — {shard.end}: старт.")
+                try:
+                    rows = await self.load_shard(shard)
+                    await self.checkpoint(shard, rows)
+                except Exception as e:
+                    self.failed[shard.key] = str(e)
+                    logger.info(f"[Backfill] Шард {shard.start} — {shard.end}: ошибка: {e}")
+                    return
+                self.completed[shard.key] = rows
+
+            finished = len(self.completed) + len(self.failed)
+            elapsed = time.perf_counter() - started
+            eta = elapsed / finished * (len(pending) - finished)
+            logger.info(
+                f"[Backfill] Шард {shard.start} — {shard.end}: {rows} строк. "
+                f"Прогресс {skipped + finished}/{len(self.shards)}, прошло {elapsed:.0f} с, осталось ~{eta:.0f} с."
+            )
+
+        await asyncio.gather(*(run_shard(shard) for shard in pending))
+        if self.latest_date is not None:
+            await publish_load(self.latest_date)
+
+        logger.info(
+            f"[Backfill] Загружено шардов: {len(self.completed)}, строк: {sum(self.completed.values())}, "
+            f"ошибок: {len(self.failed)}."
+        )
+        return self.completed
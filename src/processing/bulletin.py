@@ -0,0 +1,58 @@
+import io
+import os
+import re
+import tarfile
+import zipfile
+from datetime import datetime
+
+
+class BulletinBuffer(io.BytesIO):
+    def __init__(self, name: str, data: bytes) -> None:
+        super().__init__(data)
+        self.name = name
+
+
+BulletinSource = str | BulletinBuffer
+
+TIMESTAMP_PATTERN = re.compile(r"oil_xls_(\d{14})")
+BULLETIN_SUFFIXES = (".xls", ".xlsx")
+
+
+def bulletin_name(source: BulletinSource) -> str:
+    return os.path.basename(source if isinstance(source, str) else source.name)
+
+
+def bulletin_timestamp(name: str) -> str:
+    match = TIMESTAMP_PATTERN.search(name)
+    return match.group(1) if match else ""
+
+
+def in_window(name: str, date_start: datetime, date_end: datetime) -> bool:
+    if not name.endswith(BULLETIN_SUFFIXES):
+        return False
+    timestamp = bulletin_timestamp(name)
+    return not timestamp or f"{date_start:%Y%m%d%H%M%S}" <= timestamp <= f"{date_end:%Y%m%d%H%M%S}"
+
+
+def read_bulletins(path: str, date_start: datetime, date_end: datetime) -> list[BulletinSource]:
+    if os.path.isdir(path):
+        names = sorted(name for name in os.listdir(path) if in_window(name, date_start, date_end))
+        return [os.path.join(path, name) for name in names]
+
+    bulletins: list[BulletinSource] = []
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                name = os.path.basename(info.filename)
+                if not info.is_dir() and in_window(name, date_start, date_end):
+                    bulletins.append(BulletinBuffer(name, archive.read(info)))
+    elif tarfile.is_tarfile(path):
+        with tarfile.open(path) as archive:
+            for member in archive.getmembers():
+                name = os.path.basename(member.name)
+                extracted = archive.extractfile(member) if member.isfile() else None
+                if extracted is not None and in_window(name, date_start, date_end):
+                    bulletins.append(BulletinBuffer(name, extracted.read()))
+    else:
+        raise ValueError(f"[Bulletin] {path} не является директорией или архивом zip/tar.")
+    return sorted(bulletins, key=bulletin_name)
@@ -1,28 +1,84 @@
 # pyright: basic
 
-from typing import Literal
+import os
+import shutil
+import traceback
+from contextlib import closing
+from typing import Literal, cast
 
 import pandas as pd
 
 from src.logger import logger
+from src.processing.bulletin import BulletinSource, bulletin_name, bulletin_timestamp
+from src.processing.sheet_reader import Sheet, SheetReader, open_sheet
+
+NUMERIC_COLUMNS = ["volume", "total", "count"]
+CATEGORY_COLUMNS = [
+    "unit",
+    "exchange_product_id",
+    "exchange_product_name",
+    "delivery_basis_name",
+    "oil_id",
+    "delivery_basis_id",
+    "delivery_type_id",
+]
+
+
+def compact_df(df: pd.DataFrame) -> pd.DataFrame:
+    for col in NUMERIC_COLUMNS:
+        if col in df.columns and not df[col].hasnans:
+            df[col] = pd.to_numeric(df[col].astype("int64"), downcast="integer")
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    return df
+
+
+def concat_compact(frames: list[pd.DataFrame]) -> pd.DataFrame:
+    for col in CATEGORY_COLUMNS:
+        if not all(col in f.columns and isinstance(f[col].dtype, pd.CategoricalDtype) for f in frames):
+            continue
+        categories = frames[0][col].cat.categories
+        for f in frames[1:]:
+            categories = categories.union(f[col].cat.categories)
+        for f in frames:
+            f[col] = f[col].cat.set_categories(categories)
+    return pd.concat(frames, ignore_index=True)
+
+
+def memory_per_1k_rows(df: pd.DataFrame) -> float:
+    if df.empty:
+        return 0.0
+    return df.memory_usage(deep=True).sum() / len(df) * 1000
 
 
 class SpimexParser:
     def __init__(
         self,
-        files: list[str] | None = None,
+        files: list[BulletinSource] | None = None,
         start_anchor: str = "Единица измерения: Метрическая тонна",
         end_anchor: str = "Итого:",
         date_anchor: str = "Дата торгов:",
         column_idx: dict[str, int] | None = None,
         engine: Literal["xlrd", "openpyxl", "odf", "pyxlsb", "calamine"] = "xlrd",
+        reader: Literal["pandas"] | SheetReader = "xlrd",
+        compact: bool = True,
+        quarantine_dir: str | None = None,
+        sections: dict[str, str] | None = None,
     ) -> None:
         self.files = files
         self.start_anchor = start_anchor
+        self.sections = sections or {start_anchor: start_anchor.split(":", 1)[-1].strip()}
         self.end_anchor = end_anchor
         self.date_anchor = date_anchor
         self.engine = engine
+        self.reader: Literal["pandas"] | SheetReader = reader
+        self.compact = compact
+        self.quarantine_dir = quarantine_dir
         self.parsed_df = None
+        self.parsed_files = 0
+        self.superseded: dict[str, str] = {}
+        self.failed: dict[str, str] = {}
         if column_idx is None:
             self.column_idx = {
                 "exchange_product_id": 1,
@@ -35,7 +91,7 @@ class SpimexParser:
         else:
             self.column_idx = column_idx
 
-    def create_df(self, file: str) -> pd.DataFrame:
+    def _extract_pandas(self, file: BulletinSource) -> tuple[pd.DataFrame, pd.Timestamp]:
         df = pd.read_excel(file, sheet_name=0, engine=self.engine)  # type: ignore
 
         date_cell = df.astype(str).stack()[lambda s: s.str.contains(self.date_anchor)].squeeze()
@@ -45,25 +101,137 @@ class SpimexParser:
             errors="raise",
         )
 
-        start_idx = df.isin([self.start_anchor]).any(axis=1).idxmax() + 3
-        end_idx = (df.iloc[start_idx:].isin([self.end_anchor]).any(axis=1)).idxmax()
+        header_rows = df.isin(list(self.sections)).any(axis=1)
+        end_rows = df.isin([self.end_anchor]).any(axis=1)
+        if not header_rows.any():
+            raise ValueError(f"[Parser] Не найдено начало таблицы ({', '.join(self.sections)}).")
+
+        tables = []
+        for header_idx in header_rows[header_rows].index:
+            unit = next(self.sections[v] for v in df.loc[header_idx] if isinstance(v, str) and v in self.sections)
+            start_idx = header_idx + 3
+            end_idx = end_rows.iloc[start_idx:].idxmax()
+            df_table = df.iloc[start_idx:end_idx, list(self.column_idx.values())].reset_index(drop=True)
+            df_table.columns = list(self.column_idx.keys())
+            df_table["unit"] = unit
+            tables.append(df_table)
+        return (tables[0] if len(tables) == 1 else pd.concat(tables, ignore_index=True)), trade_date
+
+    def _extract_sheet(self, sheet: Sheet) -> tuple[pd.DataFrame, pd.Timestamp]:
+        columns = list(self.column_idx.values())
+        date_cell: str | None = None
+        found: list[tuple[str, list[list]]] = []
+        records: list[list] | None = None
+        start_idx = 0
+        # Первая строка листа у pd.read_excel уходит в заголовок, поэтому якоря ищутся со второй.
+        for idx in range(1, len(sheet)):
+            row = sheet.row(idx)
+            if date_cell is None:
+                date_cell = next((v for v in row if isinstance(v, str) and self.date_anchor in v), None)
+            if records is not None:
+                if idx < start_idx:
+                    continue
+                if self.end_anchor in row:
+                    records = None
+                    if len(found) == len(self.sections) and date_cell is not None:
+                        break
+                    continue
+                records.append([sheet.cell(idx, col) for col in columns])
+                continue
+            unit = next((self.sections[v] for v in row if isinstance(v, str) and v in self.sections), None)
+            if unit is not None:
+                records = []
+                start_idx = idx + 3
+                found.append((unit, records))
+
+        if date_cell is None:
+            raise ValueError(f"[Parser] Не найдена дата торгов ({self.date_anchor}).")
+        if not found:
+            raise ValueError(f"[Parser] Не найдено начало таблицы ({', '.join(self.sections)}).")
+        if records is not None:
+            raise ValueError(f"[Parser] Не найден конец таблицы ({self.end_anchor}).")
+        trade_date = pd.to_datetime(date_cell.replace(self.date_anchor, "").strip(), dayfirst=True, errors="raise")
+
+        tables = []
+        for unit, rows in found:
+            df_table = pd.DataFrame(rows, columns=pd.Index(list(self.column_idx)), dtype=object).infer_objects()
+            df_table["unit"] = unit
+            tables.append(df_table)
+        return (tables[0] if len(tables) == 1 else pd.concat(tables, ignore_index=True)), trade_date
 
-        df_table = df.iloc[start_idx:end_idx, list(self.column_idx.values())].reset_index(drop=True)
-        df_table.columns = list(self.column_idx.keys())
+    def create_df(self, file: BulletinSource) -> pd.DataFrame:
+        if self.reader == "pandas":
+            df_table, trade_date = self._extract_pandas(file)
+        else:
+            with closing(open_sheet(file, self.reader)) as sheet:
+                df_table, trade_date = self._extract_sheet(sheet)
 
-        df_table = df_table[pd.to_numeric(df_table["count"], errors="coerce").notna()]  # type: ignore
+        df_table = cast(pd.DataFrame, df_table[pd.to_numeric(df_table["count"], errors="coerce").notna()])  # type: ignore
         df_table = df_table.reset_index(drop=True)
 
-        numeric_columns = ["volume", "total", "count"]
-        for col in numeric_columns:
+        for col in NUMERIC_COLUMNS:
             df_table[col] = pd.to_numeric(df_table[col], errors="coerce").astype("Int64")  # type: ignore
 
         df_table["date"] = trade_date
         df_table["oil_id"] = df_table["exchange_product_id"].str[:4]
         df_table["delivery_basis_id"] = df_table["exchange_product_id"].str[4:7]
         df_table["delivery_type_id"] = df_table["exchange_product_id"].str[-1]
+        df_table["bulletin"] = bulletin_timestamp(bulletin_name(file))
+
+        return compact_df(df_table) if self.compact else df_table
+
+    def drop_superseded(self, frames: list[tuple[str, pd.DataFrame]]) -> list[pd.DataFrame]:
+        newest: dict[object, tuple[str, pd.DataFrame]] = {}
+        undated: list[pd.DataFrame] = []
+        for name, df in frames:
+            if df.empty:
+                undated.append(df)
+                continue
+            trade_date = df["date"].iloc[0]
+            kept = newest.get(trade_date)
+            if kept is None:
+                newest[trade_date] = (name, df)
+                continue
+            if bulletin_timestamp(name) >= bulletin_timestamp(kept[0]):
+                kept, (name, df) = (name, df), kept
+                newest[trade_date] = kept
+            self.superseded[name] = kept[0]
+            logger.info(f"[Parser] Бюллетень {name} за {trade_date:%d.%m.%Y} заменен более новым {kept[0]}.")
 
-        return df_table
+        if self.superseded:
+            logger.info(f"[Parser] Пропущено {len(self.superseded)} бюллетеней, замененных более новыми.")
+        return [df for _, df in newest.values()] + undated
+
+    def quarantine(self, file: BulletinSource, error: Exception) -> None:
+        name = bulletin_name(file)
+        self.failed[name] = f"{type(error).__name__}: {error}"
+        logger.info(f"[Parser] Ошибка разбора {name}: {self.failed[name]}")
+        if self.quarantine_dir is None:
+            return
+
+        os.makedirs(self.quarantine_dir, exist_ok=True)
+        target = os.path.join(self.quarantine_dir, name)
+        try:
+            if isinstance(file, str):
+                shutil.move(file, target)
+            else:
+                with open(target, "wb") as f:
+                    f.write(file.getvalue())
+            with open(f"{target}.reason.txt", "w", encoding="utf-8") as f:
+                f.write(f"{self.failed[name]}\n\n")
+                f.write("".join(traceback.format_exception(error)))
+        except OSError as e:
+            logger.info(f"[Parser] Не удалось поместить {name} в карантин: {e}")
+            return
+        logger.info(f"[Parser] Бюллетень {name} перемещен в карантин: {target}")
+
+    def summary(self) -> dict[str, int]:
+        return {
+            "parsed": self.parsed_files,
+            "failed": len(self.failed),
+            "superseded": len(self.superseded),
+            "rows": 0 if self.parsed_df is None else len(self.parsed_df),
+        }
 
     def parse(self) -> None:
         try:
@@ -77,9 +245,22 @@ class SpimexParser:
             logger.info(f"[Parser] Ошибка при проверке файлов: {e}")
             return
 
-        logger.info(f"[Parser] Получено {len(self.files)} файлов.")
-        df_list = [self.create_df(f) for f in self.files]
-        combined_df = pd.concat(df_list, ignore_index=True)
-        logger.info(f"[Parser] Отпарсено {len(combined_df)} строк.")
+        frames: list[tuple[str, pd.DataFrame]] = []
+        for file in self.files:
+            try:
+                frames.append((bulletin_name(file), self.create_df(file)))
+            except Exception as e:
+                self.quarantine(file, e)
+        self.parsed_files = len(frames)
 
-        self.parsed_df = combined_df
+        df_list = self.drop_superseded(frames)
+        if df_list:
+            combined_df = concat_compact(df_list) if self.compact else pd.concat(df_list, ignore_index=True)
+            logger.info(f"[Parser] Отпарсено {len(combined_df)} строк.")
+            logger.info(f"[Parser] Память: {memory_per_1k_rows(combined_df) / 1024:.1f} КБ на 1000 строк.")
+            self.parsed_df = combined_df
+
+        summary = self.summary()
+        logger.info(
+            f"[Parser] Итог: разобрано {summary['parsed']} файлов, ошибок {summary['failed']}, строк {summary['rows']}."
+        )
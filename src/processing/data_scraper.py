@@ -1,7 +1,11 @@
 import asyncio
 import os
 import re
+import time
+from collections.abc import AsyncIterator
 from datetime import datetime
+from html import unescape
+from typing import Literal
 from urllib.parse import urljoin
 
 import aiofiles
@@ -9,15 +13,86 @@ import aiohttp
 from bs4 import BeautifulSoup, Tag
 
 from src.logger import logger
+from src.processing.bulletin import BulletinBuffer, BulletinSource
+from src.processing.rate_limiter import AdaptiveLimiter, backoff_delay
+
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+BULLETIN_SIGNATURES = (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", b"PK\x03\x04")
+LINK_PATTERN = re.compile(r"oil_xls_(\d{14})\.xls")
+CLASS_PATTERN = re.compile(r"""(?<=\s)class\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""", re.IGNORECASE)
+HREF_PATTERN = re.compile(r"""(?<=\s)href\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""", re.IGNORECASE)
+
+
+def parse_timestamp(timestamp: str) -> datetime:
+    return datetime(
+        int(timestamp[0:4]),
+        int(timestamp[4:6]),
+        int(timestamp[6:8]),
+        int(timestamp[8:10]),
+        int(timestamp[10:12]),
+        int(timestamp[12:14]),
+    )
+
+
+def _attribute(match: re.Match[str]) -> str:
+    return next(group for group in match.groups() if group is not None)
+
+
+def extract_hrefs_bs4(html: str) -> list[tuple[str, str]]:
+    soup = BeautifulSoup(html, "html.parser")
+    hrefs: list[tuple[str, str]] = []
+    for link in soup.find_all("a", class_="xls"):
+        if isinstance(link, Tag):
+            href = link.get("href")
+            if isinstance(href, str) and "oil_xls_" in href:
+                match = LINK_PATTERN.search(href)
+                if match:
+                    hrefs.append((href, match.group(1)))
+    return hrefs
+
+
+def extract_hrefs_scan(html: str) -> list[tuple[str, str]]:
+    hrefs: list[tuple[str, str]] = []
+    pos = html.find("oil_xls_")
+    while pos != -1:
+        start = html.rfind("<", 0, pos)
+        end = html.find(">", pos)
+        if start == -1 or end == -1 or html.rfind(">", start, pos) != -1:
+            pos = html.find("oil_xls_", pos + 8)
+            continue
+
+        tag = html[start:end]
+        if tag[1:2] in ("a", "A") and tag[2:3].isspace():
+            classes = CLASS_PATTERN.search(tag)
+            href = HREF_PATTERN.search(tag)
+            if classes and href and "xls" in _attribute(classes).split():
+                value = unescape(_attribute(href))
+                match = LINK_PATTERN.search(value)
+                if match:
+                    hrefs.append((value, match.group(1)))
+        pos = html.find("oil_xls_", end)
+    return hrefs
+
+
+EXTRACTORS = {"scan": extract_hrefs_scan, "bs4": extract_hrefs_bs4}
 
 
 class LinkCollector:
-    def __init__(self, start_date: datetime, end_date: datetime, queue: asyncio.Queue[str | None]) -> None:
+    def __init__(
+        self,
+        start_date: datetime,
+        end_date: datetime,
+        queue: asyncio.Queue[str | None] | None = None,
+        extractor: Literal["scan", "bs4"] = "scan",
+    ) -> None:
         self.start_date = start_date
         self.end_date = end_date
         self.base_url = "https://spimex.com"
         self.start_page = f"{self.base_url}/markets/oil_products/trades/results/"
         self.queue = queue
+        self.extract_hrefs = EXTRACTORS[extractor]
+        self.page_oldest: datetime | None = None
+        self.seen: set[str] = set()
 
     async def _extract_links(self, session: aiohttp.ClientSession, url: str) -> list[str]:
         logger.info(f"[Collector] Загружаю страницу: {url}")
@@ -31,87 +106,243 @@ class LinkCollector:
             logger.info(f"[Collector] Ошибка при запросе {url}: {e}")
             return []
 
-        soup = BeautifulSoup(text, "html.parser")
-        links: list[str] = []
+        return self.filter_links(self.extract_hrefs(text))
 
-        for link in soup.find_all("a", class_="xls"):
-            if isinstance(link, Tag):
-                href = link.get("href")
-                if isinstance(href, str) and "oil_xls_" in href:
-                    match = re.search(r"oil_xls_(\d{14})\.xls", href)
-                    if not match:
-                        continue
-                    timestamp_str = match.group(1)
-                    file_date = datetime.strptime(timestamp_str, "%Y%m%d%H%M%S")
-                    if self.start_date <= file_date <= self.end_date:
-                        query_index = href.find("?")
-                        href = href[:query_index] if query_index != -1 else href
-                        full_url = urljoin(self.base_url, href)
-                        logger.info(f"[Collector] Найдена ссылка: {full_url}")
-                        links.append(full_url)
+    def filter_links(self, hrefs: list[tuple[str, str]]) -> list[str]:
+        links: list[str] = []
+        for href, timestamp in hrefs:
+            try:
+                file_date = parse_timestamp(timestamp)
+            except ValueError:
+                continue
+            if self.page_oldest is None or file_date < self.page_oldest:
+                self.page_oldest = file_date
+            if self.start_date <= file_date <= self.end_date:
+                query_index = href.find("?")
+                href = href[:query_index] if query_index != -1 else href
+                full_url = urljoin(self.base_url, href)
+                logger.info(f"[Collector] Найдена ссылка: {full_url}")
+                links.append(full_url)
         return links
 
-    async def collect_links(self, workers: int) -> None:
+    def _drop_duplicates(self, links: list[str]) -> list[str]:
+        kept = [link for link in dict.fromkeys(links) if link not in self.seen]
+        self.seen.update(kept)
+        return kept
+
+    async def iter_links(self) -> AsyncIterator[list[str]]:
         page = 1
-        count = 0
 
         async with aiohttp.ClientSession() as session:
             while True:
                 url = self.start_page + (f"?page=page-{page}" if page > 1 else "")
+                self.page_oldest = None
                 page_links = await self._extract_links(session, url)
-                if not page_links:
+                found = bool(page_links)
+                page_links = self._drop_duplicates(page_links)
+                newer_than_window = self.page_oldest is not None and self.page_oldest > self.end_date
+                if not found and not newer_than_window:
                     logger.info(f"[Collector] На странице {page} ссылки не найдены. Остановка.")
                     break
 
-                for link in page_links:
-                    await self.queue.put(link)
-                    count += 1
-                    logger.info(f"[Collector] Ссылка добавлена в очередь: {link}")
-
+                if page_links:
+                    yield page_links
+                if self.page_oldest is not None and self.page_oldest < self.start_date:
+                    logger.info(f"[Collector] Страница {page} старше начала периода. Остановка.")
+                    break
                 page += 1
 
+    async def get_links(self) -> list[str]:
+        return [link async for page_links in self.iter_links() for link in page_links]
+
+    async def collect_links(self, workers: int) -> None:
+        if self.queue is None:
+            raise ValueError("[Collector] Очередь для ссылок не задана.")
+
+        count = 0
+        async for page_links in self.iter_links():
+            for link in page_links:
+                await self.queue.put(link)
+                count += 1
+                logger.info(f"[Collector] Ссылка добавлена в очередь: {link}")
+
         for _ in range(workers):
             await self.queue.put(None)
         logger.info(f"[Collector] Всего добавлено {count} ссылок. В очередь отправлены сигналы завершения.")
 
 
+class DownloadError(Exception):
+    def __init__(self, reason: str, retry_after: float = 0.0, retryable: bool = True) -> None:
+        super().__init__(reason)
+        self.retry_after = retry_after
+        self.retryable = retryable
+
+
 class FileDownloader:
     def __init__(
         self,
         download_dir: str,
         max_concurrent: int,
-        queue: asyncio.Queue[str | None],
+        queue: asyncio.Queue[str | None] | None = None,
+        max_retries: int = 5,
+        timeout: aiohttp.ClientTimeout | None = None,
+        in_memory: bool = False,
+        persist: bool = True,
     ) -> None:
         self.download_dir = download_dir
         self.max_concurrent = max_concurrent
-        self.sem = asyncio.Semaphore(self.max_concurrent)
+        self.limiter = AdaptiveLimiter(initial_limit=self.max_concurrent)
         self.queue = queue
-        os.makedirs(download_dir, exist_ok=True)
-        self.downloaded_files: list[str] = []
+        self.max_retries = max_retries
+        self.timeout = timeout or aiohttp.ClientTimeout(total=300, sock_connect=10, sock_read=60)
+        self.in_memory = in_memory
+        self.persist = persist or not in_memory
+        if self.persist:
+            os.makedirs(download_dir, exist_ok=True)
+        self.downloaded_files: list[BulletinSource] = []
+        self.failed_files: dict[str, str] = {}
+
+    @staticmethod
+    def _has_valid_signature(filepath: str) -> bool:
+        with open(filepath, "rb") as f:
+            return f.read(8).startswith(BULLETIN_SIGNATURES)
+
+    @staticmethod
+    def _expected_size(resp: aiohttp.ClientResponse, offset: int) -> int | None:
+        if resp.headers.get("Content-Encoding", "identity") != "identity":
+            return None
+        content_range = resp.headers.get("Content-Range", "")
+        total = content_range.rpartition("/")[2]
+        if resp.status == 206 and total.isdigit():
+            return int(total)
+        if resp.content_length is not None:
+            return offset + resp.content_length
+        return None
+
+    def _check_status(self, resp: aiohttp.ClientResponse) -> None:
+        if resp.status in RETRYABLE_STATUSES:
+            self.limiter.on_overload()
+            retry_after = resp.headers.get("Retry-After", "")
+            raise DownloadError(f"HTTP {resp.status}", float(retry_after) if retry_after.isdigit() else 0.0)
+        if resp.status not in (200, 206, 416):
+            raise DownloadError(f"HTTP {resp.status}", retryable=False)
+
+    async def _fetch(self, session: aiohttp.ClientSession, url: str, filepath: str) -> None:
+        part_path = f"{filepath}.part"
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+        async with self.limiter.slot():
+            start = time.perf_counter()
+            try:
+                async with session.get(url, headers=headers, timeout=self.timeout) as resp:
+                    latency = time.perf_counter() - start
+                    self._check_status(resp)
+                    if resp.status == 416:
+                        os.remove(part_path)
+                        raise DownloadError("HTTP 416, докачка невозможна")
+
+                    if resp.status == 200:
+                        offset = 0
+                    elif offset:
+                        logger.info(f"[Downloader] Докачиваю {url} с {offset} байт.")
+                    expected_size = self._expected_size(resp, offset)
+
+                    async with aiofiles.open(part_path, "ab" if offset else "wb") as f:
+                        async for chunk in resp.content.iter_chunked(8192):
+                            await f.write(chunk)
+                    self.limiter.on_success(latency)
+            except (TimeoutError, aiohttp.ClientError) as e:
+                self.limiter.on_overload()
+                raise DownloadError(f"{type(e).__name__}: {e}")
+
+        size = os.path.getsize(part_path)
+        if expected_size is not None and size != expected_size:
+            raise DownloadError(f"получено {size} байт из {expected_size}")
+        if not self._has_valid_signature(part_path):
+            os.remove(part_path)
+            raise DownloadError("файл не является бюллетенем XLS", retryable=False)
+        os.replace(part_path, filepath)
+
+    async def _fetch_body(self, session: aiohttp.ClientSession, url: str) -> bytes:
+        async with self.limiter.slot():
+            start = time.perf_counter()
+            try:
+                async with session.get(url, timeout=self.timeout) as resp:
+                    latency = time.perf_counter() - start
+                    self._check_status(resp)
+                    if resp.status != 200:
+                        raise DownloadError(f"HTTP {resp.status}", retryable=False)
+                    expected_size = self._expected_size(resp, 0)
+                    body = await resp.read()
+                    self.limiter.on_success(latency)
+            except (TimeoutError, aiohttp.ClientError) as e:
+                self.limiter.on_overload()
+                raise DownloadError(f"{type(e).__name__}: {e}")
 
-    async def _download_file(self, session: aiohttp.ClientSession, url: str) -> None:
+        if expected_size is not None and len(body) != expected_size:
+            raise DownloadError(f"получено {len(body)} байт из {expected_size}")
+        if not body.startswith(BULLETIN_SIGNATURES):
+            raise DownloadError("файл не является бюллетенем XLS", retryable=False)
+        return body
+
+    async def _store(self, session: aiohttp.ClientSession, url: str, filepath: str) -> BulletinSource:
+        if not self.in_memory:
+            await self._fetch(session, url, filepath)
+            return filepath
+
+        body = await self._fetch_body(session, url)
+        if self.persist:
+            part_path = f"{filepath}.part"
+            async with aiofiles.open(part_path, "wb") as f:
+                await f.write(body)
+            os.replace(part_path, filepath)
+        return BulletinBuffer(os.path.basename(filepath), body)
+
+    async def _download_file(self, session: aiohttp.ClientSession, url: str) -> BulletinSource | None:
         filename = url.split("/")[-1].split("?")[0]
         filepath = os.path.join(self.download_dir, filename)
 
         if os.path.exists(filepath):
-            logger.info(f"[Downloader] Файл уже существует: {filepath}, пропускаем.")
-            return
+            if self._has_valid_signature(filepath):
+                logger.info(f"[Downloader] Файл уже существует: {filepath}, пропускаем скачивание.")
+                self.downloaded_files.append(filepath)
+                return filepath
+            logger.info(f"[Downloader] Файл {filepath} повреждён, скачиваю заново.")
+            os.remove(filepath)
 
         logger.info(f"[Downloader] Начинаю скачивание: {url}")
-        try:
-            async with session.get(url) as resp:
-                if resp.status == 200:
-                    async with aiofiles.open(filepath, "wb") as f:
-                        async for chunk in resp.content.iter_chunked(8192):
-                            await f.write(chunk)
-                    logger.info(f"[Downloader] Успешно скачан файл: {filepath}")
-                    self.downloaded_files.append(filepath)
-                else:
-                    logger.info(f"[Downloader] Ошибка {resp.status} при скачивании {url}")
-        except Exception as e:
-            logger.info(f"[Downloader] Ошибка при скачивании {url}: {e}")
+        error = DownloadError("попытки не выполнялись", retryable=False)
+        for attempt in range(self.max_retries + 1):
+            try:
+                bulletin = await self._store(session, url, filepath)
+                logger.info(f"[Downloader] Успешно скачан файл: {filepath}")
+                self.downloaded_files.append(bulletin)
+                return bulletin
+            except DownloadError as e:
+                error = e
+            except Exception as e:
+                error = DownloadError(f"{type(e).__name__}: {e}", retryable=False)
+
+            if not error.retryable or attempt == self.max_retries:
+                break
+
+            delay = max(error.retry_after, backoff_delay(attempt))
+            logger.info(f"[Downloader] Ошибка {error} при скачивании {url}, повтор через {delay:.1f} с.")
+            await asyncio.sleep(delay)
+
+        logger.info(f"[Downloader] Не удалось скачать {url}: {error}")
+        self.failed_files[url] = str(error)
+        return None
+
+    async def download(self, url: str) -> BulletinSource | None:
+        async with aiohttp.ClientSession() as session:
+            return await self._download_file(session, url)
 
     async def consume_queue(self, worker_id: int = 1) -> None:
+        if self.queue is None:
+            raise ValueError("[Downloader] Очередь для ссылок не задана.")
+
         async with aiohttp.ClientSession() as session:
             while True:
                 url = await self.queue.get()
@@ -121,8 +352,7 @@ class FileDownloader:
                     break
 
                 logger.info(f"[Worker-{worker_id}] Взял из очереди: {url}")
-                async with self.sem:
-                    await self._download_file(session, url)
+                await self._download_file(session, url)
 
                 self.queue.task_done()
                 logger.info(f"[Worker-{worker_id}] Завершил обработку: {url}")
@@ -136,13 +366,21 @@ class SpimexScraper:
         workers: int = 3,
         download_dir: str = "bulletins",
         max_concurrent: int = 5,
+        in_memory: bool = False,
+        persist: bool = True,
     ) -> None:
         self.download_dir = download_dir
         self.queue: asyncio.Queue[str | None] = asyncio.Queue()
         self.collector = LinkCollector(start_date=start_date, end_date=end_date, queue=self.queue)
-        self.downloader = FileDownloader(download_dir=download_dir, max_concurrent=max_concurrent, queue=self.queue)
+        self.downloader = FileDownloader(
+            download_dir=download_dir,
+            max_concurrent=max_concurrent,
+            queue=self.queue,
+            in_memory=in_memory,
+            persist=persist,
+        )
         self.workers = workers
-        self.scraped_files: list[str] = []
+        self.scraped_files: list[BulletinSource] = []
 
     async def scrape(self) -> None:
         logger.info("[Scraper] Запуск producer (сбор ссылок) и consumers (скачивание).")
@@ -155,5 +393,10 @@ class SpimexScraper:
         await asyncio.gather(producer, *consumers)
 
         self.scraped_files = self.downloader.downloaded_files.copy()
-        logger.info(f"[Scraper] Всего загружено {len(self.scraped_files)} файлов в директорию {self.download_dir}.")
+        target = f"директорию {self.download_dir}" if self.downloader.persist else "память"
+        logger.info(f"[Scraper] Всего загружено {len(self.scraped_files)} файлов в {target}.")
+        if self.downloader.failed_files:
+            logger.info(f"[Scraper] Не удалось загрузить {len(self.downloader.failed_files)} файлов:")
+            for url, reason in self.downloader.failed_files.items():
+                logger.info(f"[Scraper] {url}: {reason}")
         logger.info("[Scraper] Все задачи завершены.")
@@ -1,15 +1,22 @@
 # pyright: basic
 
 import asyncio
-from datetime import datetime
+from collections.abc import Iterator
+from datetime import date, datetime
+from itertools import chain, repeat
 from typing import cast
 
 import pandas as pd
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from src.database.models import SpimexTradingResults
+from src.database.models import SpimexTradingResults, TradingDateSource
 from src.logger import logger
 
+STAGING_TABLE = "spimex_trading_results_staging"
+DATE_LOCK = text("SELECT pg_advisory_xact_lock(hashtext(:table), :day)")
+
 
 class SpimexLoader:
     def __init__(
@@ -19,12 +26,16 @@ class SpimexLoader:
         update_on_conflict: bool = False,
         chunk_size: int = 1000,
         max_parallel_chunks: int = 5,
+        replace_dates: bool = False,
+        staged: bool = False,
     ) -> None:
         self.sessionmaker = sessionmaker
         self.df = df
         self.update_on_conflict = update_on_conflict
         self.chunk_size = chunk_size
         self.max_parallel_chunks = max_parallel_chunks
+        self.replace_dates = replace_dates
+        self.staged = staged
         self.model = SpimexTradingResults
         try:
             if df is None:
@@ -36,34 +47,145 @@ class SpimexLoader:
             logger.info(f"[Loader] Ошибка при загрузке данных: {e}")
             return
 
-    async def load(self) -> None:
+    @staticmethod
+    def _column_values(series: pd.Series) -> list:
+        if series.name == "date":
+            series = pd.to_datetime(series).dt.date
+        values = series.tolist()
+        if series.hasnans:
+            return [None if pd.isna(v) else v for v in values]
+        return values
+
+    def _iter_chunks(self, df: pd.DataFrame, columns: list[str], now: datetime) -> Iterator[tuple[int, list[tuple]]]:
+        for idx, row in enumerate(range(0, len(df), self.chunk_size)):
+            part = df.iloc[row : row + self.chunk_size]
+            arrays = [self._column_values(part[col]) for col in columns]
+            yield idx, list(zip(*arrays, repeat(now, len(part)), repeat(now, len(part)), strict=True))
+
+    @staticmethod
+    def _date_sources(df: pd.DataFrame) -> dict[date, str]:
+        if "bulletin" not in df.columns:
+            return {}
+        bulletins = df["bulletin"].astype(str).groupby(pd.to_datetime(df["date"]).dt.date).max()
+        return {day: bulletin for day, bulletin in cast(dict[date, str], bulletins.to_dict()).items() if bulletin}
+
+    @staticmethod
+    async def _stale_dates(session: AsyncSession, sources: dict[date, str]) -> list[date]:
+        if not sources:
+            return []
+        result = await session.execute(
+            select(TradingDateSource.date, TradingDateSource.bulletin).where(TradingDateSource.date.in_(list(sources)))
+        )
+        stale: list[date] = []
+        for day, bulletin in result.tuples():
+            if bulletin > sources[day]:
+                stale.append(day)
+                logger.info(f"[Loader] Дата {day:%d.%m.%Y} загружена из более нового бюллетеня {bulletin}, пропускаем.")
+        return sorted(stale)
+
+    @staticmethod
+    async def _record_sources(session: AsyncSession, sources: dict[date, str]) -> None:
+        if not sources:
+            return
+        statement = insert(TradingDateSource).values(
+            [{"date": day, "bulletin": bulletin} for day, bulletin in sources.items()]
+        )
+        await session.execute(
+            statement.on_conflict_do_update(
+                index_elements=[TradingDateSource.date],
+                set_={"bulletin": statement.excluded.bulletin, "loaded_on": func.now()},
+            )
+        )
+
+    async def _delete_dates(self, df: pd.DataFrame) -> pd.DataFrame:
+        days = pd.to_datetime(df["date"]).dt.date
+        async with self.sessionmaker() as session:
+            sources = self._date_sources(df)
+            stale = await self._stale_dates(session, sources)
+            df = cast(pd.DataFrame, df[~days.isin(stale)])
+            dates = [day for day in days.unique().tolist() if day not in stale]
+            result = await session.execute(delete(self.model).where(self.model.date.in_(dates)))
+            await self._record_sources(session, {day: sources[day] for day in dates if day in sources})
+            await session.commit()
+        logger.info(f"[Loader] Удалено {result.rowcount} строк за {len(dates)} дат перед загрузкой.")
+        return df
+
+    async def load_staged(self, df: pd.DataFrame, keys: list[str], rows: Iterator[tuple]) -> int:
+        table = self.model.__tablename__
+        column_list = ", ".join(keys)
+        async with self.sessionmaker() as session:
+            try:
+                await session.execute(
+                    text(
+                        f"CREATE TEMP TABLE {STAGING_TABLE} ON COMMIT DROP AS "
+                        f"SELECT {column_list} FROM {table} WITH NO DATA"
+                    )
+                )
+                connection = await session.connection()
+                raw_connection = await connection.get_raw_connection()
+                driver_connection = raw_connection.driver_connection
+                assert driver_connection is not None
+                await driver_connection.copy_records_to_table(STAGING_TABLE, records=rows, columns=keys)
+                logger.info(f"[Loader] Во временную таблицу скопировано {len(df)} строк.")
+
+                loaded = len(df)
+                if self.replace_dates:
+                    days = pd.to_datetime(df["date"]).dt.date
+                    dates = sorted(days.unique().tolist())
+                    for day in dates:
+                        await session.execute(DATE_LOCK, {"table": table, "day": day.toordinal()})
+                    sources = self._date_sources(df)
+                    stale = await self._stale_dates(session, sources)
+                    if stale:
+                        await session.execute(
+                            text(f"DELETE FROM {STAGING_TABLE} WHERE date = ANY(:dates)"), {"dates": stale}
+                        )
+                        dates = [day for day in dates if day not in stale]
+                        loaded -= int(days.isin(stale).sum())
+                    result = await session.execute(delete(self.model).where(self.model.date.in_(dates)))
+                    logger.info(f"[Loader] Удалено {result.rowcount} строк за {len(dates)} дат перед загрузкой.")
+                    await self._record_sources(session, {day: sources[day] for day in dates if day in sources})
+                await session.execute(
+                    text(f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {STAGING_TABLE}")
+                )
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                logger.info(f"[Loader] Ошибка при загрузке через временную таблицу, изменения отменены: {e}")
+                raise
+
+        logger.info(f"[Loader] Успешно загружено {loaded} строк одной транзакцией.")
+        return loaded
+
+    async def load(self) -> int:
         model_columns = {c.name for c in self.model.__table__.columns}
 
         df = cast(pd.DataFrame, self.df)
-        df_filtered = df.loc[:, df.columns.intersection(model_columns)]
-        df_filtered["date"] = pd.to_datetime(df_filtered["date"]).dt.date
-
-        now = datetime.now()
-        df_filtered["created_on"] = now
-        df_filtered["updated_on"] = now
-
-        df_filtered = df_filtered.where(pd.notnull(df_filtered), None)
-        total_rows = len(df_filtered)
+        columns = [col for col in df.columns if col in model_columns]
+        keys = [*columns, "created_on", "updated_on"]
+        total_rows = len(df)
         logger.info(f"[Loader] Получено {total_rows} строк для загрузки.")
 
-        records = df_filtered.to_dict(orient="records")
+        if self.staged:
+            if self.update_on_conflict:
+                logger.info("[Loader] update_on_conflict не применяется к загрузке через временную таблицу.")
+            chunks = self._iter_chunks(df, columns, datetime.now())
+            return await self.load_staged(df, keys, chain.from_iterable(chunk for _, chunk in chunks))
+
+        if self.replace_dates:
+            df = await self._delete_dates(df)
 
-        sem = asyncio.Semaphore(self.max_parallel_chunks)
+        chunks = self._iter_chunks(df, columns, datetime.now())
 
-        async def process_chunk(idx: int, chunk: list[dict]) -> int:
-            async with sem, self.sessionmaker() as session:
+        async def process_chunk(idx: int, chunk: list[tuple]) -> int:
+            async with self.sessionmaker() as session:
                 logger.info(f"[Loader] Получен чанк {idx + 1}: {len(chunk)} строк.")
                 try:
+                    objects = [self.model(**dict(zip(keys, row, strict=True))) for row in chunk]
                     if self.update_on_conflict:
-                        for record in chunk:
-                            await session.merge(self.model(**record))
+                        for obj in objects:
+                            await session.merge(obj)
                     else:
-                        objects = [self.model(**record) for record in chunk]
                         session.add_all(objects)
 
                     await session.commit()
@@ -74,12 +196,14 @@ class SpimexLoader:
                     logger.info(f"[Loader] Ошибка при загрузке чанка {idx + 1}: {e}")
                     raise
 
-        tasks = []
-        for row in range(0, len(records), self.chunk_size):
-            chunk = records[row : row + self.chunk_size]
-            tasks.append(process_chunk(row // self.chunk_size, chunk))
+        async def consume_chunks() -> int:
+            processed = 0
+            for idx, chunk in chunks:
+                processed += await process_chunk(idx, chunk)
+            return processed
 
-        results = await asyncio.gather(*tasks)
+        results = await asyncio.gather(*(consume_chunks() for _ in range(self.max_parallel_chunks)))
         total_processed = sum(results)
 
         logger.info(f"[Loader] Успешно загружено {total_processed} строк.")
+        return total_processed
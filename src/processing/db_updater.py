@@ -1,63 +1,240 @@
+import asyncio
+import os
 import time
-from dataclasses import dataclass
-from datetime import datetime
+from collections.abc import Collection, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any, Literal, cast
 
-from src.database.connection import async_engine, async_session_maker
-from src.database.models import BaseModel
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+
+from src.cache import bump_data_version, clear_response_cache, notify_loaded, publish_latest_date
+from src.database.connection import create_worker_engine, get_async_engine, get_async_session_maker
+from src.database.models import DEFAULT_UNIT, BaseModel
 from src.logger import logger
+from src.processing.bulletin import BulletinSource, read_bulletins
 from src.processing.data_parser import SpimexParser
-from src.processing.data_scraper import SpimexScraper
+from src.processing.data_scraper import FileDownloader, LinkCollector, SpimexScraper
 from src.processing.db_loader import SpimexLoader
+from src.processing.listing_watcher import ListingWatcher
+from src.profiling import profile_phase, profile_run
 
 
 @dataclass(frozen=True)
 class UpdaterConfig:
     date_start: datetime = datetime(2023, 1, 1)
-    date_end: datetime = datetime.today()
+    date_end: datetime = field(default_factory=datetime.today)
     directory: str = "bulletins"
+    quarantine_dir: str = "quarantine"
+    sections: dict[str, str] | None = None
     workers: int = 20
     max_concurrent: int = 5
+    in_memory: bool = False
+    persist_files: bool = True
+    # Учитывается только при staged_load=False: загрузка через временную таблицу заменяет даты целиком.
     update_on_conflict: bool = False
     chunk_size: int = 5000
     max_parallel_chunks: int = 5
+    replace_dates: bool = True
+    staged_load: bool = True
 
 
 CONFIG = UpdaterConfig()
 
+Stage = Literal["scrape", "parse", "load"]
+STAGES: tuple[Stage, ...] = ("scrape", "parse", "load")
+STAGE_LABELS = {"scrape": "Скрапинг", "parse": "Парсинг", "load": "Загрузка"}
+PARSED_FILE = "parsed.pkl"
+SCHEMA_UPGRADES = (
+    "ALTER TABLE spimex_trading_results "
+    f"ADD COLUMN IF NOT EXISTS unit varchar(50) NOT NULL DEFAULT '{DEFAULT_UNIT}'",
+)
+
 
-async def update_database():
-    async with async_engine.begin() as conn:
+async def create_tables(engine: AsyncEngine | None = None) -> None:
+    async with (engine or get_async_engine("ingest")).begin() as conn:
         await conn.run_sync(BaseModel.metadata.create_all)
+        for statement in SCHEMA_UPGRADES:
+            await conn.execute(text(statement))
+
+
+async def publish_load(latest_date: date) -> None:
+    try:
+        await clear_response_cache()
+        await publish_latest_date(latest_date)
+        await bump_data_version()
+        await notify_loaded(latest_date)
+    except Exception as e:
+        logger.info(f"[Updater] Не удалось опубликовать загрузку данных: {e}")
+        return
+
+    from src.worker.app import celery_app
 
     try:
-        scraper = SpimexScraper(
-            CONFIG.date_start, CONFIG.date_end, CONFIG.workers, CONFIG.directory, CONFIG.max_concurrent
+        await asyncio.to_thread(celery_app.send_task, "src.worker.tasks.warm_cache")  # type: ignore[reportUnknownMemberType, reportUnknownArgumentType]
+    except Exception as e:
+        logger.info(f"[Updater] Не удалось запустить прогрев кэша: {e}")
+
+
+def latest_trading_date(df: pd.DataFrame | None) -> date | None:
+    if df is None or df.empty:
+        return None
+    latest = cast(pd.Timestamp, pd.to_datetime(df["date"]).max())  # type: ignore[reportUnknownMemberType]
+    return latest.date()
+
+
+async def ingest_bulletin(url: str) -> tuple[int, date | None]:
+    filename = url.split("/")[-1].split("?")[0]
+    engine = create_worker_engine()
+    sessionmaker = async_sessionmaker(bind=engine, expire_on_commit=False)
+    watcher = ListingWatcher(sessionmaker)
+    try:
+        async with sessionmaker() as session:
+            if await watcher.known_links(session, [url]):
+                logger.info(f"[Updater] Бюллетень {filename} уже загружен, пропускаем.")
+                return 0, None
+
+        downloader = FileDownloader(
+            CONFIG.directory, CONFIG.max_concurrent, in_memory=CONFIG.in_memory, persist=CONFIG.persist_files
         )
-        start_scrape = time.perf_counter()
-        await scraper.scrape()
-        end_scrape = time.perf_counter()
-        scrape_time = end_scrape - start_scrape
-        files = scraper.scraped_files
-
-        parser = SpimexParser(files)
-        start_parse = time.perf_counter()
+        bulletin = await downloader.download(url)
+        if bulletin is None:
+            raise RuntimeError(f"[Updater] Не удалось скачать {url}: {downloader.failed_files.get(url)}")
+
+        parser = SpimexParser([bulletin], quarantine_dir=CONFIG.quarantine_dir, sections=CONFIG.sections)
         parser.parse()
-        end_parse = time.perf_counter()
-        parse_time = end_parse - start_parse
+        if parser.failed:
+            raise RuntimeError(f"[Updater] Бюллетень {filename} не разобран: {parser.failed[filename]}")
+        loader = SpimexLoader(
+            sessionmaker,
+            parser.parsed_df,
+            CONFIG.update_on_conflict,
+            CONFIG.chunk_size,
+            CONFIG.max_parallel_chunks,
+            CONFIG.replace_dates,
+            CONFIG.staged_load,
+        )
+        rows = await loader.load()
+        await watcher.record([url])
+        return rows, latest_trading_date(parser.parsed_df)
+    finally:
+        await engine.dispose()
+
+
+@contextmanager
+def timed_stage(timings: dict[str, float], stage: Stage) -> Iterator[None]:
+    start = time.perf_counter()
+    with profile_phase(stage):
+        yield
+    timings[stage] = time.perf_counter() - start
+
+
+async def run_stages(
+    config: UpdaterConfig = CONFIG,
+    stages: Collection[Stage] = STAGES,
+    source: str | None = None,
+    parsed_path: str | None = None,
+    dry_run: bool = False,
+) -> dict[str, Any]:
+    timings: dict[str, float] = {}
+    parsed_path = parsed_path or os.path.join(config.directory, PARSED_FILE)
+    report: dict[str, Any] = {
+        "date_start": config.date_start.isoformat(),
+        "date_end": config.date_end.isoformat(),
+        "stages": [stage for stage in STAGES if stage in stages],
+        "dry_run": dry_run,
+        "timings": timings,
+    }
+    files: list[BulletinSource] = []
+    parsed_df: pd.DataFrame | None = None
+
+    if "load" in stages and not dry_run:
+        await create_tables()
+
+    if "scrape" in stages:
+        with timed_stage(timings, "scrape"):
+            if dry_run:
+                links = await LinkCollector(config.date_start, config.date_end).get_links()
+                report["links"] = len(links)
+            else:
+                scraper = SpimexScraper(
+                    config.date_start,
+                    config.date_end,
+                    config.workers,
+                    config.directory,
+                    config.max_concurrent,
+                    config.in_memory,
+                    config.persist_files,
+                )
+                await scraper.scrape()
+                files = scraper.scraped_files
+                report["downloaded"] = len(files)
+                report["download_failed"] = len(scraper.downloader.failed_files)
+
+    if "parse" in stages:
+        if "scrape" not in stages or dry_run:
+            files = read_bulletins(source or config.directory, config.date_start, config.date_end)
+        with timed_stage(timings, "parse"):
+            parser = SpimexParser(
+                files, quarantine_dir=None if dry_run else config.quarantine_dir, sections=config.sections
+            )
+            parser.parse()
+        report["parse"] = parser.summary()
         parsed_df = parser.parsed_df
+        if parsed_df is not None and "load" not in stages and not dry_run:
+            os.makedirs(os.path.dirname(parsed_path) or ".", exist_ok=True)
+            parsed_df.to_pickle(parsed_path)
+            logger.info(f"[Updater] Результат парсинга сохранен в {parsed_path}.")
+    elif "load" in stages:
+        parsed_df = cast(pd.DataFrame, pd.read_pickle(parsed_path))
+        logger.info(f"[Updater] Загружен результат парсинга из {parsed_path}.")
+
+    if "load" in stages:
+        if parsed_df is None:
+            raise ValueError("нет разобранных бюллетеней для загрузки")
+        if dry_run:
+            report["rows"] = len(parsed_df)
+            logger.info(f"[Updater] Пробный запуск: к загрузке {len(parsed_df)} строк.")
+            return report
 
         loader = SpimexLoader(
-            async_session_maker, parsed_df, CONFIG.update_on_conflict, CONFIG.chunk_size, CONFIG.max_parallel_chunks
+            get_async_session_maker("ingest"),
+            parsed_df,
+            config.update_on_conflict,
+            config.chunk_size,
+            config.max_parallel_chunks,
+            config.replace_dates,
+            config.staged_load,
         )
-        start_load = time.perf_counter()
-        await loader.load()
-        end_load = time.perf_counter()
-        load_time = end_load - start_load
-
-        logger.info(f"[Timer] Скрапинг: {scrape_time:.2f} секунд.")
-        logger.info(f"[Timer] Парсинг: {parse_time:.2f} секунд.")
-        logger.info(f"[Timer] Загрузка: {load_time:.2f} секунд.")
-        logger.info(f"[Timer] Всего: {scrape_time + parse_time + load_time:.2f} секунд.")
-    except Exception:
-        logger.info("[Updater] Ошибка при обновлении базы данных.")
-        return
+        with timed_stage(timings, "load"):
+            report["rows"] = await loader.load()
+
+        latest_date = latest_trading_date(parsed_df)
+        if latest_date is not None:
+            await publish_load(latest_date)
+    return report
+
+
+async def update_database(
+    config: UpdaterConfig = CONFIG,
+    stages: Collection[Stage] = STAGES,
+    source: str | None = None,
+    parsed_path: str | None = None,
+    dry_run: bool = False,
+) -> dict[str, Any] | None:
+    try:
+        with profile_run("update_database"):
+            report = await run_stages(config, stages, source, parsed_path, dry_run)
+
+        timings = report["timings"]
+        for stage, label in STAGE_LABELS.items():
+            if stage in timings:
+                logger.info(f"[Timer] {label}: {timings[stage]:.2f} секунд.")
+        logger.info(f"[Timer] Всего: {sum(timings.values()):.2f} секунд.")
+        return report
+    except Exception as e:
+        logger.info(f"[Updater] Ошибка при обновлении базы данных: {e}")
+        return None
@@ -0,0 +1,115 @@
+from datetime import datetime
+from urllib.parse import urljoin
+
+import aiohttp
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.database.connection import get_async_session_maker
+from src.database.models import KnownBulletin, ListingState, SpimexTradingResults
+from src.logger import logger
+from src.processing.bulletin import bulletin_timestamp
+from src.processing.data_scraper import LinkCollector, parse_timestamp
+
+
+class ListingWatcher:
+    def __init__(
+        self,
+        sessionmaker: async_sessionmaker[AsyncSession] | None = None,
+        max_pages: int = 5,
+        timeout: aiohttp.ClientTimeout | None = None,
+    ) -> None:
+        self.sessionmaker = sessionmaker or get_async_session_maker("ingest")
+        self.max_pages = max_pages
+        self.timeout = timeout or aiohttp.ClientTimeout(total=30)
+        self.collector = LinkCollector(datetime.min, datetime.max)
+
+    def page_links(self, html: str) -> list[str]:
+        links: list[str] = []
+        for href, timestamp in self.collector.extract_hrefs(html):
+            try:
+                parse_timestamp(timestamp)
+            except ValueError:
+                continue
+            links.append(urljoin(self.collector.base_url, href.split("?", 1)[0]))
+        return list(dict.fromkeys(links))
+
+    async def known_links(self, session: AsyncSession, links: list[str]) -> set[str]:
+        if not links:
+            return set()
+        return set(await session.scalars(select(KnownBulletin.url).where(KnownBulletin.url.in_(links))))
+
+    async def remember(self, session: AsyncSession, links: list[str]) -> None:
+        rows = [{"url": link, "published_on": parse_timestamp(bulletin_timestamp(link))} for link in links]
+        if rows:
+            await session.execute(insert(KnownBulletin).values(rows).on_conflict_do_nothing())
+
+    async def record(self, links: list[str]) -> None:
+        async with self.sessionmaker() as session:
+            await self.remember(session, links)
+            await session.commit()
+
+    async def invalidate(self) -> None:
+        async with self.sessionmaker() as session:
+            await session.execute(update(ListingState).values(etag=None, last_modified=None))
+            await session.commit()
+
+    async def poll(self) -> list[str]:
+        start_page = self.collector.start_page
+        async with self.sessionmaker() as session:
+            state = await session.get(ListingState, start_page)
+            first_run = state is None and await session.scalar(select(KnownBulletin.url).limit(1)) is None
+            headers: dict[str, str] = {}
+            if state is not None and state.etag:
+                headers["If-None-Match"] = state.etag
+            if state is not None and state.last_modified:
+                headers["If-Modified-Since"] = state.last_modified
+
+            new_links: list[str] = []
+            etag = last_modified = None
+            async with aiohttp.ClientSession(timeout=self.timeout) as http:
+                for page in range(1, self.max_pages + 1):
+                    url = start_page + (f"?page=page-{page}" if page > 1 else "")
+                    async with http.get(url, headers=headers if page == 1 else {}) as resp:
+                        if resp.status == 304:
+                            logger.info("[Watcher] Страница списка не изменилась.")
+                            return []
+                        if resp.status != 200:
+                            logger.info(f"[Watcher] Ошибка {resp.status} при загрузке {url}")
+                            return []
+                        if page == 1:
+                            etag = resp.headers.get("ETag")
+                            last_modified = resp.headers.get("Last-Modified")
+                        text = await resp.text()
+
+                    links = self.page_links(text)
+                    known = await self.known_links(session, links)
+                    new_links += [link for link in links if link not in known]
+                    if known or not links or first_run:
+                        break
+
+            newest = max((parse_timestamp(bulletin_timestamp(link)) for link in new_links), default=None)
+            seeded: list[str] = []
+            if first_run:
+                loaded_until = await session.scalar(select(func.max(SpimexTradingResults.date)))
+                if loaded_until is not None:
+                    seeded = [
+                        link for link in new_links if parse_timestamp(bulletin_timestamp(link)).date() < loaded_until
+                    ]
+                await self.remember(session, seeded)
+                new_links = [link for link in new_links if link not in seeded]
+            if state is None:
+                state = ListingState(url=start_page)
+                session.add(state)
+            state.etag = etag
+            state.last_modified = last_modified
+            if newest is not None and (state.newest is None or newest > state.newest):
+                state.newest = newest
+            await session.commit()
+
+        if first_run:
+            logger.info(f"[Watcher] Индекс пуст, сохранено {len(seeded)} ссылок на уже загруженные даты.")
+        new_links = list(dict.fromkeys(new_links))
+        logger.info(f"[Watcher] Новых бюллетеней: {len(new_links)}.")
+        return new_links
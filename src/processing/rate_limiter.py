@@ -0,0 +1,64 @@
+import asyncio
+import random
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+from src.logger import logger
+
+
+class AdaptiveLimiter:
+    def __init__(
+        self,
+        initial_limit: int,
+        min_limit: int = 1,
+        max_limit: int | None = None,
+        latency_tolerance: float = 2.0,
+        backoff_factor: float = 0.5,
+        cooldown: float = 1.0,
+    ) -> None:
+        self.min_limit = min_limit
+        self.max_limit = max_limit if max_limit is not None else initial_limit * 4
+        self.limit = float(min(max(initial_limit, min_limit), self.max_limit))
+        self.latency_tolerance = latency_tolerance
+        self.backoff_factor = backoff_factor
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self.min_latency: float | None = None
+        self._last_decrease = 0.0
+        self._condition = asyncio.Condition()
+
+    @property
+    def current_limit(self) -> int:
+        return int(self.limit)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < self.current_limit)
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self.in_flight -= 1
+                self._condition.notify_all()
+
+    def on_success(self, latency: float) -> None:
+        if self.min_latency is None or latency < self.min_latency:
+            self.min_latency = latency
+        if latency > self.min_latency * self.latency_tolerance:
+            return
+        self.limit = min(self.limit + 1 / self.limit, float(self.max_limit))
+
+    def on_overload(self) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self.limit = max(self.limit * self.backoff_factor, float(self.min_limit))
+        logger.info(f"[Limiter] Сервер перегружен, лимит снижен до {self.current_limit}.")
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 60.0) -> float:
+    return random.uniform(0, min(cap, base * 2**attempt))
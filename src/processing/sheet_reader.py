@@ -0,0 +1,143 @@
+# pyright: basic
+
+import math
+from datetime import date, time, timedelta
+from typing import Any, Literal, Protocol, cast
+
+import numpy as np
+import pandas as pd
+import xlrd
+
+from src.processing.bulletin import BulletinSource
+
+try:
+    from python_calamine import CalamineWorkbook  # type: ignore
+except ImportError:
+    CalamineWorkbook = None
+
+SheetReader = Literal["xlrd", "calamine"]
+# Значения, которые pd.read_excel по умолчанию считает пропусками.
+NA_VALUES = frozenset(
+    {
+        "",
+        "#N/A",
+        "#N/A N/A",
+        "#NA",
+        "-1.#IND",
+        "-1.#QNAN",
+        "-NaN",
+        "-nan",
+        "1.#IND",
+        "1.#QNAN",
+        "<NA>",
+        "N/A",
+        "NA",
+        "NULL",
+        "NaN",
+        "None",
+        "n/a",
+        "nan",
+        "null",
+    }
+)
+
+
+def _na_or_value(value: Any) -> Any:
+    if isinstance(value, str) and value in NA_VALUES:
+        return np.nan
+    return value
+
+
+class Sheet(Protocol):
+    def __len__(self) -> int: ...
+
+    def row(self, idx: int) -> list[Any]: ...
+
+    def cell(self, idx: int, col: int) -> Any: ...
+
+    def close(self) -> None: ...
+
+
+class ListSheet:
+    def __init__(self, rows: list[list[Any]]) -> None:
+        self.rows = rows
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def row(self, idx: int) -> list[Any]:
+        return self.rows[idx]
+
+    def cell(self, idx: int, col: int) -> Any:
+        row = self.rows[idx]
+        return _na_or_value(row[col]) if col < len(row) else np.nan
+
+    def close(self) -> None:
+        pass
+
+
+class XlrdSheet:
+    def __init__(self, source: BulletinSource) -> None:
+        if isinstance(source, str):
+            self.book = xlrd.open_workbook(source, on_demand=True)
+        else:
+            self.book = xlrd.open_workbook(file_contents=source.getvalue(), on_demand=True)
+        self.sheet = self.book.sheet_by_index(0)
+
+    def __len__(self) -> int:
+        return self.sheet.nrows
+
+    def row(self, idx: int) -> list[Any]:
+        return cast(list[Any], self.sheet.row_values(idx))
+
+    def cell(self, idx: int, col: int) -> Any:
+        if col >= self.sheet.row_len(idx):
+            return np.nan
+        value = cast(Any, self.sheet.cell_value(idx, col))
+        typ = self.sheet.cell_type(idx, col)
+        if typ == xlrd.XL_CELL_NUMBER:
+            if math.isfinite(value) and int(value) == value:
+                return int(value)
+            return value
+        if typ == xlrd.XL_CELL_ERROR:
+            return np.nan
+        if typ == xlrd.XL_CELL_BOOLEAN:
+            return bool(value)
+        if typ == xlrd.XL_CELL_DATE:
+            value = xlrd.xldate.xldate_as_datetime(value, self.book.datemode)
+            epoch = (1904, 1, 1) if self.book.datemode else (1899, 12, 31)
+            if value.timetuple()[0:3] == epoch:
+                return time(value.hour, value.minute, value.second, value.microsecond)
+            return value
+        return _na_or_value(value)
+
+    def close(self) -> None:
+        self.book.release_resources()
+
+
+class CalamineSheet(ListSheet):
+    def __init__(self, source: BulletinSource) -> None:
+        if CalamineWorkbook is None:
+            raise ImportError("[Parser] Для reader='calamine' требуется пакет python-calamine.")
+        if isinstance(source, str):
+            book = CalamineWorkbook.from_path(source)
+        else:
+            source.seek(0)
+            book = CalamineWorkbook.from_filelike(source)
+        super().__init__(book.get_sheet_by_index(0).to_python(skip_empty_area=False))
+
+    def cell(self, idx: int, col: int) -> Any:
+        value = super().cell(idx, col)
+        if isinstance(value, float) and math.isfinite(value) and int(value) == value:
+            return int(value)
+        if isinstance(value, date):
+            return pd.Timestamp(value)
+        if isinstance(value, timedelta):
+            return pd.Timedelta(value)
+        return value
+
+
+def open_sheet(source: BulletinSource, reader: SheetReader) -> Sheet:
+    if reader == "calamine":
+        return CalamineSheet(source)
+    return XlrdSheet(source)
@@ -0,0 +1,163 @@
+import cProfile
+import json
+import os
+import random
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Literal
+
+from dotenv import load_dotenv
+
+from src.logger import logger
+
+try:
+    from pyinstrument import Profiler as SamplingProfiler  # type: ignore
+    from pyinstrument.renderers import SpeedscopeRenderer  # type: ignore
+except ImportError:
+    SamplingProfiler = None
+    SpeedscopeRenderer = None
+
+load_dotenv()
+
+PROFILE_ENABLED = os.environ.get("PROFILE_ENABLED", "0") == "1"
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_FLAMEGRAPH = os.environ.get("PROFILE_FLAMEGRAPH", "0") == "1"
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+PROFILE_HEADER = "x-profile"
+
+ProfileMode = Literal["timings", "flamegraph"]
+
+
+@dataclass
+class Profile:
+    name: str
+    started: float = field(default_factory=time.perf_counter)
+    last_mark: float = 0.0
+    phases: dict[str, float] = field(default_factory=dict[str, float])
+
+    def __post_init__(self) -> None:
+        self.last_mark = self.started
+
+    def add(self, phase: str, seconds: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+        self.last_mark = time.perf_counter()
+
+    @property
+    def total(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        items = [f"{phase};dur={seconds * 1000:.2f}" for phase, seconds in self.phases.items()]
+        items.append(f"total;dur={self.total * 1000:.2f}")
+        return ", ".join(items)
+
+    def summary(self) -> str:
+        items = [f"{phase}={seconds * 1000:.2f}мс" for phase, seconds in self.phases.items()]
+        items.append(f"total={self.total * 1000:.2f}мс")
+        return f"{self.name}: {', '.join(items)}"
+
+
+class Sampler:
+    def __init__(self) -> None:
+        self.profiler: Any
+        if SamplingProfiler is not None:
+            self.profiler = SamplingProfiler(async_mode="enabled")
+        else:
+            self.profiler = cProfile.Profile()
+
+    def start(self) -> None:
+        if isinstance(self.profiler, cProfile.Profile):
+            self.profiler.enable()
+        else:
+            self.profiler.start()
+
+    def stop(self) -> None:
+        if isinstance(self.profiler, cProfile.Profile):
+            self.profiler.disable()
+        else:
+            self.profiler.stop()
+
+    def dump(self, path: str) -> str:
+        if isinstance(self.profiler, cProfile.Profile):
+            path = f"{path}.prof"
+            self.profiler.dump_stats(path)
+        else:
+            path = f"{path}.speedscope.json"
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(self.profiler.output(SpeedscopeRenderer()))  # type: ignore
+        return path
+
+
+_current_profile: ContextVar[Profile | None] = ContextVar("current_profile", default=None)
+
+
+def profiling_mode(header_value: str | None) -> ProfileMode | None:
+    if not PROFILE_ENABLED:
+        return None
+    value = (header_value or "").strip().lower()
+    if value == "1":
+        return "timings"
+    if value == "flamegraph":
+        return "flamegraph"
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        return "flamegraph" if PROFILE_FLAMEGRAPH else "timings"
+    return None
+
+
+def dump_profile(profile: Profile, sampler: Sampler | None = None) -> str:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    slug = "".join(c if c.isalnum() else "_" for c in profile.name).strip("_")
+    base = os.path.join(PROFILE_DIR, f"{datetime.now():%Y%m%d%H%M%S%f}_{slug}")
+    with open(f"{base}.json", "w", encoding="utf-8") as f:
+        json.dump({"name": profile.name, "total": profile.total, "phases": profile.phases}, f, ensure_ascii=False)
+    if sampler is not None:
+        sampler.dump(base)
+    return base
+
+
+@contextmanager
+def start_profile(name: str, mode: ProfileMode = "timings", dump: bool = False) -> Iterator[Profile]:
+    profile = Profile(name=name)
+    sampler = Sampler() if mode == "flamegraph" else None
+    token = _current_profile.set(profile)
+    if sampler is not None:
+        try:
+            sampler.start()
+        except ValueError as e:
+            logger.info(f"[Profiler] Сэмплер недоступен: {e}")
+            sampler = None
+    try:
+        yield profile
+    finally:
+        if sampler is not None:
+            sampler.stop()
+        _current_profile.reset(token)
+        logger.info(f"[Profiler] {profile.summary()}")
+        if dump or sampler is not None:
+            logger.info(f"[Profiler] Профиль сохранён: {dump_profile(profile, sampler)}")
+
+
+@contextmanager
+def profile_run(name: str) -> Iterator[Profile | None]:
+    if not PROFILE_ENABLED:
+        yield None
+        return
+    with start_profile(name, "flamegraph" if PROFILE_FLAMEGRAPH else "timings", dump=True) as profile:
+        yield profile
+
+
+@contextmanager
+def profile_phase(name: str) -> Iterator[None]:
+    profile = _current_profile.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add(name, time.perf_counter() - start)
@@ -0,0 +1,17 @@
+import asyncio
+
+from src.database.connection import dispose_async_engine, provision_database
+from src.processing.backfill import BackfillPlanner
+from src.processing.db_updater import CONFIG
+
+
+async def backfill() -> None:
+    try:
+        await BackfillPlanner(CONFIG.date_start.date(), CONFIG.date_end.date()).run()
+    finally:
+        await dispose_async_engine()
+
+
+if __name__ == "__main__":
+    provision_database()
+    asyncio.run(backfill())
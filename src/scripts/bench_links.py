@@ -0,0 +1,71 @@
+import argparse
+import asyncio
+import glob
+import os
+import time
+from collections.abc import Callable
+
+import aiohttp
+
+from src.processing.data_scraper import extract_hrefs_bs4, extract_hrefs_scan
+
+LISTING_URL = "https://spimex.com/markets/oil_products/trades/results/"
+
+
+async def fetch_pages(path: str, pages: int) -> None:
+    os.makedirs(path, exist_ok=True)
+    async with aiohttp.ClientSession() as session:
+        for page in range(1, pages + 1):
+            async with session.get(f"{LISTING_URL}?page=page-{page}") as resp:
+                resp.raise_for_status()
+                text = await resp.text()
+            with open(os.path.join(path, f"page-{page}.html"), "w", encoding="utf-8") as f:
+                f.write(text)
+
+
+def best_time(
+    extract: Callable[[str], list[tuple[str, str]]], html: str, repeat: int
+) -> tuple[float, list[tuple[str, str]]]:
+    timings: list[float] = []
+    hrefs: list[tuple[str, str]] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        hrefs = extract(html)
+        timings.append(time.perf_counter() - start)
+    return min(timings), hrefs
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description="Сравнение скорости извлечения ссылок со страниц списка.")
+    arg_parser.add_argument("path", help="Сохранённая страница списка или директория с файлами .html")
+    arg_parser.add_argument("--fetch", type=int, default=0, help="Предварительно скачать N страниц в path")
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    if args.fetch:
+        asyncio.run(fetch_pages(args.path, args.fetch))
+
+    files = sorted(glob.glob(os.path.join(args.path, "*.html"))) if os.path.isdir(args.path) else [args.path]
+    total_bs4 = total_scan = 0.0
+    for file in files:
+        with open(file, encoding="utf-8") as f:
+            html = f.read()
+        bs4_time, bs4_hrefs = best_time(extract_hrefs_bs4, html, args.repeat)
+        scan_time, scan_hrefs = best_time(extract_hrefs_scan, html, args.repeat)
+        assert bs4_hrefs == scan_hrefs, f"{file}: ссылки различаются"
+        total_bs4 += bs4_time
+        total_scan += scan_time
+        print(
+            f"{os.path.basename(file)}: {len(scan_hrefs)} ссылок, bs4 {bs4_time * 1000:.2f} мс, "
+            f"scan {scan_time * 1000:.2f} мс, ускорение x{bs4_time / scan_time:.1f}"
+        )
+
+    if files:
+        print(
+            f"Итого {len(files)} страниц: bs4 {len(files) / total_bs4:.0f} стр/с, "
+            f"scan {len(files) / total_scan:.0f} стр/с, ускорение x{total_bs4 / total_scan:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# pyright: basic
+
+import argparse
+import glob
+import os
+import time
+
+import pandas as pd
+
+from src.processing.data_parser import SpimexParser
+
+
+def best_time(parser: SpimexParser, file: str, repeat: int) -> tuple[float, pd.DataFrame]:
+    timings = []
+    df = pd.DataFrame()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        df = parser.create_df(file)
+        timings.append(time.perf_counter() - start)
+    return min(timings), df
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description="Сравнение скорости извлечения таблицы из бюллетеней.")
+    arg_parser.add_argument("path", help="Файл бюллетеня или директория с файлами .xls")
+    arg_parser.add_argument("--reader", choices=["xlrd", "calamine"], default="xlrd")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    files = sorted(glob.glob(os.path.join(args.path, "*.xls"))) if os.path.isdir(args.path) else [args.path]
+    baseline = SpimexParser(reader="pandas")
+    fast = SpimexParser(reader=args.reader)
+
+    total_baseline = total_fast = 0.0
+    for file in files:
+        baseline_time, baseline_df = best_time(baseline, file, args.repeat)
+        fast_time, fast_df = best_time(fast, file, args.repeat)
+        pd.testing.assert_frame_equal(baseline_df, fast_df)
+        total_baseline += baseline_time
+        total_fast += fast_time
+        print(
+            f"{os.path.basename(file)}: {len(fast_df)} строк, pandas {baseline_time * 1000:.1f} мс, "
+            f"{args.reader} {fast_time * 1000:.1f} мс, ускорение x{baseline_time / fast_time:.1f}"
+        )
+
+    if files:
+        print(
+            f"Итого {len(files)} файлов: pandas {total_baseline:.2f} с, {args.reader} {total_fast:.2f} с, "
+            f"ускорение x{total_baseline / total_fast:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
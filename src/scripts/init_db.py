@@ -0,0 +1,14 @@
+import asyncio
+
+from src.database.connection import dispose_async_engine, provision_database
+from src.processing.db_updater import create_tables
+
+
+async def init_db() -> None:
+    provision_database()
+    await create_tables()
+    await dispose_async_engine()
+
+
+if __name__ == "__main__":
+    asyncio.run(init_db())
@@ -0,0 +1,272 @@
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+from datetime import date, timedelta
+from typing import Any
+from unittest.mock import patch
+
+import httpx
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, select
+
+from src.database.connection import dispose_async_engine, get_async_session_maker, provision_database
+from src.database.models import SpimexTradingResults as TradingModel
+from src.processing.db_loader import SpimexLoader
+from src.processing.db_updater import create_tables
+
+OIL_IDS = [f"A{n:03d}" for n in range(100, 160)]
+DELIVERY_BASIS_IDS = [f"B{n:02d}" for n in range(1, 31)]
+DELIVERY_TYPE_IDS = ["A", "F", "J"]
+SEED_DAYS_PER_LOAD = 20
+DATES_DAYS = (1, 5, 10, 30)
+DYNAMICS_DAYS = (7, 30, 90)
+
+
+def synthetic_day(day: date, rows: int, rng: np.random.Generator) -> pd.DataFrame:
+    oil_id = rng.choice(OIL_IDS, rows)
+    basis_id = rng.choice(DELIVERY_BASIS_IDS, rows)
+    type_id = rng.choice(DELIVERY_TYPE_IDS, rows)
+    count = rng.integers(1, 50, rows)
+    volume = count * rng.integers(1, 10, rows)
+    return pd.DataFrame(
+        {
+            "exchange_product_id": np.char.add(np.char.add(np.char.add(oil_id, basis_id), "060"), type_id),
+            "oil_id": oil_id,
+            "delivery_basis_id": basis_id,
+            "delivery_basis_name": np.char.add("Basis ", basis_id),
+            "delivery_type_id": type_id,
+            "volume": volume,
+            "total": volume * rng.integers(10, 50, rows),
+            "count": count,
+            "date": pd.Timestamp(day),
+        }
+    )
+
+
+def trading_days(years: int, end: date) -> list[date]:
+    start = end - timedelta(days=365 * years)
+    return [
+        start + timedelta(days=i) for i in range((end - start).days + 1) if (start + timedelta(days=i)).weekday() < 5
+    ]
+
+
+async def seed(years: int, rows_per_day: int, force: bool) -> int:
+    await create_tables()
+    sessionmaker = get_async_session_maker("ingest")
+    async with sessionmaker() as session:
+        existing = await session.scalar(select(func.count()).select_from(TradingModel))
+    if existing and not force:
+        raise SystemExit(f"В таблице уже {existing} строк. Используйте отдельную БД (DB_NAME) или --force.")
+
+    rng = np.random.default_rng(0)
+    days = trading_days(years, date.today())
+    total = 0
+    started = time.perf_counter()
+    for idx in range(0, len(days), SEED_DAYS_PER_LOAD):
+        df = pd.concat([synthetic_day(day, rows_per_day, rng) for day in days[idx : idx + SEED_DAYS_PER_LOAD]])
+        loader = SpimexLoader(sessionmaker, df.reset_index(drop=True), chunk_size=5000, replace_dates=True, staged=True)
+        total += await loader.load()
+    print(f"Засеяно {total} строк за {len(days)} торговых дней за {time.perf_counter() - started:.1f} с")
+    return total
+
+
+class MemoryCache:
+    def __init__(self) -> None:
+        self.store: dict[str, str] = {}
+
+    @staticmethod
+    def key(request: Any) -> str:
+        return f"cache:{request.url.path}?{request.url.query}"
+
+    async def get_from_cache(self, request: Any) -> Any:
+        value = self.store.get(self.key(request))
+        return json.loads(value) if value is not None else None
+
+    async def set_cache(self, request: Any, data: Any) -> None:
+        self.store[self.key(request)] = json.dumps(data)
+
+    async def get_many(self, keys: list[str], app: Any = None) -> list[str | None]:
+        return [self.store.get(key) for key in keys]
+
+    async def set_many(self, values: dict[str, str]) -> None:
+        self.store.update(values)
+
+    async def clear(self) -> None:
+        self.store.clear()
+
+
+def memory_cache_patches(cache: MemoryCache) -> list[Any]:
+    async def noop(*args: Any, **kwargs: Any) -> None:
+        return None
+
+    async def data_version() -> str:
+        return "load-test"
+
+    return [
+        patch("src.api.routes.get_from_cache", cache.get_from_cache),
+        patch("src.api.routes.set_cache", cache.set_cache),
+        patch("src.api.routes.get_many", cache.get_many),
+        patch("src.api.routes.set_many", cache.set_many),
+        patch("src.api.routes.get_latest_date", noop),
+        patch("src.api.middleware.get_data_version", data_version),
+        patch("src.api.middleware.flush_hits", noop),
+    ]
+
+
+async def request_mix(weights: dict[str, int], count: int, rng: random.Random) -> list[tuple[str, str]]:
+    async with get_async_session_maker()() as session:
+        first_date, latest_date = (
+            await session.execute(select(func.min(TradingModel.date), func.max(TradingModel.date)))
+        ).one()
+        if latest_date is None:
+            raise SystemExit("Таблица пуста, запустите с --seed.")
+        combos = list(
+            await session.execute(
+                select(TradingModel.oil_id, TradingModel.delivery_basis_id)
+                .where(TradingModel.date == latest_date)
+                .distinct()
+            )
+        )
+
+    def dynamics() -> str:
+        days = rng.choice(DYNAMICS_DAYS)
+        end = latest_date - timedelta(days=rng.randrange(max((latest_date - first_date).days - days, 1)))
+        oil_id, _ = rng.choice(combos)
+        return f"/v1/trades/dynamics?start_date={end - timedelta(days=days)}&end_date={end}&oil_id={oil_id}"
+
+    def results() -> str:
+        if rng.random() < 0.2:
+            return "/v1/trades/results"
+        oil_id, basis_id = rng.choice(combos)
+        return f"/v1/trades/results?oil_id={oil_id}&delivery_basis_id={basis_id}"
+
+    builders = {
+        "dates": lambda: f"/v1/trades/dates?days={rng.choice(DATES_DAYS)}",
+        "results": results,
+        "dynamics": dynamics,
+    }
+    kinds = rng.choices(list(weights), weights=list(weights.values()), k=count)
+    return [(kind, builders[kind]()) for kind in kinds]
+
+
+def latency_stats(latencies: list[float], elapsed: float) -> dict[str, float]:
+    if len(latencies) < 2:
+        latencies = latencies * 2 or [0.0, 0.0]
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(cuts[49] * 1000, 2),
+        "p95_ms": round(cuts[94] * 1000, 2),
+        "p99_ms": round(cuts[98] * 1000, 2),
+    }
+
+
+async def run_phase(client: httpx.AsyncClient, requests: list[tuple[str, str]], concurrency: int) -> dict[str, Any]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: dict[str, list[float]] = defaultdict(list)
+    errors = 0
+
+    async def send(kind: str, path: str) -> None:
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.get(path)
+            latencies[kind].append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(send(kind, path) for kind, path in requests))
+    elapsed = time.perf_counter() - started
+    all_latencies = [value for values in latencies.values() for value in values]
+    return {
+        **latency_stats(all_latencies, elapsed),
+        "errors": errors,
+        "endpoints": {kind: latency_stats(values, elapsed) for kind, values in latencies.items()},
+    }
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    from main import app
+    from src.api.snapshot import refresh_snapshot
+    from src.cache import clear_response_cache, close_redis_client
+
+    with ExitStack() as stack:
+        try:
+            if args.seed:
+                await seed(args.years, args.rows_per_day, args.force)
+            if args.snapshot:
+                await refresh_snapshot()
+
+            memory = MemoryCache()
+            if args.cache == "memory":
+                for item in memory_cache_patches(memory):
+                    stack.enter_context(item)
+            clear = memory.clear if args.cache == "memory" else clear_response_cache
+
+            requests = await request_mix(args.mix, args.requests, random.Random(0))
+            report: dict[str, Any] = {"cache": args.cache, "snapshot": args.snapshot, "mix": args.mix, "levels": {}}
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://load-test") as client:
+                for concurrency in args.concurrency:
+                    await clear()
+                    cold = await run_phase(client, requests, concurrency)
+                    warm = await run_phase(client, requests, concurrency)
+                    report["levels"][concurrency] = {"cold": cold, "warm": warm}
+                    for phase, stats in (("cold", cold), ("warm", warm)):
+                        print(
+                            f"concurrency={concurrency:<4} {phase}: {stats['rps']:>8.1f} req/s, "
+                            f"p50 {stats['p50_ms']:.1f} мс, p95 {stats['p95_ms']:.1f} мс, "
+                            f"p99 {stats['p99_ms']:.1f} мс, ошибок {stats['errors']}"
+                        )
+            return report
+        finally:
+            await dispose_async_engine()
+            if args.cache == "redis":
+                await close_redis_client()
+
+
+def parse_mix(value: str) -> dict[str, int]:
+    mix: dict[str, int] = {}
+    for part in value.split(","):
+        kind, _, weight = part.partition("=")
+        if kind not in ("dates", "results", "dynamics") or not weight.isdigit():
+            raise argparse.ArgumentTypeError(f"неверный элемент смеси: {part}")
+        mix[kind] = int(weight)
+    return mix
+
+
+def main(argv: list[str] | None = None) -> None:
+    arg_parser = argparse.ArgumentParser(description="Нагрузочный тест API trades на синтетических данных.")
+    arg_parser.add_argument("--seed", action="store_true", help="Заполнить БД синтетическими торгами")
+    arg_parser.add_argument("--force", action="store_true", help="Засеять, даже если таблица не пуста")
+    arg_parser.add_argument("--years", type=int, default=1)
+    arg_parser.add_argument("--rows-per-day", type=int, default=400)
+    arg_parser.add_argument("--mix", type=parse_mix, default=parse_mix("dates=1,results=3,dynamics=2"))
+    arg_parser.add_argument("--concurrency", type=lambda v: [int(c) for c in v.split(",")], default=[1, 8, 32])
+    arg_parser.add_argument("--requests", type=int, default=500, help="Запросов на каждый уровень и фазу")
+    arg_parser.add_argument("--cache", choices=["redis", "memory"], default="memory")
+    arg_parser.add_argument("--snapshot", action="store_true", help="Отвечать /results и /dynamics из снимка")
+    arg_parser.add_argument("--report", help="Сохранить результаты в JSON (- для stdout)")
+    args = arg_parser.parse_args(argv)
+
+    if args.seed:
+        provision_database()
+    report = asyncio.run(run(args))
+    if args.report == "-":
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+    elif args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
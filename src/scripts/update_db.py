@@ -1,6 +1,79 @@
+import argparse
 import asyncio
+import json
+import sys
+from dataclasses import replace
+from datetime import date, datetime, time
+from typing import Any
+
+from src.database.connection import dispose_async_engine, provision_database
+from src.processing.db_updater import CONFIG, STAGES, update_database
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    arg_parser = argparse.ArgumentParser(description="Скачивание, разбор и загрузка бюллетеней в БД.")
+    arg_parser.add_argument("--start", type=date.fromisoformat, help="Начало периода, YYYY-MM-DD")
+    arg_parser.add_argument("--end", type=date.fromisoformat, help="Конец периода включительно, YYYY-MM-DD")
+    arg_parser.add_argument(
+        "--stages", default=",".join(STAGES), help="Стадии через запятую: scrape, parse, load (по умолчанию все)"
+    )
+    arg_parser.add_argument("--input", help="Директория или архив zip/tar с бюллетенями для parse без scrape")
+    arg_parser.add_argument("--directory", default=CONFIG.directory, help="Директория для скачанных бюллетеней")
+    arg_parser.add_argument("--parsed", help="Файл результата парсинга между parse и load")
+    arg_parser.add_argument("--workers", type=int, default=CONFIG.workers)
+    arg_parser.add_argument("--max-concurrent", type=int, default=CONFIG.max_concurrent)
+    arg_parser.add_argument("--chunk-size", type=int, default=CONFIG.chunk_size)
+    arg_parser.add_argument("--max-parallel-chunks", type=int, default=CONFIG.max_parallel_chunks)
+    arg_parser.add_argument("--dry-run", action="store_true", help="Ничего не скачивать и не записывать в БД")
+    arg_parser.add_argument("--report", help="Сохранить отчет о времени стадий в JSON (- для stdout)")
+    args = arg_parser.parse_args(argv)
+
+    args.stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    unknown = set(args.stages) - set(STAGES)
+    if unknown or not args.stages:
+        arg_parser.error(f"неизвестные стадии: {', '.join(sorted(unknown)) or '(пусто)'}")
+    selected = [idx for idx, stage in enumerate(STAGES) if stage in args.stages]
+    if selected != list(range(selected[0], selected[-1] + 1)):
+        arg_parser.error(f"стадии должны идти подряд: {', '.join(STAGES)}")
+    return args
+
+
+def write_report(report: dict[str, Any], path: str) -> None:
+    if path == "-":
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write("\n")
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any] | None:
+    config = replace(
+        CONFIG,
+        date_start=datetime.combine(args.start, time.min) if args.start else CONFIG.date_start,
+        date_end=datetime.combine(args.end, time.max) if args.end else CONFIG.date_end,
+        directory=args.directory,
+        workers=args.workers,
+        max_concurrent=args.max_concurrent,
+        chunk_size=args.chunk_size,
+        max_parallel_chunks=args.max_parallel_chunks,
+    )
+    try:
+        return await update_database(config, args.stages, args.input, args.parsed, args.dry_run)
+    finally:
+        await dispose_async_engine()
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    if "load" in args.stages and not args.dry_run:
+        provision_database()
+    report = asyncio.run(run(args))
+    if report is None:
+        sys.exit(1)
+    if args.report:
+        write_report(report, args.report)
 
-from src.processing.db_updater import update_database
 
 if __name__ == "__main__":
-    asyncio.run(update_database())
+    main()
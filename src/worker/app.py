@@ -18,6 +18,14 @@ celery_app.conf.beat_schedule = {  # type: ignore[reportUnknownMemberType]
         "task": "src.worker.tasks.clear_cache",
         "schedule": crontab(hour=23, minute=55),
     },
+    "collect-bulletins-after-close": {
+        "task": "src.worker.tasks.collect_bulletins",
+        "schedule": crontab(hour=19, minute=30, day_of_week="mon-fri"),
+    },
+    "watch-listing-during-trading": {
+        "task": "src.worker.tasks.watch_listing",
+        "schedule": crontab(minute="*/5", hour="10-23", day_of_week="mon-fri"),
+    },
 }
 
 import src.worker.tasks as _  # noqa: F401, E402
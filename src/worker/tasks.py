@@ -1,11 +1,213 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any
+
 import redis
+from celery import chord
 
+from src.logger import logger
 from src.worker.app import celery_app
 
 sync_redis_client = redis.Redis(host="127.0.0.1", port=6379, db=0)
 
+INCREMENTAL_DAYS = 3
+INGEST_MAX_RETRIES = 5
+WARM_HOT_KEYS = 200
+WARM_CONCURRENCY = 8
+WARM_DATES_DAYS = (1, 5, 10, 20, 30)
+WARM_DYNAMICS_DAYS = (7, 30)
+
+
+def flush_response_cache() -> int:
+    from src.cache import CACHE_KEY_PATTERN
+
+    keys: list[str] = list(sync_redis_client.scan_iter(match=CACHE_KEY_PATTERN, count=1000))  # type: ignore[reportUnknownMemberType]
+    for idx in range(0, len(keys), 1000):
+        sync_redis_client.delete(*keys[idx : idx + 1000])
+    return len(keys)
+
 
 @celery_app.task  # type: ignore[reportUnknownMemberType]
 def clear_cache():
-    sync_redis_client.flushdb()  # type: ignore[reportUnknownMemberType]
+    flush_response_cache()
+    warm_cache.delay()  # type: ignore[reportFunctionMemberAccess]
     return "Кэш очищен"
+
+
+async def _warm_paths() -> list[str]:
+    from sqlalchemy import func, select
+
+    from src.cache import hot_paths
+    from src.database.connection import get_async_session_maker
+    from src.database.models import SpimexTradingResults as TradingModel
+
+    paths = await hot_paths(WARM_HOT_KEYS)
+    paths += [f"/v1/trades/dates?days={days}" for days in WARM_DATES_DAYS]
+
+    async with get_async_session_maker()() as session:
+        latest_date = await session.scalar(select(func.max(TradingModel.date)))
+        if latest_date is None:
+            return list(dict.fromkeys(paths))
+        combos = await session.execute(
+            select(TradingModel.oil_id, TradingModel.delivery_basis_id)
+            .where(TradingModel.date == latest_date)
+            .distinct()
+        )
+
+    paths.append("/v1/trades/results")
+    paths += [f"/v1/trades/results?oil_id={oil_id}&delivery_basis_id={basis_id}" for oil_id, basis_id in combos]
+    paths += [
+        f"/v1/trades/dynamics?start_date={latest_date - timedelta(days=days)}&end_date={latest_date}"
+        for days in WARM_DYNAMICS_DAYS
+    ]
+    return list(dict.fromkeys(paths))
+
+
+async def _warm_cache() -> tuple[int, int]:
+    import httpx
+
+    from main import app
+    from src.cache import WARM_HEADER, WARM_TOKEN, close_redis_client
+    from src.database.connection import dispose_async_engine
+    from src.database.dependencies import get_async_db, get_primary_db
+
+    app.dependency_overrides[get_async_db] = get_primary_db
+    try:
+        paths = await _warm_paths()
+        semaphore = asyncio.Semaphore(WARM_CONCURRENCY)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://warmup", headers={WARM_HEADER: WARM_TOKEN}
+        ) as client:
+
+            async def warm(path: str) -> bool:
+                async with semaphore:
+                    response = await client.get(path)
+                return response.status_code == 200
+
+            results = await asyncio.gather(*(warm(path) for path in paths))
+    finally:
+        app.dependency_overrides.pop(get_async_db, None)
+        await dispose_async_engine()
+        await close_redis_client()
+    return sum(results), len(paths)
+
+
+@celery_app.task  # type: ignore[reportUnknownMemberType]
+def warm_cache() -> str:
+    warmed, total = asyncio.run(_warm_cache())
+    return f"Прогрето {warmed} из {total} ключей кэша"
+
+
+async def _collect_links(date_start: datetime, date_end: datetime) -> list[str]:
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    from src.database.connection import create_worker_engine
+    from src.processing.data_scraper import LinkCollector
+    from src.processing.db_updater import create_tables
+    from src.processing.listing_watcher import ListingWatcher
+
+    engine = create_worker_engine()
+    sessionmaker = async_sessionmaker(bind=engine, expire_on_commit=False)
+    try:
+        await create_tables(engine)
+        links = await LinkCollector(start_date=date_start, end_date=date_end).get_links()
+        async with sessionmaker() as session:
+            known = await ListingWatcher(sessionmaker).known_links(session, links)
+    finally:
+        await engine.dispose()
+    if known:
+        logger.info(f"[Worker] Пропущено {len(known)} уже загруженных бюллетеней.")
+    return [link for link in links if link not in known]
+
+
+def dispatch_ingest(links: list[str]) -> None:
+    if links:
+        chord(ingest_bulletin.s(link) for link in links)(finalize_ingest.s())  # type: ignore[reportUnknownMemberType]
+
+
+@celery_app.task  # type: ignore[reportUnknownMemberType]
+def collect_bulletins(date_start: str | None = None, date_end: str | None = None, days: int = INCREMENTAL_DAYS) -> int:
+    end = datetime.fromisoformat(date_end) if date_end else datetime.now()
+    start = datetime.fromisoformat(date_start) if date_start else datetime.combine(end.date(), datetime.min.time())
+    if not date_start:
+        start -= timedelta(days=days)
+
+    links = asyncio.run(_collect_links(start, end))
+    logger.info(f"[Worker] Найдено {len(links)} бюллетеней за период {start:%d.%m.%Y} - {end:%d.%m.%Y}.")
+    dispatch_ingest(links)
+    return len(links)
+
+
+async def _watch_listing() -> list[str]:
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    from src.database.connection import create_worker_engine
+    from src.processing.db_updater import create_tables
+    from src.processing.listing_watcher import ListingWatcher
+
+    engine = create_worker_engine()
+    try:
+        await create_tables(engine)
+        return await ListingWatcher(async_sessionmaker(bind=engine, expire_on_commit=False)).poll()
+    finally:
+        await engine.dispose()
+
+
+async def _invalidate_listing() -> None:
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    from src.database.connection import create_worker_engine
+    from src.processing.listing_watcher import ListingWatcher
+
+    engine = create_worker_engine()
+    try:
+        await ListingWatcher(async_sessionmaker(bind=engine, expire_on_commit=False)).invalidate()
+    finally:
+        await engine.dispose()
+
+
+@celery_app.task  # type: ignore[reportUnknownMemberType]
+def watch_listing() -> int:
+    links = asyncio.run(_watch_listing())
+    if links:
+        logger.info(f"[Worker] Обнаружено {len(links)} новых бюллетеней, запускаю загрузку.")
+    dispatch_ingest(links)
+    return len(links)
+
+
+@celery_app.task(bind=True, max_retries=INGEST_MAX_RETRIES)  # type: ignore[reportUnknownMemberType]
+def ingest_bulletin(self: Any, url: str) -> dict[str, Any]:
+    from src.processing.db_updater import ingest_bulletin as ingest
+
+    try:
+        rows, latest_date = asyncio.run(ingest(url))
+    except Exception as e:
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=e, countdown=min(30 * 2**self.request.retries, 600))
+        logger.info(f"[Worker] Бюллетень {url} не загружен после {self.max_retries} попыток: {e}")
+        return {"url": url, "rows": 0, "date": None, "error": str(e)}
+    return {"url": url, "rows": rows, "date": latest_date.isoformat() if latest_date else None, "error": None}
+
+
+@celery_app.task  # type: ignore[reportUnknownMemberType]
+def finalize_ingest(results: list[dict[str, Any]]) -> str:
+    rows = sum(result["rows"] for result in results)
+    failed = [result["url"] for result in results if result["error"]]
+    for url in failed:
+        logger.info(f"[Worker] Ошибка загрузки: {url}")
+    if failed:
+        asyncio.run(_invalidate_listing())
+
+    from src.cache import DATA_VERSION_KEY, LATEST_DATE_KEY, LOADED_CHANNEL, SET_IF_GREATER
+
+    dates = [result["date"] for result in results if result.get("date")]
+    if dates:
+        sync_redis_client.eval(SET_IF_GREATER, 1, LATEST_DATE_KEY, max(dates))
+
+    if rows:
+        flush_response_cache()
+        sync_redis_client.incr(DATA_VERSION_KEY)
+        sync_redis_client.publish(LOADED_CHANNEL, max(dates, default=""))  # type: ignore[reportUnknownMemberType]
+        warm_cache.delay()  # type: ignore[reportFunctionMemberAccess]
+    return f"Загружено {rows} строк из {len(results) - len(failed)} бюллетеней, ошибок: {len(failed)}"
@@ -48,14 +48,19 @@ async def ac():
 def mock_cache(mocker):
     get_cache = mocker.patch("src.api.routes.get_from_cache", new_callable=AsyncMock, return_value=None)
     set_cache = mocker.patch("src.api.routes.set_cache", new_callable=AsyncMock)
+    mocker.patch(
+        "src.api.routes.get_many", new_callable=AsyncMock, side_effect=lambda keys, app=None: [None] * len(keys)
+    )
+    mocker.patch("src.api.routes.set_many", new_callable=AsyncMock)
     return get_cache, set_cache
 
 
 @pytest.fixture
 def override_db(async_session):
-    from src.api.routes import get_async_db
+    from src.api.routes import get_async_db, get_primary_db
 
     app.dependency_overrides[get_async_db] = lambda: async_session
+    app.dependency_overrides[get_primary_db] = lambda: async_session
     yield
     app.dependency_overrides.clear()
 
@@ -158,3 +163,41 @@ async def test_get_results_invalid(ac, fake_spimex_rows, params):
     url = app.url_path_for("get_results")
     response = await ac.get(url, params=params)
     assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_get_results_multi_value_filter(ac, fake_spimex_rows, mock_cache, override_db):
+    url = app.url_path_for("get_results")
+    response = await ac.get(url, params={"oil_id": ["OIL1", "OIL2"], "delivery_type_id": "B"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data
+    assert {item["oil_id"] for item in data} <= {"OIL1", "OIL2"}
+    assert {item["delivery_type_id"] for item in data} == {"B"}
+
+
+@pytest.mark.asyncio
+async def test_batch_queries_match_single_requests(ac, fake_spimex_rows, mock_cache, override_db):
+    specs = [
+        {"kind": "results", "oil_id": ["OIL2"]},
+        {"kind": "dynamics", "start_date": "1970-01-01", "end_date": "2069-12-31", "delivery_basis_id": ["DB1"]},
+        {"kind": "results", "oil_id": ["OIL1"], "delivery_type_id": ["A", "B"]},
+    ]
+    response = await ac.post(app.url_path_for("batch_queries"), json={"queries": specs})
+    assert response.status_code == 200
+    batch = response.json()
+    assert len(batch) == len(specs)
+
+    for spec, data in zip(specs, batch, strict=True):
+        kind = spec.pop("kind")
+        single = await ac.get(app.url_path_for(f"get_{kind}"), params=spec)
+        key = lambda item: (item["date"], item["exchange_product_id"], item["volume"], item["total"])  # noqa: E731
+        assert sorted(data, key=key) == sorted(single.json(), key=key)
+
+
+@pytest.mark.asyncio
+async def test_batch_queries_invalid(ac):
+    url = app.url_path_for("batch_queries")
+    assert (await ac.post(url, json={"queries": []})).status_code == 422
+    assert (await ac.post(url, json={"queries": [{"kind": "results", "oil_id": ["bad"]}]})).status_code == 422
+    assert (await ac.post(url, json={"queries": [{"kind": "dynamics"}]})).status_code == 422
@@ -1,26 +1,30 @@
 import asyncio
 import random
-from datetime import datetime
+from datetime import date, datetime
 from typing import Any
 from unittest.mock import AsyncMock, MagicMock
 
+import numpy as np
 import pandas as pd
 import pytest
 from faker import Faker
 
 from src.database.connection import async_session_maker
+from src.processing.bulletin import BulletinBuffer
 from src.processing.data_parser import SpimexParser
-from src.processing.data_scraper import LinkCollector
+from src.processing.data_scraper import FileDownloader, LinkCollector, extract_hrefs_bs4, extract_hrefs_scan
 from src.processing.db_loader import SpimexLoader
+from src.processing.sheet_reader import ListSheet
 
 fake = Faker()
 
 FILES_COUNT = 10
-BULLETIN_DATE = [fake.date_between(start_date="-1m", end_date="today") for _ in range(100)]
+BULLETIN_DATE = sorted({fake.date_between(start_date="-30d", end_date="today") for _ in range(100)})
 EXCHANGE_PRODUCT_IDS = [f"OIL{i}" for i in range(1, 6)]
 DELIVERY_BASIS_IDS = [f"DB{i}" for i in range(1, 6)]
 DELIVERY_BASIS_NAMES = [f"Basis{i}" for i in range(1, 6)]
 DELIVERY_TYPE_IDS = ["A", "B", "C", "D", "E"]
+XLS_BODY = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1" + b"bulletin" * 100
 
 
 def generate_product_name():
@@ -32,8 +36,7 @@ def generate_product_name():
 
 def generate_mock_xls_with_dates(num_lines: int = 4) -> list[pd.DataFrame]:
     dfs = []
-    for _ in range(FILES_COUNT):
-        date_obj = random.choice(BULLETIN_DATE)
+    for date_obj in random.sample(BULLETIN_DATE, FILES_COUNT):
         date_str_formatted = date_obj.strftime("%d.%m.%Y")
 
         data = {
@@ -102,6 +105,19 @@ def mock_session(mock_html: str):
     return session
 
 
+def make_download_response(status: int, body: bytes = b"", headers: dict[str, str] | None = None) -> AsyncMock:
+    async def iter_chunked(size: int):
+        for i in range(0, len(body), size):
+            yield body[i : i + size]
+
+    mock_response = MagicMock(status=status, headers=headers or {}, content_length=len(body))
+    mock_response.content.iter_chunked = iter_chunked
+    mock_response.read = AsyncMock(return_value=body)
+    mock_context = AsyncMock()
+    mock_context.__aenter__.return_value = mock_response
+    return mock_context
+
+
 @pytest.fixture
 def mock_xls() -> list[pd.DataFrame]:
     return generate_mock_xls_with_dates()
@@ -122,7 +138,7 @@ def collector(queue: Any) -> LinkCollector:
 @pytest.fixture
 def parser() -> SpimexParser:
     files = [f"fake_{i}.xls" for i in range(1, FILES_COUNT + 1)]
-    return SpimexParser(files=files)
+    return SpimexParser(files=files, reader="pandas")
 
 
 @pytest.fixture
@@ -139,6 +155,20 @@ async def test_extract_links(collector, mock_session):
     assert len(links) > 0
 
 
+def test_scan_extractor_matches_bs4(mock_html):
+    html = (
+        mock_html
+        + """
+      <A data-class="xls" href="/files/oil_xls_20250102120000.xls">02.01.2025</A>
+      <a href='/files/oil_xls_20250103120000.xls?r=1&amp;t=2' class='link xls'>oil_xls_20250103120000.xls</a>
+      <span>oil_xls_20250104120000.xls</span>
+    """
+    )
+    hrefs = extract_hrefs_scan(html)
+    assert hrefs == extract_hrefs_bs4(html)
+    assert [timestamp for _, timestamp in hrefs] == ["20250101120000", "20250615103045", "20250103120000"]
+
+
 @pytest.mark.asyncio
 async def test_collect_links(monkeypatch, collector, queue):
     mock_data = [
@@ -153,6 +183,170 @@ async def test_collect_links(monkeypatch, collector, queue):
     assert collector._extract_links.await_count == 3
 
 
+@pytest.mark.asyncio
+async def test_download_retries_and_reports_failures(monkeypatch, tmp_path):
+    monkeypatch.setattr("src.processing.data_scraper.backoff_delay", lambda attempt: 0)
+    downloader = FileDownloader(download_dir=str(tmp_path), max_concurrent=2, max_retries=2)
+    session = MagicMock()
+    session.get.side_effect = [
+        make_download_response(503),
+        make_download_response(429, headers={"Retry-After": "0"}),
+        make_download_response(200, XLS_BODY),
+        make_download_response(404),
+    ]
+
+    filepath = await downloader._download_file(session, "https://spimex.com/oil_xls_20250101120000.xls")
+    assert filepath is not None
+    with open(filepath, "rb") as f:
+        assert f.read() == XLS_BODY
+
+    missing = await downloader._download_file(session, "https://spimex.com/oil_xls_20250102120000.xls")
+    assert missing is None
+    assert downloader.failed_files == {"https://spimex.com/oil_xls_20250102120000.xls": "HTTP 404"}
+    assert session.get.call_count == 4
+
+
+@pytest.mark.asyncio
+async def test_download_resumes_partial_file(monkeypatch, tmp_path):
+    monkeypatch.setattr("src.processing.data_scraper.backoff_delay", lambda attempt: 0)
+    downloader = FileDownloader(download_dir=str(tmp_path), max_concurrent=1, max_retries=1)
+    filepath = tmp_path / "oil_xls_20250101120000.xls"
+    (tmp_path / "oil_xls_20250101120000.xls.part").write_bytes(XLS_BODY[:10])
+    session = MagicMock()
+    session.get.return_value = make_download_response(
+        206, XLS_BODY[10:], headers={"Content-Range": f"bytes 10-{len(XLS_BODY) - 1}/{len(XLS_BODY)}"}
+    )
+
+    result = await downloader._download_file(session, "https://spimex.com/oil_xls_20250101120000.xls")
+    assert result == str(filepath)
+    assert filepath.read_bytes() == XLS_BODY
+    assert session.get.call_args.kwargs["headers"] == {"Range": "bytes=10-"}
+    assert not (tmp_path / "oil_xls_20250101120000.xls.part").exists()
+
+
+@pytest.mark.asyncio
+async def test_download_keeps_truncated_file_out_of_place(monkeypatch, tmp_path):
+    monkeypatch.setattr("src.processing.data_scraper.backoff_delay", lambda attempt: 0)
+    downloader = FileDownloader(download_dir=str(tmp_path), max_concurrent=1, max_retries=0)
+    truncated = make_download_response(200, XLS_BODY[:10])
+    truncated.__aenter__.return_value.content_length = len(XLS_BODY)
+    session = MagicMock()
+    session.get.return_value = truncated
+
+    result = await downloader._download_file(session, "https://spimex.com/oil_xls_20250101120000.xls")
+    assert result is None
+    assert not (tmp_path / "oil_xls_20250101120000.xls").exists()
+    assert (tmp_path / "oil_xls_20250101120000.xls.part").read_bytes() == XLS_BODY[:10]
+
+
+@pytest.mark.asyncio
+async def test_download_reuses_existing_file(tmp_path):
+    downloader = FileDownloader(download_dir=str(tmp_path), max_concurrent=1)
+    filepath = tmp_path / "oil_xls_20250101120000.xls"
+    filepath.write_bytes(XLS_BODY)
+    session = MagicMock()
+
+    result = await downloader._download_file(session, "https://spimex.com/oil_xls_20250101120000.xls")
+    assert result == str(filepath)
+    assert downloader.downloaded_files == [str(filepath)]
+    session.get.assert_not_called()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("persist", [False, True])
+async def test_download_in_memory(tmp_path, persist):
+    downloader = FileDownloader(download_dir=str(tmp_path), max_concurrent=1, in_memory=True, persist=persist)
+    session = MagicMock()
+    session.get.return_value = make_download_response(200, XLS_BODY)
+
+    bulletin = await downloader._download_file(session, "https://spimex.com/oil_xls_20250101120000.xls")
+    assert isinstance(bulletin, BulletinBuffer)
+    assert bulletin.name == "oil_xls_20250101120000.xls"
+    assert bulletin.getvalue() == XLS_BODY
+    assert (tmp_path / "oil_xls_20250101120000.xls").exists() == persist
+
+
+def test_parse_in_memory_bulletins(mock_read_excel):
+    buffers = [BulletinBuffer(f"oil_xls_2025010{i}120000.xls", XLS_BODY) for i in range(1, FILES_COUNT + 1)]
+    parser = SpimexParser(files=buffers, reader="pandas")
+    parser.parse()
+    assert not parser.parsed_df.empty
+    assert [call.args[0] for call in mock_read_excel.call_args_list] == buffers
+
+
+def test_sheet_extraction_matches_pandas(monkeypatch, mock_xls):
+    for mock_df in mock_xls:
+        rows = [["header"]] + [[v for v in row if not (isinstance(v, float) and np.isnan(v))] for row in mock_df.values]
+        excel_df = pd.DataFrame([[np.nan if v == "" else v for v in row] for row in rows[1:]])
+        monkeypatch.setattr("src.processing.data_parser.pd.read_excel", MagicMock(return_value=excel_df))
+        monkeypatch.setattr("src.processing.data_parser.open_sheet", MagicMock(return_value=ListSheet(rows)))
+
+        expected = SpimexParser(reader="pandas").create_df("fake.xls")
+        result = SpimexParser(reader="xlrd").create_df("fake.xls")
+        pd.testing.assert_frame_equal(result, expected)
+
+
+def test_sheet_extraction_reads_all_sections_in_one_pass(monkeypatch):
+    def section(header: str, product: str) -> list[list]:
+        return [[header], [], [], ["", product, "", "Basis", 10, 1000, *[""] * 8, 2], ["Итого:"]]
+
+    rows = [
+        ["header"],
+        ["", "Дата торгов: 01.01.2025"],
+        *section("Единица измерения: Метрическая тонна", "A100ANK060F"),
+        *section("Единица измерения: Килограмм", "B200FKN060A"),
+        *section("Единица измерения: Кубический метр", "C300ABC060B"),
+    ]
+    excel_df = pd.DataFrame([[np.nan if v == "" else v for v in row] for row in rows[1:]])
+    monkeypatch.setattr("src.processing.data_parser.pd.read_excel", MagicMock(return_value=excel_df))
+    sheet = ListSheet(rows)
+    sheet.row = MagicMock(side_effect=sheet.row)
+    monkeypatch.setattr("src.processing.data_parser.open_sheet", MagicMock(return_value=sheet))
+    sections = {"Единица измерения: Метрическая тонна": "т", "Единица измерения: Кубический метр": "м3"}
+
+    result = SpimexParser(reader="xlrd", sections=sections).create_df("fake.xls")
+    assert list(result["unit"]) == ["т", "м3"]
+    assert list(result["oil_id"]) == ["A100", "C300"]
+    assert sheet.row.call_count == len(rows) - 1
+    expected = SpimexParser(reader="pandas", sections=sections).create_df("fake.xls")
+    pd.testing.assert_frame_equal(result, expected)
+
+    default = SpimexParser(reader="xlrd").create_df("fake.xls")
+    assert list(default["unit"]) == ["Метрическая тонна"]
+
+
+def test_xlrd_sheet_released_after_extraction(monkeypatch):
+    rows = [["header"], ["", "Дата торгов: 01.01.2025"]]
+    book = MagicMock()
+    book.sheet_by_index.return_value = MagicMock(nrows=len(rows), row_values=MagicMock(side_effect=rows.__getitem__))
+    monkeypatch.setattr("src.processing.sheet_reader.xlrd.open_workbook", MagicMock(return_value=book))
+    with pytest.raises(ValueError):
+        SpimexParser(reader="xlrd").create_df("fake.xls")
+    book.release_resources.assert_called_once()
+
+
+def test_sheet_extraction_requires_end_anchor(monkeypatch):
+    rows = [["header"], ["", "Дата торгов: 01.01.2025"], ["Единица измерения: Метрическая тонна"], [], [], ["", "A"]]
+    monkeypatch.setattr("src.processing.data_parser.open_sheet", MagicMock(return_value=ListSheet(rows)))
+    with pytest.raises(ValueError):
+        SpimexParser(reader="xlrd").create_df("fake.xls")
+
+
+def test_compact_parsing_keeps_values(mock_xls, mock_read_excel):
+    files = [f"fake_{i}.xls" for i in range(1, FILES_COUNT + 1)]
+    mock_read_excel.side_effect = [df.copy() for df in mock_xls] * 2
+    plain = SpimexParser(files=files, reader="pandas", compact=False)
+    plain.parse()
+    compact = SpimexParser(files=files, reader="pandas")
+    compact.parse()
+
+    assert isinstance(compact.parsed_df["oil_id"].dtype, pd.CategoricalDtype)
+    assert isinstance(compact.parsed_df["delivery_basis_name"].dtype, pd.CategoricalDtype)
+    assert compact.parsed_df["count"].dtype.kind == "i"
+    assert compact.parsed_df.memory_usage(deep=True).sum() < plain.parsed_df.memory_usage(deep=True).sum()
+    pd.testing.assert_frame_equal(compact.parsed_df, plain.parsed_df, check_dtype=False, check_categorical=False)
+
+
 def test_df_parsing(parser):
     parser.parse()
     parsed_df = parser.parsed_df
@@ -199,3 +393,212 @@ async def test_load_data_to_db(loader):
     else:
         mock_session.add_all.assert_called()
         mock_session.merge.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_load_builds_chunks_lazily():
+    df = pd.DataFrame(
+        {
+            "exchange_product_id": pd.Series(["A1", "B2", None, "D4", "E5"], dtype="category"),
+            "volume": pd.array([10, None, 30, 40, 50], dtype="Int64"),
+            "date": pd.to_datetime(["2025-06-15"] * 5),
+        }
+    )
+    in_flight = 0
+    peak = 0
+    added: list = []
+
+    def make_session():
+        session = AsyncMock()
+        session.__aenter__.return_value = session
+
+        async def commit():
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0)
+            in_flight -= 1
+
+        session.commit.side_effect = commit
+        session.add_all = MagicMock(side_effect=added.extend)
+        return session
+
+    loader = SpimexLoader(MagicMock(side_effect=make_session), df=df, chunk_size=2, max_parallel_chunks=2)
+    assert await loader.load() == 5
+    assert peak <= 2
+    assert [obj.exchange_product_id for obj in added] == ["A1", "B2", None, "D4", "E5"]
+    assert added[1].volume is None
+    assert added[0].date == date(2025, 6, 15)
+
+
+@pytest.mark.asyncio
+async def test_iter_links_skips_pages_newer_than_window(monkeypatch, queue):
+    collector = LinkCollector(start_date=datetime(2023, 1, 1), end_date=datetime(2023, 1, 31), queue=queue)
+    pages = [
+        ([], datetime(2025, 6, 1)),
+        (["https://spimex.com/a.xls"], datetime(2023, 1, 10)),
+        (["https://spimex.com/b.xls"], datetime(2022, 12, 20)),
+    ]
+
+    async def extract_links(session, url):
+        links, collector.page_oldest = pages.pop(0)
+        return links
+
+    monkeypatch.setattr(collector, "_extract_links", extract_links)
+    assert await collector.get_links() == ["https://spimex.com/a.xls", "https://spimex.com/b.xls"]
+    assert not pages
+
+
+@pytest.mark.asyncio
+async def test_collector_drops_only_exact_duplicates(monkeypatch, collector):
+    pages = [
+        [
+            "https://spimex.com/oil_xls_20250616162000.xls",
+            "https://spimex.com/oil_xls_20250616190000.xls",
+            "https://spimex.com/oil_xls_20250616162000.xls",
+        ],
+        ["https://spimex.com/oil_xls_20250616190000.xls", "https://spimex.com/oil_xls_20250613162000.xls"],
+        [],
+    ]
+    monkeypatch.setattr(collector, "_extract_links", AsyncMock(side_effect=pages))
+    assert await collector.get_links() == [
+        "https://spimex.com/oil_xls_20250616162000.xls",
+        "https://spimex.com/oil_xls_20250616190000.xls",
+        "https://spimex.com/oil_xls_20250613162000.xls",
+    ]
+
+
+def test_parser_drops_superseded_bulletins(mock_xls, mock_read_excel):
+    mock_read_excel.side_effect = [mock_xls[0], mock_xls[0].copy(), mock_xls[1]]
+    files = ["oil_xls_20250616190000.xls", "oil_xls_20250616162000.xls", "oil_xls_20250613162000.xls"]
+    parser = SpimexParser(files=files, reader="pandas")
+    parser.parse()
+    assert parser.superseded == {"oil_xls_20250616162000.xls": "oil_xls_20250616190000.xls"}
+    assert parser.parsed_df["date"].nunique() == 2
+    assert len(parser.parsed_df) == 8
+
+
+@pytest.mark.asyncio
+async def test_load_replaces_existing_dates(parser):
+    parser.parse()
+    session = AsyncMock()
+    session.__aenter__.return_value = session
+    session.add_all = MagicMock()
+    loader = SpimexLoader(MagicMock(return_value=session), df=parser.parsed_df, replace_dates=True)
+    await loader.load()
+    statement = session.execute.await_args_list[0].args[0]
+    assert statement.is_delete
+    assert session.add_all.called
+
+
+def staged_session(copy_error: Exception | None = None):
+    copied: list[tuple] = []
+
+    async def copy_records_to_table(table, records, columns):
+        if copy_error is not None:
+            raise copy_error
+        copied.extend(records)
+
+    raw_connection = MagicMock()
+    raw_connection.driver_connection.copy_records_to_table = AsyncMock(side_effect=copy_records_to_table)
+    connection = MagicMock(get_raw_connection=AsyncMock(return_value=raw_connection))
+    session = AsyncMock()
+    session.__aenter__.return_value = session
+    session.connection = AsyncMock(return_value=connection)
+    return session, copied
+
+
+@pytest.mark.asyncio
+async def test_staged_load_swaps_dates_in_one_transaction(parser):
+    parser.parse()
+    session, copied = staged_session()
+    loader = SpimexLoader(MagicMock(return_value=session), df=parser.parsed_df, replace_dates=True, staged=True)
+    assert await loader.load() == len(parser.parsed_df)
+
+    calls = session.execute.await_args_list
+    statements = [call.args[0] for call in calls]
+    days = sorted(parser.parsed_df["date"].dt.date.unique())
+    assert "CREATE TEMP TABLE" in str(statements[0])
+    assert [call.args[1]["day"] for call in calls[1 : len(days) + 1]] == [day.toordinal() for day in days]
+    assert all("pg_advisory_xact_lock" in str(statement) for statement in statements[1 : len(days) + 1])
+    assert statements[len(days) + 1].is_delete
+    assert str(statements[len(days) + 2]).startswith("INSERT INTO spimex_trading_results")
+    assert len(copied) == len(parser.parsed_df)
+    columns = session.connection.return_value.get_raw_connection.return_value.driver_connection.copy_records_to_table
+    assert "unit" in columns.await_args.kwargs["columns"]
+    session.commit.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_staged_load_keeps_dates_loaded_from_newer_bulletins(parser):
+    parser.parse()
+    df = parser.parsed_df
+    df["bulletin"] = "20250616162000"
+    days = sorted(df["date"].dt.date.unique())
+    newer, older = days[0], days[1:]
+    session, _ = staged_session()
+
+    async def execute(statement, params=None):
+        if getattr(statement, "is_select", False):
+            return MagicMock(tuples=MagicMock(return_value=[(newer, "20250616190000")]))
+        return MagicMock(rowcount=0)
+
+    session.execute.side_effect = execute
+    loader = SpimexLoader(MagicMock(return_value=session), df=df, replace_dates=True, staged=True)
+    assert await loader.load() == int((df["date"].dt.date != newer).sum())
+
+    calls = session.execute.await_args_list
+    assert any(call.args[1:] == ({"dates": [newer]},) for call in calls)
+    replaced = next(call.args[0] for call in calls if getattr(call.args[0], "is_delete", False))
+    assert replaced.compile().params["date_1"] == older
+    upsert = next(call.args[0] for call in calls if getattr(call.args[0], "is_insert", False))
+    assert sorted(value for value in upsert.compile().params.values() if isinstance(value, date)) == older
+
+
+@pytest.mark.asyncio
+async def test_staged_load_reports_ignored_update_on_conflict(parser, caplog):
+    parser.parse()
+    session, _ = staged_session()
+    loader = SpimexLoader(MagicMock(return_value=session), df=parser.parsed_df, update_on_conflict=True, staged=True)
+    await loader.load()
+    assert "update_on_conflict" in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_staged_load_rolls_back_on_failure(parser):
+    parser.parse()
+    session, _ = staged_session(copy_error=RuntimeError("copy failed"))
+    loader = SpimexLoader(MagicMock(return_value=session), df=parser.parsed_df, replace_dates=True, staged=True)
+    with pytest.raises(RuntimeError):
+        await loader.load()
+    session.rollback.assert_awaited_once()
+    session.commit.assert_not_awaited()
+    assert len(session.execute.await_args_list) == 1
+
+
+def test_parser_quarantines_broken_bulletins(tmp_path, mock_xls, mock_read_excel):
+    broken = tmp_path / "oil_xls_20250616162000.xls"
+    broken.write_bytes(b"truncated")
+    mock_read_excel.side_effect = [mock_xls[0], ValueError("no anchor"), mock_xls[1]]
+    quarantine = tmp_path / "quarantine"
+    parser = SpimexParser(
+        files=["fake_1.xls", str(broken), BulletinBuffer("fake_2.xls", b"data")],
+        reader="pandas",
+        quarantine_dir=str(quarantine),
+    )
+    parser.parse()
+
+    assert parser.failed == {"oil_xls_20250616162000.xls": "ValueError: no anchor"}
+    assert not broken.exists()
+    assert (quarantine / "oil_xls_20250616162000.xls").read_bytes() == b"truncated"
+    assert "no anchor" in (quarantine / "oil_xls_20250616162000.xls.reason.txt").read_text(encoding="utf-8")
+    assert parser.summary() == {"parsed": 2, "failed": 1, "superseded": 0, "rows": len(parser.parsed_df)}
+    assert parser.parsed_df["date"].nunique() == 2
+
+
+def test_parser_without_valid_bulletins(mock_read_excel):
+    mock_read_excel.side_effect = ValueError("no anchor")
+    parser = SpimexParser(files=["fake_1.xls"], reader="pandas")
+    parser.parse()
+    assert parser.parsed_df is None
+    assert parser.summary()["failed"] == 1
@@ -0,0 +1,101 @@
+from datetime import date
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pandas as pd
+import pytest
+
+from src.processing.backfill import BackfillPlanner, Shard, plan_shards
+from src.processing.data_scraper import LinkCollector
+from src.processing.db_updater import UpdaterConfig
+
+
+def test_plan_shards_splits_by_month():
+    shards = plan_shards(date(2023, 1, 15), date(2023, 3, 10))
+    assert shards == [
+        Shard(date(2023, 1, 15), date(2023, 1, 31)),
+        Shard(date(2023, 2, 1), date(2023, 2, 28)),
+        Shard(date(2023, 3, 1), date(2023, 3, 10)),
+    ]
+    assert len(plan_shards(date(2023, 1, 1), date(2023, 12, 31), months=3)) == 4
+
+
+@pytest.mark.asyncio
+async def test_backfill_resumes_and_checkpoints_only_successful_shards():
+    planner = BackfillPlanner(date(2023, 1, 1), date(2023, 4, 30), sessionmaker=MagicMock())
+    done, failing, ok = planner.shards[0], planner.shards[1], planner.shards[2:]
+
+    async def load_shard(shard: Shard) -> int:
+        if shard == failing:
+            raise RuntimeError("boom")
+        return 10
+
+    with (
+        patch("src.processing.backfill.create_tables", new_callable=AsyncMock),
+        patch.object(planner, "pending_shards", AsyncMock(return_value=planner.shards[1:])),
+        patch.object(planner, "load_shard", side_effect=load_shard) as mock_load,
+        patch.object(planner, "checkpoint", new_callable=AsyncMock) as mock_checkpoint,
+    ):
+        completed = await planner.run()
+
+    assert done not in [call.args[0] for call in mock_load.call_args_list]
+    assert [call.args[0] for call in mock_checkpoint.call_args_list] == ok
+    assert completed == {shard.key: 10 for shard in ok}
+    assert planner.failed == {failing.key: "boom"}
+
+
+@pytest.mark.asyncio
+async def test_load_shard_replaces_parsed_dates_in_one_transaction():
+    sessionmaker = MagicMock()
+    planner = BackfillPlanner(date(2023, 1, 1), date(2023, 1, 31), sessionmaker=sessionmaker)
+    df = pd.DataFrame({"date": [pd.Timestamp("2023-01-10")]})
+    scraper = MagicMock(scrape=AsyncMock(), scraped_files=["a.xls"], downloader=MagicMock(failed_files={}))
+    loader = MagicMock(load=AsyncMock(return_value=1))
+    with (
+        patch("src.processing.backfill.SpimexScraper", return_value=scraper),
+        patch("src.processing.backfill.SpimexParser", return_value=MagicMock(parsed_df=df, failed={})),
+        patch("src.processing.backfill.SpimexLoader", return_value=loader) as mock_loader,
+    ):
+        assert await planner.load_shard(planner.shards[0]) == 1
+
+    assert mock_loader.call_args.kwargs == {"replace_dates": True, "staged": True}
+    sessionmaker.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_fully_quarantined_shard_is_not_checkpointed():
+    planner = BackfillPlanner(date(2023, 1, 1), date(2023, 1, 31), sessionmaker=MagicMock())
+    scraper = MagicMock(scrape=AsyncMock(), scraped_files=["a.xls"], downloader=MagicMock(failed_files={}))
+    parser = MagicMock(parsed_df=None, failed={"a.xls": "ValueError: bad sheet"})
+    with (
+        patch("src.processing.backfill.create_tables", new_callable=AsyncMock),
+        patch("src.processing.backfill.SpimexScraper", return_value=scraper),
+        patch("src.processing.backfill.SpimexParser", return_value=parser),
+        patch.object(planner, "pending_shards", AsyncMock(return_value=planner.shards)),
+        patch.object(planner, "checkpoint", new_callable=AsyncMock) as mock_checkpoint,
+    ):
+        assert await planner.run() == {}
+
+    mock_checkpoint.assert_not_called()
+    assert planner.shards[0].key in planner.failed
+
+
+@pytest.mark.asyncio
+async def test_rerun_shard_parses_bulletins_already_on_disk(tmp_path):
+    filename = "oil_xls_20230110162000.xls"
+    (tmp_path / filename).write_bytes(b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1" + b"bulletin")
+    config = UpdaterConfig(directory=str(tmp_path), workers=1)
+    planner = BackfillPlanner(date(2023, 1, 1), date(2023, 1, 31), config=config, sessionmaker=MagicMock())
+
+    async def iter_links(self):
+        yield [f"https://spimex.com/upload/reports/oil_xls/{filename}"]
+
+    parser = MagicMock(parsed_df=pd.DataFrame({"date": [pd.Timestamp("2023-01-10")]}), failed={})
+    loader = MagicMock(load=AsyncMock(return_value=5))
+    with (
+        patch.object(LinkCollector, "iter_links", iter_links),
+        patch("src.processing.backfill.SpimexParser", return_value=parser) as mock_parser,
+        patch("src.processing.backfill.SpimexLoader", return_value=loader),
+    ):
+        assert await planner.load_shard(planner.shards[0]) == 5
+
+    assert mock_parser.call_args.args[0] == [str(tmp_path / filename)]
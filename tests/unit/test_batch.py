@@ -0,0 +1,97 @@
+import json
+from datetime import date
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from src.database.dependencies import get_async_db, get_primary_db
+from src.database.models import DEFAULT_UNIT, SpimexTradingResults
+
+
+def make_row(oil_id: str, type_id: str, day: date) -> SpimexTradingResults:
+    return SpimexTradingResults(
+        exchange_product_id=f"{oil_id}ANK{type_id}",
+        oil_id=oil_id,
+        delivery_basis_id="ANK",
+        delivery_basis_name="Basis ANK",
+        delivery_type_id=type_id,
+        volume=10,
+        total=1000,
+        count=1,
+        unit=DEFAULT_UNIT,
+        date=day,
+    )
+
+
+@pytest.fixture
+def db(monkeypatch):
+    rows = [
+        make_row("A100", "F", date(2025, 6, 16)),
+        make_row("A100", "F", date(2025, 6, 17)),
+        make_row("A592", "A", date(2025, 6, 17)),
+        make_row("A001", "F", date(2025, 6, 17)),
+    ]
+    session = MagicMock(info={})
+    session.scalar = AsyncMock(return_value=date(2025, 6, 17))
+    session.scalars = AsyncMock(return_value=MagicMock(all=MagicMock(return_value=rows)))
+    monkeypatch.setattr("src.api.routes.get_snapshot", lambda: None)
+    monkeypatch.setitem(app.dependency_overrides, get_async_db, lambda: session)
+    monkeypatch.setitem(app.dependency_overrides, get_primary_db, lambda: session)
+    return session
+
+
+def test_batch_combines_cache_hits_and_one_query(monkeypatch, db):
+    cached = json.dumps([{"cached": True}])
+    get_many = AsyncMock(side_effect=lambda keys, app=None: [cached if "A001" in key else None for key in keys])
+    set_many = AsyncMock()
+    monkeypatch.setattr("src.api.routes.get_many", get_many)
+    monkeypatch.setattr("src.api.routes.set_many", set_many)
+
+    response = TestClient(app).post(
+        "/v1/trades/batch",
+        json={
+            "queries": [
+                {"kind": "results", "oil_id": ["A100", "A592"]},
+                {"kind": "dynamics", "start_date": "2025-06-16", "end_date": "2025-06-16", "oil_id": ["A100"]},
+                {"kind": "results", "oil_id": ["A001"]},
+            ]
+        },
+    )
+    assert response.status_code == 200
+    results, dynamics, from_cache = response.json()
+    assert [(item["oil_id"], item["date"]) for item in results] == [("A100", "2025-06-17"), ("A592", "2025-06-17")]
+    assert [(item["oil_id"], item["date"]) for item in dynamics] == [("A100", "2025-06-16")]
+    assert from_cache == [{"cached": True}]
+
+    assert get_many.call_args[0][0] == [
+        "cache:/v1/trades/results?oil_id=A100&oil_id=A592",
+        "cache:/v1/trades/dynamics?start_date=2025-06-16&end_date=2025-06-16&oil_id=A100",
+        "cache:/v1/trades/results?oil_id=A001",
+    ]
+    db.scalars.assert_awaited_once()
+    assert list(set_many.call_args[0][0]) == get_many.call_args[0][0][:2]
+
+
+@pytest.mark.parametrize(
+    "path, params",
+    [
+        ("/v1/trades/dates", {"days": 2}),
+        ("/v1/trades/dynamics", {"start_date": "2025-06-16", "end_date": "2025-06-17"}),
+    ],
+)
+def test_reads_from_primary_while_replica_lags(monkeypatch, db, path, params):
+    replica = MagicMock(info={"replica": True})
+    replica.scalar = AsyncMock(return_value=date(2025, 6, 16))
+    replica.scalars = AsyncMock()
+    db.scalars.return_value = MagicMock(all=MagicMock(return_value=[]))
+    monkeypatch.setitem(app.dependency_overrides, get_async_db, lambda: replica)
+    monkeypatch.setattr("src.api.routes.get_latest_date", AsyncMock(return_value=date(2025, 6, 17)))
+    monkeypatch.setattr("src.api.routes.get_from_cache", AsyncMock(return_value=None))
+    monkeypatch.setattr("src.api.routes.set_cache", AsyncMock())
+
+    response = TestClient(app).get(path, params=params)
+    assert response.status_code == 200
+    replica.scalars.assert_not_awaited()
+    db.scalars.assert_awaited_once()
@@ -1,8 +1,19 @@
-from unittest.mock import AsyncMock, patch
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
-from src.cache import get_cache_key, get_from_cache, set_cache
+from src.cache import (
+    CACHE_SET,
+    WARM_HEADER,
+    WARM_TOKEN,
+    cache_ttl,
+    get_cache_key,
+    get_from_cache,
+    set_cache,
+    unwrap_entry,
+    wrap_entry,
+)
 
 
 def test_get_cache_key():
@@ -17,44 +28,103 @@ def test_get_cache_key():
     assert key == "cache:/test-path?param=1"
 
 
+class MockURL:
+    path = "/path"
+    query = ""
+
+
+class MockRequest:
+    url = MockURL()
+    app = object()
+
+    def __init__(self, headers: dict[str, str] | None = None) -> None:
+        self.headers = headers or {}
+
+
 @pytest.mark.asyncio
 @pytest.mark.parametrize(
     "redis_value, expected",
     [
         ('{"foo": 123}', {"foo": 123}),
+        ('4102444800|{"foo": 123}', {"foo": 123}),
         (None, None),
     ],
 )
 async def test_get_from_cache(redis_value, expected):
-    class MockURL:
-        path = "/path"
-        query = ""
-
-    class MockRequest:
-        url = MockURL()
-
-    with patch("src.cache.async_redis_client.get", new_callable=AsyncMock) as mock_get:
-        mock_get.return_value = redis_value
+    with (
+        patch("src.cache.async_redis_client.eval", new_callable=AsyncMock) as mock_eval,
+        patch("src.cache.schedule_refresh") as mock_refresh,
+    ):
+        mock_eval.return_value = [redis_value]
         result = await get_from_cache(MockRequest())
         assert result == expected
+        assert "cache:/path?" in mock_eval.call_args[0]
+        mock_refresh.assert_not_called()
 
 
 @pytest.mark.asyncio
-async def test_set_cache_calls_redis_set():
-    class MockURL:
-        path = "/path"
-        query = ""
+async def test_get_from_cache_serves_stale_and_refreshes_once():
+    request = MockRequest()
+    with (
+        patch("src.cache.async_redis_client.eval", new_callable=AsyncMock, return_value=['1|{"foo": 1}']),
+        patch("src.cache.schedule_refresh") as mock_refresh,
+    ):
+        assert await get_from_cache(request) == {"foo": 1}
+        mock_refresh.assert_called_once_with(request.app, "cache:/path?")
+
+
+@pytest.mark.asyncio
+async def test_get_from_cache_bypassed_by_refresh_request():
+    with patch("src.cache.async_redis_client.eval", new_callable=AsyncMock) as mock_eval:
+        assert await get_from_cache(MockRequest({WARM_HEADER: WARM_TOKEN})) is None
+        mock_eval.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_get_from_cache_ignores_forged_warm_header():
+    with patch("src.cache.async_redis_client.eval", new_callable=AsyncMock, return_value=['{"foo": 1}']) as mock_eval:
+        assert await get_from_cache(MockRequest({WARM_HEADER: "1"})) == {"foo": 1}
+        mock_eval.assert_awaited_once()
 
-    class MockRequest:
-        url = MockURL()
 
+@pytest.mark.asyncio
+async def test_set_cache_calls_redis_set():
     data = {"foo": 123}
 
-    with patch("src.cache.async_redis_client.set", new_callable=AsyncMock) as mock_set:
+    with patch("src.cache.async_redis_client.eval", new_callable=AsyncMock) as mock_eval:
         await set_cache(MockRequest(), data)
-        mock_set.assert_called_once()
-        called_key, called_value = mock_set.call_args[0]
-        assert called_key == "cache:/path?"
-        import json
+        mock_eval.assert_called_once()
+        script, numkeys, *args = mock_eval.call_args[0]
+        assert script == CACHE_SET
+        assert args[3] == "cache:/path?"
+        hard_ttl, value = args[numkeys + 2 :]
+        assert hard_ttl == cache_ttl("cache:/path?")[1]
+        payload, stale = unwrap_entry(value)
+        assert not stale
+        assert json.loads(payload) == data
+
+
+def test_entry_envelope_soft_expiry():
+    soft_ttl, hard_ttl = cache_ttl("cache:/v1/trades/dynamics?start_date=2025-01-01")
+    assert soft_ttl < hard_ttl
+    ttl, value = wrap_entry("cache:/v1/trades/dynamics?", "[1]", now=1000)
+    assert ttl == hard_ttl
+    assert unwrap_entry(value, now=1000 + soft_ttl - 1) == ("[1]", False)
+    assert unwrap_entry(value, now=1000 + soft_ttl) == ("[1]", True)
+    assert unwrap_entry('["legacy|value"]') == ('["legacy|value"]', False)
+
 
-        assert json.loads(called_value) == data
+@pytest.mark.asyncio
+async def test_refresh_entry_is_single_flight():
+    from src.cache import refresh_entry
+
+    client = MagicMock(set=AsyncMock(side_effect=[True, False]), delete=AsyncMock())
+    app = AsyncMock()
+    with (
+        patch("src.cache.get_redis_client", return_value=client),
+        patch("httpx.AsyncClient.get", new_callable=AsyncMock) as mock_get,
+    ):
+        await refresh_entry(app, "cache:/v1/trades/results?oil_id=A100")
+        await refresh_entry(app, "cache:/v1/trades/results?oil_id=A100")
+    mock_get.assert_awaited_once_with("/v1/trades/results?oil_id=A100")
+    client.delete.assert_awaited_once_with("lock:cache:/v1/trades/results?oil_id=A100")
@@ -0,0 +1,112 @@
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from src.api.middleware import AccessStatsMiddleware, CompressionMiddleware, ETagMiddleware
+from src.cache import WARM_HEADER, WARM_TOKEN
+
+PAYLOAD = [{"oil_id": "A100", "volume": i} for i in range(200)]
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def client(calls):
+    app = FastAPI()
+    app.add_middleware(ETagMiddleware)
+    app.add_middleware(AccessStatsMiddleware)
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @app.get("/v1/trades/dynamics")
+    async def dynamics():
+        calls.append("dynamics")
+        return PAYLOAD
+
+    @app.get("/v1/trades/results")
+    async def results(request: Request):
+        calls.append("results")
+        request.state.data_version = "7"
+        return PAYLOAD
+
+    @app.get("/v1/trades/ping")
+    async def ping():
+        return {"status": "ok"}
+
+    return TestClient(app)
+
+
+@pytest.fixture
+def version():
+    with patch("src.api.middleware.get_data_version", new_callable=AsyncMock, return_value="7") as mock_version:
+        yield mock_version
+
+
+def test_large_responses_are_gzipped(client, version):
+    response = client.get("/v1/trades/dynamics", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.json() == PAYLOAD
+    assert response.headers["etag"].endswith('-gzip"')
+
+    small = client.get("/v1/trades/ping", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+
+
+def test_if_none_match_short_circuits(client, calls, version):
+    first = client.get("/v1/trades/dynamics", headers={"Accept-Encoding": "identity"})
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "no-cache"
+
+    second = client.get("/v1/trades/dynamics", headers={"If-None-Match": etag, "Accept-Encoding": "identity"})
+    assert second.status_code == 304
+    assert second.headers["etag"] == etag
+    assert calls == ["dynamics"]
+
+
+def test_etag_changes_with_data_version(client, version):
+    first = client.get("/v1/trades/dynamics?b=2&a=1").headers["etag"]
+    assert client.get("/v1/trades/dynamics?a=1&b=2").headers["etag"] == first
+    version.return_value = "8"
+    assert client.get("/v1/trades/dynamics?a=1&b=2").headers["etag"] != first
+
+
+def test_etag_follows_version_of_served_snapshot(client, calls, version):
+    version.return_value = "8"
+    stale = client.get("/v1/trades/results", headers={"Accept-Encoding": "identity"})
+    assert (
+        stale.headers["etag"]
+        != client.get("/v1/trades/dynamics", headers={"Accept-Encoding": "identity"}).headers["etag"]
+    )
+
+    again = client.get("/v1/trades/results", headers={"If-None-Match": stale.headers["etag"]})
+    assert again.status_code == 200
+    assert calls == ["results", "dynamics", "results"]
+
+    version.return_value = "7"
+    fresh = client.get("/v1/trades/results", headers={"If-None-Match": stale.headers["etag"]})
+    assert fresh.status_code == 304
+
+
+def test_no_etag_without_data_version(client):
+    with patch("src.api.middleware.get_data_version", new_callable=AsyncMock, return_value=None):
+        response = client.get("/v1/trades/dynamics", headers={"If-None-Match": "*"})
+    assert response.status_code == 200
+    assert "etag" not in response.headers
+
+
+def test_access_stats_skip_warmup_requests(client, version):
+    with (
+        patch("src.api.middleware.record_hit") as mock_record,
+        patch("src.api.middleware.flush_hits", new_callable=AsyncMock),
+    ):
+        client.get("/v1/trades/dynamics?a=1")
+        client.get("/v1/trades/dynamics?a=1", headers={WARM_HEADER: WARM_TOKEN})
+        client.get("/v1/trades/dynamics?a=2", headers={WARM_HEADER: "1"})
+    assert [call.args[0] for call in mock_record.call_args_list] == [
+        "/v1/trades/dynamics?a=1",
+        "/v1/trades/dynamics?a=2",
+    ]
@@ -0,0 +1,105 @@
+from datetime import date, datetime
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from src.database.models import ListingState
+from src.processing.listing_watcher import ListingWatcher
+
+BASE = "https://spimex.com/upload/reports/oil_xls"
+
+
+def listing(*timestamps: str) -> str:
+    return "".join(f'<a class="xls" href="/upload/reports/oil_xls/oil_xls_{ts}.xls?r=1">x</a>' for ts in timestamps)
+
+
+def http_session(pages: list[tuple[int, str]], headers: dict[str, str] | None = None) -> MagicMock:
+    responses = []
+    for status, text in pages:
+        resp = MagicMock(status=status, headers=headers or {})
+        resp.text = AsyncMock(return_value=text)
+        context = AsyncMock()
+        context.__aenter__.return_value = resp
+        responses.append(context)
+    http = MagicMock()
+    http.get = MagicMock(side_effect=responses)
+    session = AsyncMock()
+    session.__aenter__.return_value = http
+    return session
+
+
+def db_session(state: ListingState | None, has_known: bool = True, loaded_until: date | None = None) -> MagicMock:
+    session = MagicMock()
+    session.get = AsyncMock(return_value=state)
+    session.scalar = AsyncMock(side_effect=["known" if has_known else None, loaded_until])
+    session.commit = AsyncMock()
+    context = AsyncMock()
+    context.__aenter__.return_value = session
+    return MagicMock(return_value=context)
+
+
+def watcher(sessionmaker: MagicMock, known: set[str]) -> ListingWatcher:
+    instance = ListingWatcher(sessionmaker, max_pages=3)
+    instance.known_links = AsyncMock(side_effect=lambda _, links: {link for link in links if link in known})
+    instance.remember = AsyncMock()
+    return instance
+
+
+def test_page_links_normalizes_hrefs():
+    html = listing("20250102162000", "20250102162000") + '<a class="xls" href="/oil_xls_20251399000000.xls">x</a>'
+    assert ListingWatcher(MagicMock()).page_links(html) == [f"{BASE}/oil_xls_20250102162000.xls"]
+
+
+@pytest.mark.asyncio
+async def test_poll_sends_conditional_headers_and_skips_unchanged_page():
+    state = ListingState(url="x", etag='"abc"', last_modified="Thu, 02 Jan 2025 16:20:00 GMT")
+    instance = watcher(db_session(state), set())
+    http = http_session([(304, "")])
+    with patch("src.processing.listing_watcher.aiohttp.ClientSession", return_value=http):
+        assert await instance.poll() == []
+    headers = http.__aenter__.return_value.get.call_args.kwargs["headers"]
+    assert headers == {"If-None-Match": '"abc"', "If-Modified-Since": "Thu, 02 Jan 2025 16:20:00 GMT"}
+    instance.remember.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_poll_stops_at_first_known_link():
+    state = ListingState(url="x", newest=datetime(2025, 1, 2, 16, 20))
+    known = {f"{BASE}/oil_xls_20250102162000.xls"}
+    instance = watcher(db_session(state), known)
+    http = http_session(
+        [(200, listing("20250106162000", "20250106120000", "20250105162000")), (200, listing("20250102162000"))],
+        headers={"ETag": '"v2"'},
+    )
+    with patch("src.processing.listing_watcher.aiohttp.ClientSession", return_value=http):
+        links = await instance.poll()
+
+    assert links == [
+        f"{BASE}/oil_xls_20250106162000.xls",
+        f"{BASE}/oil_xls_20250106120000.xls",
+        f"{BASE}/oil_xls_20250105162000.xls",
+    ]
+    assert http.__aenter__.return_value.get.call_count == 2
+    instance.remember.assert_not_called()
+    assert state.etag == '"v2"'
+    assert state.newest == datetime(2025, 1, 6, 16, 20)
+
+
+@pytest.mark.asyncio
+async def test_poll_seeds_empty_index_only_with_loaded_dates():
+    instance = watcher(db_session(None, has_known=False, loaded_until=date(2025, 1, 6)), set())
+    http = http_session([(200, listing("20250107162000", "20250106162000", "20250105162000"))])
+    with patch("src.processing.listing_watcher.aiohttp.ClientSession", return_value=http):
+        links = await instance.poll()
+
+    assert links == [f"{BASE}/oil_xls_20250107162000.xls", f"{BASE}/oil_xls_20250106162000.xls"]
+    assert instance.remember.call_args.args[1] == [f"{BASE}/oil_xls_20250105162000.xls"]
+
+
+@pytest.mark.asyncio
+async def test_poll_seeds_nothing_on_empty_database():
+    instance = watcher(db_session(None, has_known=False), set())
+    http = http_session([(200, listing("20250106162000"))])
+    with patch("src.processing.listing_watcher.aiohttp.ClientSession", return_value=http):
+        assert await instance.poll() == [f"{BASE}/oil_xls_20250106162000.xls"]
+    assert instance.remember.call_args.args[1] == []
@@ -0,0 +1,75 @@
+import argparse
+import random
+import re
+from datetime import date
+from unittest.mock import AsyncMock, MagicMock
+
+import numpy as np
+import pytest
+
+from src.scripts.load_test import (
+    MemoryCache,
+    latency_stats,
+    parse_mix,
+    request_mix,
+    synthetic_day,
+    trading_days,
+)
+
+
+def test_synthetic_day_matches_api_id_formats():
+    df = synthetic_day(date(2025, 6, 2), 50, np.random.default_rng(0))
+    assert len(df) == 50
+    assert df["oil_id"].str.fullmatch(r"[A-Z0-9]{4}").all()
+    assert df["delivery_basis_id"].str.fullmatch(r"[A-Z0-9]{3}").all()
+    assert df["delivery_type_id"].str.fullmatch(r"[A-Z0-9]").all()
+    assert (df["exchange_product_id"].str[:4] == df["oil_id"]).all()
+    assert (df["total"] >= df["volume"]).all()
+
+
+def test_trading_days_skip_weekends():
+    days = trading_days(1, date(2025, 6, 30))
+    assert days[-1] == date(2025, 6, 30)
+    assert all(day.weekday() < 5 for day in days)
+    assert 255 <= len(days) <= 262
+
+
+def test_parse_mix():
+    assert parse_mix("dates=1,results=3") == {"dates": 1, "results": 3}
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_mix("trades=1")
+
+
+def test_latency_stats_percentiles():
+    stats = latency_stats([i / 1000 for i in range(1, 101)], elapsed=2.0)
+    assert stats["requests"] == 100
+    assert stats["rps"] == 50.0
+    assert stats["p50_ms"] == pytest.approx(50.5)
+    assert stats["p99_ms"] == pytest.approx(99.01)
+
+
+async def test_memory_cache_round_trip():
+    cache = MemoryCache()
+    await cache.set_many({"cache:/v1/trades/results?": "[1]"})
+    assert await cache.get_many(["cache:/v1/trades/results?", "cache:/missing"]) == ["[1]", None]
+    await cache.clear()
+    assert await cache.get_many(["cache:/v1/trades/results?"]) == [None]
+
+
+async def test_request_mix_builds_valid_paths(monkeypatch):
+    session = MagicMock()
+    session.__aenter__ = AsyncMock(return_value=session)
+    session.__aexit__ = AsyncMock(return_value=None)
+    first = MagicMock()
+    first.one.return_value = (date(2025, 1, 1), date(2025, 6, 30))
+    session.execute = AsyncMock(side_effect=[first, [("A100", "B01"), ("A101", "B02")]])
+    monkeypatch.setattr("src.scripts.load_test.get_async_session_maker", lambda: lambda: session)
+
+    requests = await request_mix({"dates": 1, "results": 1, "dynamics": 1}, 30, random.Random(0))
+    assert len(requests) == 30
+    assert {kind for kind, _ in requests} == {"dates", "results", "dynamics"}
+    for kind, path in requests:
+        assert path.startswith(f"/v1/trades/{kind}")
+    dynamics = [path for kind, path in requests if kind == "dynamics"]
+    start, end = map(date.fromisoformat, re.findall(r"\d{4}-\d{2}-\d{2}", dynamics[0]))
+    assert start < end <= date(2025, 6, 30)
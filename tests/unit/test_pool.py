@@ -0,0 +1,50 @@
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.util import greenlet_spawn
+
+from main import app
+from src.database.config import POOL_PROFILES
+from src.database.connection import _engines, create_profile_engine
+from src.database.pool import InstrumentedPool
+
+
+def exhaust(pool: InstrumentedPool) -> None:
+    first = pool.connect()
+    with pytest.raises(PoolTimeoutError):
+        pool.connect()
+    first.close()
+    pool.connect().close()
+
+
+@pytest.mark.asyncio
+async def test_pool_records_checkouts_and_timeouts():
+    pool = InstrumentedPool(MagicMock, pool_size=1, max_overflow=0, timeout=0.01)
+    await greenlet_spawn(exhaust, pool)
+    snapshot = pool.snapshot()
+    assert snapshot["checkouts"] == 2
+    assert snapshot["timeouts"] == 1
+    assert snapshot["checked_out"] == 0
+    assert pool.recreate().stats is pool.stats
+
+
+@pytest.fixture(autouse=True)
+def database_url(monkeypatch):
+    monkeypatch.setattr("src.database.connection.ASYNC_DATABASE_URL", "postgresql+asyncpg://u:p@localhost:5432/db")
+
+
+@pytest.mark.parametrize("profile", ["api", "ingest"])
+def test_profile_engine_uses_profile_pool(profile):
+    engine = create_profile_engine(profile)
+    assert isinstance(engine.pool, InstrumentedPool)
+    assert engine.pool.size() == POOL_PROFILES[profile].pool_size
+    assert engine.pool.timeout() == POOL_PROFILES[profile].pool_timeout
+
+
+def test_pool_status_route(monkeypatch):
+    monkeypatch.setitem(_engines, "ingest", create_profile_engine("ingest"))
+    response = TestClient(app).get(app.url_path_for("get_pool_status"))
+    assert response.status_code == 200
+    assert response.json()["ingest"]["checkouts"] == 0
@@ -0,0 +1,72 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.api.middleware import ProfilingMiddleware
+from src.profiling import _current_profile, profile_phase, profiling_mode, start_profile
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware)
+
+    @app.get("/slow")
+    async def slow():
+        with profile_phase("sql"):
+            pass
+        return {"status": "ok"}
+
+    return TestClient(app)
+
+
+def test_profile_phase_without_profile_is_noop():
+    with profile_phase("sql"):
+        pass
+    assert _current_profile.get() is None
+
+
+def test_start_profile_collects_phases():
+    with start_profile("run") as profile:
+        with profile_phase("parse"):
+            pass
+        with profile_phase("parse"):
+            pass
+        with profile_phase("load"):
+            pass
+    assert set(profile.phases) == {"parse", "load"}
+    assert "total;dur=" in profile.server_timing()
+    assert _current_profile.get() is None
+
+
+@pytest.mark.parametrize(
+    "enabled, header, expected",
+    [
+        (False, "1", None),
+        (True, None, None),
+        (True, "1", "timings"),
+        (True, "flamegraph", "flamegraph"),
+        (True, "0", None),
+        (True, "off", None),
+    ],
+)
+def test_profiling_mode(monkeypatch, enabled, header, expected):
+    monkeypatch.setattr("src.profiling.PROFILE_ENABLED", enabled)
+    monkeypatch.setattr("src.profiling.PROFILE_SAMPLE_RATE", 0.0)
+    assert profiling_mode(header) == expected
+
+
+def test_middleware_adds_server_timing(monkeypatch, client):
+    monkeypatch.setattr("src.profiling.PROFILE_ENABLED", True)
+    response = client.get("/slow", headers={"X-Profile": "1"})
+    assert response.status_code == 200
+    timing = response.headers["server-timing"]
+    assert "sql;dur=" in timing
+    assert "serialize;dur=" in timing
+
+
+def test_middleware_disabled_by_default(monkeypatch, client):
+    monkeypatch.setattr("src.profiling.PROFILE_ENABLED", False)
+    response = client.get("/slow", headers={"X-Profile": "1"})
+    assert response.status_code == 200
+    assert "server-timing" not in response.headers
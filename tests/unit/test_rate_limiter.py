@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from src.processing.rate_limiter import AdaptiveLimiter, backoff_delay
+
+
+def test_limiter_grows_while_fast():
+    limiter = AdaptiveLimiter(initial_limit=2, max_limit=4)
+    for _ in range(20):
+        limiter.on_success(0.1)
+    assert limiter.current_limit == 4
+
+
+def test_limiter_does_not_grow_when_slow():
+    limiter = AdaptiveLimiter(initial_limit=2, max_limit=4)
+    limiter.on_success(0.1)
+    for _ in range(20):
+        limiter.on_success(1.0)
+    assert limiter.current_limit == 2
+
+
+def test_limiter_backs_off_once_per_cooldown():
+    limiter = AdaptiveLimiter(initial_limit=8, cooldown=60)
+    limiter.on_overload()
+    limiter.on_overload()
+    assert limiter.current_limit == 4
+
+
+def test_limiter_respects_min_limit():
+    limiter = AdaptiveLimiter(initial_limit=2, min_limit=1, cooldown=0)
+    for _ in range(5):
+        limiter.on_overload()
+    assert limiter.current_limit == 1
+
+
+@pytest.mark.asyncio
+async def test_limiter_bounds_in_flight():
+    limiter = AdaptiveLimiter(initial_limit=2, max_limit=2)
+    peak = 0
+
+    async def job():
+        nonlocal peak
+        async with limiter.slot():
+            peak = max(peak, limiter.in_flight)
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(*(job() for _ in range(10)))
+    assert peak == 2
+    assert limiter.in_flight == 0
+
+
+@pytest.mark.parametrize("attempt", [0, 3, 10])
+def test_backoff_delay_is_capped(attempt):
+    delay = backoff_delay(attempt, base=1.0, cap=5.0)
+    assert 0 <= delay <= min(5.0, 2**attempt)
@@ -0,0 +1,46 @@
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from src.database.dependencies import get_async_db
+from src.database.routing import ReplicaRouter
+
+REPLICAS = ["postgresql+asyncpg://u:p@replica1/db", "postgresql+asyncpg://u:p@replica2/db"]
+
+
+@pytest.fixture
+def router():
+    return ReplicaRouter(REPLICAS, MagicMock(), check_interval=60)
+
+
+@pytest.mark.asyncio
+async def test_router_skips_unhealthy_replicas(router):
+    with patch.object(router, "ping", new_callable=AsyncMock, side_effect=[False, True]):
+        picked = {await router.pick() for _ in range(3)}
+    assert picked == {REPLICAS[1]}
+
+
+@pytest.mark.asyncio
+async def test_router_fails_over_to_primary(router):
+    with patch.object(router, "ping", new_callable=AsyncMock, return_value=False):
+        assert await router.pick() is None
+
+
+@pytest.mark.asyncio
+async def test_get_async_db_marks_broken_replica_down(router):
+    router._checked = time.monotonic()
+    session = AsyncMock()
+    session.__aenter__.return_value = session
+    session.info = {}
+    router.session_makers = {url: MagicMock(return_value=session) for url in REPLICAS}
+
+    with patch("src.database.dependencies.get_replica_router", return_value=router):
+        dependency = get_async_db()
+        db = await anext(dependency)
+        assert db.info["replica"] is True
+        with pytest.raises(OperationalError):
+            await dependency.athrow(OperationalError("SELECT 1", {}, Exception("connection lost")))
+
+    assert len(router.healthy) == 1
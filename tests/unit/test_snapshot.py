@@ -0,0 +1,73 @@
+import json
+from datetime import date
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from src.api.schemas import TradingDynamicsQuery, TradingResultsQuery, TradingResultsSchema
+from src.api.snapshot import ResultsSnapshot
+from src.database.dependencies import get_async_db, get_primary_db
+
+
+def make_item(oil_id: str, basis_id: str, type_id: str, day: date, unit: str = "т") -> TradingResultsSchema:
+    return TradingResultsSchema(
+        exchange_product_id=f"{oil_id}{basis_id}{type_id}",
+        oil_id=oil_id,
+        delivery_basis_id=basis_id,
+        delivery_basis_name=f"Basis {basis_id}",
+        delivery_type_id=type_id,
+        volume=10,
+        total=1000,
+        count=1,
+        unit=unit,
+        date=day,
+    )
+
+
+@pytest.fixture
+def snapshot():
+    return ResultsSnapshot(
+        [
+            make_item("A100", "ANK", "F", date(2025, 6, 16)),
+            make_item("A100", "ANK", "F", date(2025, 6, 17)),
+            make_item("A100", "FKN", "A", date(2025, 6, 17)),
+            make_item("A592", "ANK", "F", date(2025, 6, 17)),
+            make_item("A592", "ANK", "F", date(2025, 6, 17), unit="м3"),
+        ]
+    )
+
+
+@pytest.mark.parametrize(
+    "filters, expected",
+    [
+        ({"unit": "т"}, ["A100ANKF", "A100FKNA", "A592ANKF"]),
+        ({"oil_id": "A100"}, ["A100ANKF", "A100FKNA"]),
+        ({"oil_id": "A100", "delivery_basis_id": "ANK"}, ["A100ANKF"]),
+        ({"delivery_type_id": "F", "delivery_basis_id": "ANK", "unit": "т"}, ["A100ANKF", "A592ANKF"]),
+        ({"unit": "м3"}, ["A592ANKF"]),
+        ({"oil_id": "ZZZZ"}, []),
+        ({"oil_id": ["A592", "A100"], "delivery_basis_id": "ANK", "unit": ["т"]}, ["A100ANKF", "A592ANKF"]),
+    ],
+)
+def test_snapshot_results_use_latest_date(snapshot, filters, expected):
+    rows = json.loads(snapshot.results(TradingResultsQuery(**filters)))
+    assert [row["exchange_product_id"] for row in rows] == expected
+    assert {row["date"] for row in rows} <= {"2025-06-17"}
+
+
+def test_snapshot_dynamics_window(snapshot):
+    query = TradingDynamicsQuery(start_date=date(2025, 6, 16), end_date=date(2025, 6, 16), oil_id="A100")
+    assert snapshot.covers(query.start_date)
+    assert not snapshot.covers(date(2025, 6, 15))
+    rows = json.loads(snapshot.dynamics(query))
+    assert [row["date"] for row in rows] == ["2025-06-16"]
+
+
+def test_results_route_served_from_snapshot(monkeypatch, snapshot):
+    monkeypatch.setattr("src.api.routes.get_snapshot", lambda: snapshot)
+    monkeypatch.setitem(app.dependency_overrides, get_async_db, lambda: None)
+    monkeypatch.setitem(app.dependency_overrides, get_primary_db, lambda: None)
+    response = TestClient(app).get("/v1/trades/results", params={"oil_id": "A592", "unit": "т"})
+    assert response.status_code == 200
+    assert response.json() == [make_item("A592", "ANK", "F", date(2025, 6, 17)).model_dump(mode="json")]
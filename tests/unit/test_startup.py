@@ -0,0 +1,20 @@
+import subprocess
+import sys
+
+IMPORT_CHECK = """
+import sys
+import main
+from src.cache import get_redis_client
+from src.database.connection import _engines
+
+heavy = [m for m in ("sqlalchemy_utils", "psycopg2", "asyncpg", "redis") if m in sys.modules]
+assert not heavy, heavy
+assert not _engines
+assert get_redis_client.cache_info().currsize == 0
+"""
+
+
+def test_import_main_is_lazy():
+    env = {"DB_HOST": "unreachable.invalid", "DB_PORT": "1", "DB_NAME": "db", "DB_USER": "u", "DB_PASS": "p"}
+    result = subprocess.run([sys.executable, "-c", IMPORT_CHECK], capture_output=True, text=True, env=env)
+    assert result.returncode == 0, result.stderr
@@ -1,10 +1,157 @@
-from unittest.mock import patch
+from datetime import date, datetime
+from unittest.mock import AsyncMock, MagicMock, patch
 
-from src.worker.tasks import clear_cache
+import pytest
 
+from main import app
+from src.cache import DATA_VERSION_KEY, LATEST_DATE_KEY, LOADED_CHANNEL
+from src.database.dependencies import get_async_db, get_primary_db
+from src.worker.tasks import (
+    _collect_links,
+    _warm_cache,
+    _warm_paths,
+    clear_cache,
+    collect_bulletins,
+    finalize_ingest,
+    watch_listing,
+)
 
-def test_clear_cache_calls_flushdb():
-    with patch("src.worker.tasks.sync_redis_client.flushdb") as mock_flush:
+
+def test_clear_cache_deletes_only_cache_keys():
+    with (
+        patch("src.worker.tasks.sync_redis_client.scan_iter", return_value=["cache:/a?", "cache:/b?"]) as mock_scan,
+        patch("src.worker.tasks.sync_redis_client.delete") as mock_delete,
+        patch("src.worker.tasks.warm_cache.delay") as mock_warm,
+    ):
         result = clear_cache()
-        mock_flush.assert_called_once()
+        mock_warm.assert_called_once()
+        assert mock_scan.call_args.kwargs["match"] == "cache:*"
+        mock_delete.assert_called_once_with("cache:/a?", "cache:/b?")
         assert result == "Кэш очищен"
+
+
+def test_collect_bulletins_fans_out_chord():
+    links = ["https://spimex.com/a.xls", "https://spimex.com/b.xls"]
+    with (
+        patch("src.worker.tasks._collect_links", new_callable=AsyncMock, return_value=links),
+        patch("src.worker.tasks.chord") as mock_chord,
+    ):
+        result = collect_bulletins("2025-01-01", "2025-01-31")
+        assert result == 2
+        header = list(mock_chord.call_args[0][0])
+        assert [sig.args for sig in header] == [(link,) for link in links]
+        mock_chord.return_value.assert_called_once()
+
+
+def test_collect_bulletins_without_links_skips_chord():
+    with (
+        patch("src.worker.tasks._collect_links", new_callable=AsyncMock, return_value=[]),
+        patch("src.worker.tasks.chord") as mock_chord,
+    ):
+        assert collect_bulletins() == 0
+        mock_chord.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_collect_links_skips_loaded_bulletins():
+    links = ["https://spimex.com/a.xls", "https://spimex.com/b.xls"]
+    watcher = MagicMock(known_links=AsyncMock(return_value={links[0]}))
+    with (
+        patch("src.database.connection.create_worker_engine", return_value=MagicMock(dispose=AsyncMock())),
+        patch("sqlalchemy.ext.asyncio.async_sessionmaker", return_value=MagicMock(return_value=AsyncMock())),
+        patch("src.processing.db_updater.create_tables", new_callable=AsyncMock),
+        patch("src.processing.data_scraper.LinkCollector.get_links", new_callable=AsyncMock, return_value=links),
+        patch("src.processing.listing_watcher.ListingWatcher", return_value=watcher),
+    ):
+        assert await _collect_links(datetime(2025, 1, 1), datetime(2025, 1, 31)) == links[1:]
+
+
+def test_watch_listing_ingests_only_new_links():
+    links = ["https://spimex.com/oil_xls_20250102162000.xls"]
+    with (
+        patch("src.worker.tasks._watch_listing", new_callable=AsyncMock, side_effect=[links, []]),
+        patch("src.worker.tasks.chord") as mock_chord,
+    ):
+        assert watch_listing() == 1
+        assert [sig.args for sig in mock_chord.call_args[0][0]] == [(link,) for link in links]
+        assert watch_listing() == 0
+        mock_chord.assert_called_once()
+
+
+def test_finalize_ingest_reports_failures():
+    results = [
+        {"url": "a.xls", "rows": 10, "error": None},
+        {"url": "b.xls", "rows": 0, "error": "timeout"},
+    ]
+    with (
+        patch("src.worker.tasks.flush_response_cache") as mock_flush,
+        patch("src.worker.tasks.sync_redis_client.incr") as mock_incr,
+        patch("src.worker.tasks.sync_redis_client.publish") as mock_publish,
+        patch("src.worker.tasks.warm_cache.delay") as mock_warm,
+        patch("src.worker.tasks._invalidate_listing", new_callable=AsyncMock) as mock_invalidate,
+    ):
+        result = finalize_ingest(results)
+        mock_invalidate.assert_awaited_once()
+        mock_warm.assert_called_once()
+        mock_flush.assert_called_once()
+        mock_incr.assert_called_once_with(DATA_VERSION_KEY)
+        mock_publish.assert_called_once()
+        assert result == "Загружено 10 строк из 1 бюллетеней, ошибок: 1"
+
+
+def test_finalize_ingest_publishes_latest_date():
+    results = [
+        {"url": "a.xls", "rows": 10, "date": "2025-06-16", "error": None},
+        {"url": "b.xls", "rows": 5, "date": "2025-06-17", "error": None},
+    ]
+    with (
+        patch("src.worker.tasks.flush_response_cache"),
+        patch("src.worker.tasks.sync_redis_client.incr"),
+        patch("src.worker.tasks.sync_redis_client.eval") as mock_eval,
+        patch("src.worker.tasks.sync_redis_client.publish") as mock_publish,
+        patch("src.worker.tasks.warm_cache.delay"),
+    ):
+        finalize_ingest(results)
+        assert mock_eval.call_args[0][-2:] == (LATEST_DATE_KEY, "2025-06-17")
+        mock_publish.assert_called_once_with(LOADED_CHANNEL, "2025-06-17")
+
+
+@pytest.mark.asyncio
+async def test_warm_paths_cover_hot_keys_and_latest_date():
+    session = AsyncMock()
+    session.__aenter__.return_value = session
+    session.scalar.return_value = date(2025, 6, 17)
+    session.execute.return_value = [("A100", "ANK"), ("A592", "FKN")]
+
+    with (
+        patch(
+            "src.cache.hot_paths",
+            new_callable=AsyncMock,
+            return_value=["/v1/trades/results", "/v1/trades/dates?days=7"],
+        ),
+        patch("src.database.connection.get_async_session_maker", return_value=MagicMock(return_value=session)),
+    ):
+        paths = await _warm_paths()
+
+    assert paths[:2] == ["/v1/trades/results", "/v1/trades/dates?days=7"]
+    assert len(paths) == len(set(paths))
+    assert "/v1/trades/results?oil_id=A592&delivery_basis_id=FKN" in paths
+    assert "/v1/trades/dynamics?start_date=2025-06-10&end_date=2025-06-17" in paths
+
+
+@pytest.mark.asyncio
+async def test_warm_cache_reads_from_primary():
+    overrides = {}
+
+    async def warm_paths():
+        overrides.update(app.dependency_overrides)
+        return []
+
+    with (
+        patch("src.worker.tasks._warm_paths", side_effect=warm_paths),
+        patch("src.database.connection.dispose_async_engine", new_callable=AsyncMock),
+        patch("src.cache.close_redis_client", new_callable=AsyncMock),
+    ):
+        assert await _warm_cache() == (0, 0)
+    assert overrides[get_async_db] is get_primary_db
+    assert get_async_db not in app.dependency_overrides
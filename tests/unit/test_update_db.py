@@ -0,0 +1,146 @@
+import zipfile
+from dataclasses import replace
+from datetime import date, datetime
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pandas as pd
+import pytest
+
+from src.processing.bulletin import BulletinBuffer, read_bulletins
+from src.processing.db_updater import CONFIG, create_tables, ingest_bulletin, publish_load, run_stages
+from src.scripts.update_db import parse_args
+
+START = datetime(2025, 6, 1)
+END = datetime(2025, 6, 30, 23, 59, 59)
+NAMES = ["oil_xls_20250531162000.xls", "oil_xls_20250602162000.xls", "oil_xls_20250630162000.xls", "notes.txt"]
+
+
+def test_read_bulletins_filters_window_in_directory_and_archive(tmp_path):
+    directory = tmp_path / "bulletins"
+    directory.mkdir()
+    archive = tmp_path / "bulletins.zip"
+    with zipfile.ZipFile(archive, "w") as zf:
+        for name in NAMES:
+            (directory / name).write_bytes(name.encode())
+            zf.writestr(f"2025/{name}", name.encode())
+
+    assert read_bulletins(str(directory), START, END) == [str(directory / name) for name in NAMES[1:3]]
+    buffers = read_bulletins(str(archive), START, END)
+    assert all(isinstance(buffer, BulletinBuffer) for buffer in buffers)
+    assert [(buffer.name, buffer.getvalue()) for buffer in buffers] == [(name, name.encode()) for name in NAMES[1:3]]
+    with pytest.raises(ValueError):
+        read_bulletins(str(directory / "notes.txt"), START, END)
+
+
+def test_parse_args_stages_and_knobs():
+    args = parse_args(["--start", "2025-06-01", "--stages", "parse,load", "--chunk-size", "100", "--dry-run"])
+    assert args.start == date(2025, 6, 1)
+    assert args.stages == ["parse", "load"]
+    assert args.chunk_size == 100
+    assert args.dry_run
+    with pytest.raises(SystemExit):
+        parse_args(["--stages", "scrape,index"])
+    with pytest.raises(SystemExit):
+        parse_args(["--stages", "scrape,load"])
+
+
+@pytest.mark.asyncio
+async def test_parse_and_load_stages_run_separately(tmp_path):
+    config = replace(CONFIG, date_start=START, date_end=END, directory=str(tmp_path))
+    (tmp_path / NAMES[1]).write_bytes(b"data")
+    df = pd.DataFrame({"exchange_product_id": ["A100ANK060F"], "date": [pd.Timestamp("2025-06-02")]})
+    parser = MagicMock(parsed_df=df)
+    parser.summary.return_value = {"parsed": 1, "failed": 0, "superseded": 0, "rows": 1}
+    loader = MagicMock(load=AsyncMock(return_value=1))
+
+    with (
+        patch("src.processing.db_updater.SpimexScraper") as mock_scraper,
+        patch("src.processing.db_updater.SpimexParser", return_value=parser) as mock_parser,
+        patch("src.processing.db_updater.SpimexLoader", return_value=loader) as mock_loader,
+        patch("src.processing.db_updater.get_async_session_maker"),
+        patch("src.processing.db_updater.create_tables", new_callable=AsyncMock),
+        patch("src.processing.db_updater.publish_load", new_callable=AsyncMock) as mock_publish,
+    ):
+        parsed = await run_stages(config, ["parse"], parsed_path=str(tmp_path / "out" / "parsed.pkl"))
+        assert mock_parser.call_args.args[0] == [str(tmp_path / NAMES[1])]
+        assert parsed["parse"]["rows"] == 1
+        assert set(parsed["timings"]) == {"parse"}
+        mock_loader.assert_not_called()
+
+        loaded = await run_stages(config, ["load"], parsed_path=str(tmp_path / "out" / "parsed.pkl"))
+        pd.testing.assert_frame_equal(mock_loader.call_args.args[1], df)
+        assert loaded["rows"] == 1
+        assert set(loaded["timings"]) == {"load"}
+        mock_publish.assert_awaited_once_with(date(2025, 6, 2))
+        mock_scraper.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_dry_run_does_not_write(tmp_path):
+    config = replace(CONFIG, directory=str(tmp_path))
+    collector = MagicMock(get_links=AsyncMock(return_value=["a", "b"]))
+    with (
+        patch("src.processing.db_updater.LinkCollector", return_value=collector),
+        patch("src.processing.db_updater.SpimexScraper") as mock_scraper,
+        patch("src.processing.db_updater.create_tables", new_callable=AsyncMock) as mock_create,
+    ):
+        report = await run_stages(config, ["scrape"], dry_run=True)
+    assert report["links"] == 2
+    assert report["dry_run"]
+    mock_scraper.assert_not_called()
+    mock_create.assert_not_called()
+
+
+@pytest.mark.parametrize("known", [True, False])
+@pytest.mark.asyncio
+async def test_ingest_bulletin_uses_db_marker(known):
+    url = f"https://spimex.com/upload/reports/oil_xls/{NAMES[1]}"
+    df = pd.DataFrame({"exchange_product_id": ["A100ANK060F"], "date": [pd.Timestamp("2025-06-02")]})
+    watcher = MagicMock(known_links=AsyncMock(return_value={url} if known else set()), record=AsyncMock())
+    downloader = MagicMock(download=AsyncMock(return_value=NAMES[1]))
+    parser = MagicMock(parsed_df=df, failed={})
+    loader = MagicMock(load=AsyncMock(return_value=1))
+
+    with (
+        patch("src.processing.db_updater.create_worker_engine", return_value=MagicMock(dispose=AsyncMock())),
+        patch("src.processing.db_updater.async_sessionmaker", return_value=MagicMock(return_value=AsyncMock())),
+        patch("src.processing.db_updater.ListingWatcher", return_value=watcher),
+        patch("src.processing.db_updater.FileDownloader", return_value=downloader),
+        patch("src.processing.db_updater.SpimexParser", return_value=parser),
+        patch("src.processing.db_updater.SpimexLoader", return_value=loader),
+    ):
+        result = await ingest_bulletin(url)
+
+    if known:
+        assert result == (0, None)
+        downloader.download.assert_not_called()
+        watcher.record.assert_not_called()
+    else:
+        assert result == (1, date(2025, 6, 2))
+        watcher.record.assert_awaited_once_with([url])
+
+
+@pytest.mark.asyncio
+async def test_create_tables_adds_unit_to_existing_table():
+    conn = AsyncMock()
+    engine = MagicMock()
+    engine.begin.return_value.__aenter__.return_value = conn
+    await create_tables(engine)
+
+    conn.run_sync.assert_awaited_once()
+    statement = str(conn.execute.await_args.args[0])
+    assert "ADD COLUMN IF NOT EXISTS unit" in statement
+
+
+@pytest.mark.asyncio
+async def test_publish_load_schedules_cache_warmup():
+    with (
+        patch("src.processing.db_updater.clear_response_cache", new_callable=AsyncMock),
+        patch("src.processing.db_updater.publish_latest_date", new_callable=AsyncMock),
+        patch("src.processing.db_updater.bump_data_version", new_callable=AsyncMock),
+        patch("src.processing.db_updater.notify_loaded", new_callable=AsyncMock),
+        patch("src.worker.app.celery_app.send_task") as mock_send,
+    ):
+        await publish_load(date(2025, 6, 30))
+
+    mock_send.assert_called_once_with("src.worker.tasks.warm_cache")